@@ -1,14 +1,24 @@
 #!/usr/bin/env python3
 """
 图片转换为WebP格式的Python脚本
-支持无损转换并更新引用
+支持无损转换并更新引用，多个图片并行转换
 """
 
+import argparse
+import fnmatch
+import functools
+import hashlib
+import io
+import json
 import os
 import re
 import shutil
 import subprocess
 import sys
+import tempfile
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
 
@@ -23,121 +33,956 @@ CONFIG_FILES = [
 # 支持的图片格式
 IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff'}
 
+# 转换清单：记录每个源图片的大小、mtime、内容哈希以及输出哈希和编码设置，重复运行时只转换新增或变化的图片
+MANIFEST_NAME = '.webp_manifest.json'
+MANIFEST_VERSION = 1
+
+# 引用中文件名两侧的分隔符：空白、路径分隔符、引号、括号与常见的标记符号（只用ASCII，中文字符不是分隔符）
+REFERENCE_SEPARATORS = r'\s/\\"\'`<>()\[\]{}|=:;,?#*!&'
+
 def check_cwebp():
-    """检查是否安装了cwebp工具"""
-    try:
-        subprocess.run(['cwebp', '-version'], capture_output=True, check=True)
+    """检查是否安装了cwebp工具（只在 PATH 中查找，不启动进程）"""
+    if shutil.which('cwebp'):
         return True
-    except (subprocess.CalledProcessError, FileNotFoundError):
-        print("错误: 未找到cwebp命令。请先安装webp工具:")
-        print("macOS: brew install webp")
-        print("Ubuntu: sudo apt-get install webp")
+    print("错误: 未找到cwebp命令。请先安装webp工具:")
+    print("macOS: brew install webp")
+    print("Ubuntu: sudo apt-get install webp")
+    return False
+
+@functools.lru_cache(maxsize=None)
+def pillow_webp_available():
+    """Pillow 是否可用且编译了WebP支持"""
+    try:
+        from PIL import features
+    except ImportError:
         return False
+    return bool(features.check('webp'))
+
+def select_encoder(name='auto'):
+    """
+    选择编码后端
+    
+    auto 优先使用进程内的 Pillow 编码（没有每个文件启动子进程的开销），不可用时使用 cwebp。
+    
+    Returns:
+        'pillow' / 'cwebp'，指定的后端不可用时返回 None
+    """
+    if name in ('auto', 'pillow') and pillow_webp_available():
+        return 'pillow'
+    if name == 'pillow':
+        print("错误: Pillow 未安装或不支持WebP。请安装: pip install Pillow")
+        return None
+    return 'cwebp' if check_cwebp() else None
+
+def encoder_preset(image_path):
+    """根据文件类型选择转换参数: {'lossless': 是否无损, 'quality': 质量}"""
+    ext = Path(image_path).suffix.lower()
+    if ext == '.png':
+        # PNG使用无损转换
+        return {'lossless': True, 'quality': 100}
+    elif ext in ['.jpg', '.jpeg']:
+        # JPEG使用高质量转换
+        return {'lossless': False, 'quality': 95}
+    else:
+        # 其他格式使用默认设置
+        return {'lossless': False, 'quality': 90}
+
+def encoder_options(image_path):
+    """转换参数对应的cwebp选项"""
+    preset = encoder_preset(image_path)
+    return (['-lossless'] if preset['lossless'] else []) + ['-q', str(preset['quality'])]
+
+def encoder_settings(image_path, adaptive=None):
+    """记录在清单中的编码设置（以cwebp选项表示，与后端无关），设置变化时重新编码"""
+    settings = ['cwebp', *encoder_options(image_path)]
+    if adaptive:
+        settings.append('adaptive=' + json.dumps(adaptive, sort_keys=True, separators=(',', ':')))
+    return ' '.join(settings)
+
+def cwebp_command(image_path, output_path):
+    """cwebp转换命令"""
+    return ['cwebp', *encoder_options(image_path), str(image_path), '-o', str(output_path)]
+
+def encode_cwebp(image_path, output_path):
+    """用cwebp子进程编码"""
+    result = subprocess.run(cwebp_command(image_path, output_path), capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+
+def encode_pillow(image_path, output_path):
+    """
+    用 Pillow 在进程内编码，参数与cwebp相同
+    
+    与cwebp默认行为一致，不写入EXIF、ICC等元数据；动图（GIF等）保留全部帧。
+    """
+    from PIL import Image
+    
+    preset = encoder_preset(image_path)
+    with Image.open(image_path) as im:
+        animated = getattr(im, 'is_animated', False)
+        frame = im if animated else _webp_frame(im)
+        frame.save(output_path, 'WEBP', lossless=preset['lossless'], quality=preset['quality'],
+                   method=4, save_all=animated)
+
+def _webp_frame(im):
+    """转换为WebP支持的 RGB / RGBA"""
+    if im.mode in ('RGB', 'RGBA'):
+        return im
+    has_alpha = im.mode in ('LA', 'PA') or 'transparency' in im.info
+    return im.convert('RGBA' if has_alpha else 'RGB')
+
+ENCODERS = {'pillow': encode_pillow, 'cwebp': encode_cwebp}
+
+def adaptive_options(target_ssim=None, max_bytes=None, widths=(), min_quality=50, max_quality=95):
+    """
+    自适应编码的参数，没有指定任何目标时返回 None（使用固定参数）
+    
+    Args:
+        target_ssim: 目标感知质量，选择 SSIM 不低于该值的最低质量（如 0.98）
+        max_bytes: 单个WebP文件的字节预算，超出时降低质量
+        widths: 额外生成的宽度（srcset），只生成小于原图宽度的尺寸
+        min_quality: 搜索的最低质量
+        max_quality: 无损图片超出预算改为有损时的最高质量；有损图片不超过 encoder_preset 的质量
+    """
+    if target_ssim is None and max_bytes is None and not widths:
+        return None
+    return {
+        'target_ssim': target_ssim,
+        'max_bytes': max_bytes,
+        'widths': sorted(set(widths), reverse=True),
+        'min_quality': min_quality,
+        'max_quality': max_quality,
+    }
+
+def _luma(im):
+    """比较用的亮度图，透明部分合成到白色背景上"""
+    from PIL import Image
+    
+    if im.mode == 'RGBA':
+        background = Image.new('RGBA', im.size, (255, 255, 255, 255))
+        im = Image.alpha_composite(background, im)
+    return im.convert('L')
+
+def ssim(a, b, window=8):
+    """两幅图片亮度的平均 SSIM（window x window 均值窗口）"""
+    import numpy as np
+    
+    x = np.asarray(_luma(a), dtype=np.float64)
+    y = np.asarray(_luma(b), dtype=np.float64)
+    k = max(1, min(window, *x.shape))
+    
+    def box_mean(z):
+        c = np.pad(z.cumsum(0).cumsum(1), ((1, 0), (1, 0)))
+        return (c[k:, k:] - c[:-k, k:] - c[k:, :-k] + c[:-k, :-k]) / (k * k)
+    
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mx, my = box_mean(x), box_mean(y)
+    vx = box_mean(x * x) - mx * mx
+    vy = box_mean(y * y) - my * my
+    cov = box_mean(x * y) - mx * my
+    s = ((2 * mx * my + c1) * (2 * cov + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+    return float(s.mean())
+
+def _encode_bytes(im, lossless, quality):
+    buffer = io.BytesIO()
+    im.save(buffer, 'WEBP', lossless=lossless, quality=quality, method=4)
+    return buffer.getvalue()
+
+def search_quality(im, preset, options):
+    """
+    在内存中反复编码，按 options 的目标选择质量
+    
+    - 无损图片: 没有字节预算或无损结果在预算内时保持无损，否则改为有损搜索
+    - target_ssim: 二分查找 SSIM 达标的最低质量（从 min_quality 到预设质量）
+    - max_bytes: 结果超出预算时，二分查找预算内的最高质量；最低质量仍超出时使用最低质量
+    
+    Returns:
+        (是否无损, 质量, WebP数据, SSIM)
+    """
+    from PIL import Image
+    
+    if preset['lossless']:
+        data = _encode_bytes(im, True, preset['quality'])
+        if options['max_bytes'] is None or len(data) <= options['max_bytes']:
+            return True, preset['quality'], data, 1.0
+        hi = options['max_quality']
+    else:
+        hi = min(preset['quality'], options['max_quality'])
+    lo = min(options['min_quality'], hi)
+    
+    encoded, scores = {}, {}
+    
+    def encode(quality):
+        if quality not in encoded:
+            encoded[quality] = _encode_bytes(im, False, quality)
+        return encoded[quality]
+    
+    def score(quality):
+        if quality not in scores:
+            with Image.open(io.BytesIO(encode(quality))) as decoded:
+                scores[quality] = ssim(im, decoded.convert(im.mode))
+        return scores[quality]
+    
+    quality = hi
+    target = options['target_ssim']
+    if target is not None and score(hi) >= target:
+        low, high = lo, hi
+        while low < high:
+            mid = (low + high) // 2
+            if score(mid) >= target:
+                high = mid
+            else:
+                low = mid + 1
+        quality = low
+    
+    budget = options['max_bytes']
+    if budget is not None and len(encode(quality)) > budget:
+        best, low, high = lo, lo, quality - 1
+        while low <= high:
+            mid = (low + high) // 2
+            if len(encode(mid)) <= budget:
+                best, low = mid, mid + 1
+            else:
+                high = mid - 1
+        quality = best
+    return False, quality, encode(quality), score(quality)
+
+def variant_path(webp_path, width):
+    """srcset 尺寸的文件名: name-480w.webp"""
+    webp_path = Path(webp_path)
+    return webp_path.with_name(f"{webp_path.stem}-{width}w.webp")
+
+def encode_adaptive(image_path, output_path, options):
+    """
+    自适应编码（Pillow）：只解码一次，搜索质量后写入 output_path
+    
+    动图不搜索质量，按 encoder_preset 编码。返回的 image 为解码后的图片（动图为 None），
+    确定采用这个WebP后再用 write_variants 生成缩小的尺寸，不必重新解码。
+    
+    Returns:
+        {'lossless', 'quality', 'ssim', 'image'}
+    """
+    from PIL import Image
+    
+    preset = encoder_preset(image_path)
+    with Image.open(image_path) as source:
+        if getattr(source, 'is_animated', False):
+            encode_pillow(image_path, output_path)
+            return {'lossless': preset['lossless'], 'quality': preset['quality'], 'ssim': None, 'image': None}
+        im = _webp_frame(source)
+        im.load()
+    
+    lossless, quality, data, score = search_quality(im, preset, options)
+    with open(output_path, 'wb') as f:
+        f.write(data)
+    return {'lossless': lossless, 'quality': quality, 'ssim': score, 'image': im}
+
+def write_variants(im, webp_path, widths, lossless, quality):
+    """
+    按 widths 生成缩小的尺寸，使用与原图相同的质量
+    
+    先写入临时文件，由调用方在主WebP改名之后再改名为 variant_path(webp_path, width)；
+    不小于原图宽度的尺寸跳过，im 为 None（动图）时不生成。中途出错时删除已写入的临时文件。
+    
+    Returns:
+        [{'width', 'webp', 'tmp'}]
+    """
+    from PIL import Image
+    
+    variants = []
+    if im is None:
+        return variants
+    try:
+        for width in widths:
+            if width >= im.width:
+                continue
+            height = max(1, round(im.height * width / im.width))
+            path = variant_path(webp_path, width)
+            variants.append({'width': width, 'webp': path, 'tmp': path.with_name(f".{path.name}.tmp")})
+            im.resize((width, height), Image.LANCZOS, reducing_gap=3.0).save(
+                variants[-1]['tmp'], 'WEBP', lossless=lossless, quality=quality, method=4)
+    except Exception:
+        for variant in variants:
+            if variant['tmp'].exists():
+                variant['tmp'].unlink()
+        raise
+    return variants
+
+def file_hash(path, chunk_size=1 << 20):
+    """文件内容的SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def convert_one(image_path, backup_stamp, webp_path=None, backup=True, incremental=False, expected_hash=None,
+                encoder=None, adaptive=None, previous_variants=()):
+    """
+    转换单个图片并备份原文件，不打印输出（供并行转换汇总）
+    
+    先写入临时文件、成功后再改名，中断时不会留下不完整的WebP文件；
+    同一次运行的备份都放在各目录下的 .backup_{backup_stamp} 中。
+    
+    Args:
+        image_path: 源图片
+        backup_stamp: 备份目录的时间戳
+        webp_path: 输出路径，默认与源图片同名
+        backup: 转换成功后是否把源图片移到备份目录（从备份重新编码时为 False）
+        incremental: 由清单决定是否转换：不因WebP已存在而跳过，并计算源文件和输出的内容哈希
+        expected_hash: 清单中记录的源文件哈希，内容未变时跳过
+        encoder: 编码后端，见 ENCODERS；默认 Pillow 可用时使用 Pillow，否则使用cwebp
+        adaptive: 自适应编码参数（adaptive_options），需要 Pillow；WebP不小于原图时不采用（状态 'kept'）:
+                  新图片保留原图，从备份重新编码时保留之前的WebP，都不生成缩小的尺寸
+        previous_variants: 清单中记录的上次生成的尺寸，转换成功后删除这次没有生成的尺寸
+    
+    返回转换记录: source, webp, status ('converted' / 'kept' / 'skipped' / 'failed'),
+    original_size, webp_size, backup, error, encoder, quality, variants，
+    以及清单使用的 size, mtime_ns, hash, webp_hash, settings
+    """
+    image_path = Path(image_path)
+    webp_path = Path(webp_path) if webp_path else image_path.with_suffix('.webp')
+    encoder = 'pillow' if adaptive else encoder or ('pillow' if pillow_webp_available() else 'cwebp')
+    record = {
+        'source': image_path,
+        'webp': webp_path,
+        'status': 'failed',
+        'original_size': 0,
+        'webp_size': 0,
+        'backup': None,
+        'error': None,
+        'encoder': encoder,
+        'quality': None,
+        'variants': [],
+        'size': None,
+        'mtime_ns': None,
+        'hash': None,
+        'webp_hash': None,
+        'settings': encoder_settings(image_path, adaptive),
+    }
+    
+    # 如果WebP文件已存在，跳过
+    if not incremental and webp_path.exists():
+        record['status'] = 'skipped'
+        record['error'] = '已存在'
+        return record
+    
+    tmp_path = webp_path.with_name(f".{webp_path.name}.tmp")
+    created = False
+    staged = []
+    try:
+        if incremental:
+            stat = image_path.stat()
+            record['size'], record['mtime_ns'] = stat.st_size, stat.st_mtime_ns
+            record['hash'] = file_hash(image_path)
+            if record['hash'] == expected_hash:
+                record['status'] = 'skipped'
+                record['error'] = '内容未变'
+                return record
+        
+        if adaptive:
+            result = encode_adaptive(image_path, tmp_path, adaptive)
+            record['quality'] = 'lossless' if result['lossless'] else result['quality']
+            if tmp_path.stat().st_size >= image_path.stat().st_size:
+                # WebP不比原图小：新图片保留原图，不备份、不更新引用；
+                # 从备份重新编码时引用已指向之前的WebP，保留之前的WebP，原图留在备份中
+                record['original_size'] = image_path.stat().st_size
+                record['webp_size'] = tmp_path.stat().st_size
+                record['status'] = 'kept'
+                return record
+            staged = write_variants(
+                result['image'], webp_path, adaptive['widths'], result['lossless'], result['quality'])
+        else:
+            ENCODERS[encoder](image_path, tmp_path)
+        
+        if incremental:
+            record['webp_hash'] = file_hash(tmp_path)
+        os.replace(tmp_path, webp_path)
+        created = True
+        # 主WebP改名之后再改名各尺寸
+        for variant in staged:
+            os.replace(variant['tmp'], variant['webp'])
+            record['variants'].append({'width': variant['width'], 'webp': variant['webp'],
+                                       'size': variant['webp'].stat().st_size})
+        record['original_size'] = image_path.stat().st_size
+        record['webp_size'] = webp_path.stat().st_size
+        
+        # 备份原文件
+        if backup:
+            backup_dir = image_path.parent / f".backup_{backup_stamp}"
+            backup_dir.mkdir(exist_ok=True)
+            shutil.move(str(image_path), str(backup_dir / image_path.name))
+            record['backup'] = backup_dir / image_path.name
+        record['status'] = 'converted'
+        
+        # 删除上次生成、这次不再生成的尺寸（如 --widths 改变）
+        current = {variant['webp'] for variant in record['variants']}
+        for path in map(Path, previous_variants):
+            if path not in current and path.exists():
+                path.unlink()
+    except Exception as e:
+        record['error'] = str(e)
+        if created:
+            for path in [webp_path] + [variant['webp'] for variant in record['variants']]:
+                if path.exists():
+                    path.unlink()
+            record['variants'] = []
+    finally:
+        for path in [tmp_path] + [variant['tmp'] for variant in staged]:
+            if path.exists():
+                path.unlink()
+    return record
 
 def convert_image_to_webp(image_path):
     """将图片转换为WebP格式"""
     image_path = Path(image_path)
-    webp_path = image_path.with_suffix('.webp')
+    record = convert_one(image_path, datetime.now().strftime('%Y%m%d_%H%M%S'))
+    webp_path = record['webp']
     
-    # 如果WebP文件已存在，跳过
-    if webp_path.exists():
+    if record['status'] == 'skipped':
         print(f"跳过 (已存在): {image_path.name} -> {webp_path.name}")
         return webp_path, False
     
     print(f"转换: {image_path.name} -> {webp_path.name}")
+    if record['status'] == 'converted':
+        compression_ratio = (1 - record['webp_size'] / record['original_size']) * 100
+        print(f"  ✓ 转换成功")
+        print(f"  原文件: {record['original_size']:,} bytes")
+        print(f"  WebP文件: {record['webp_size']:,} bytes")
+        print(f"  压缩率: {compression_ratio:.1f}%")
+        print(f"  原文件已备份到: {record['backup']}")
+        return webp_path, True
     
-    try:
-        # 根据文件类型选择转换参数
-        ext = image_path.suffix.lower()
-        if ext == '.png':
-            # PNG使用无损转换
-            cmd = ['cwebp', '-lossless', '-q', '100', str(image_path), '-o', str(webp_path)]
-        elif ext in ['.jpg', '.jpeg']:
-            # JPEG使用高质量转换
-            cmd = ['cwebp', '-q', '95', str(image_path), '-o', str(webp_path)]
+    print(f"  ✗ 转换失败: {record['error']}")
+    return None, False
+
+def load_manifest(path):
+    """
+    读取转换清单
+    
+    files: {源图片相对路径: size, mtime_ns, hash, webp, webp_hash, settings, encoder, quality, variants, backup}
+    dirs:  {目录相对路径: mtime_ns, scanned_ns, dirs, images}，见 scan_image_files
+    """
+    path = Path(path)
+    if path.exists():
+        with open(path, 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        if manifest.get('version') == MANIFEST_VERSION:
+            return manifest
+    return {'version': MANIFEST_VERSION, 'files': {}, 'dirs': {}}
+
+def save_manifest(path, manifest):
+    """写入临时文件后整体替换，中断时不会损坏原清单"""
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+def scan_image_files(directory, manifest):
+    """
+    查找需要转换的图片文件，按目录的 mtime 复用上次的扫描结果
+    
+    目录中增删、改名文件都会改变目录的 mtime；mtime 未变的目录直接使用清单中的子目录和图片列表，
+    不再列出目录内容。刚修改过的目录（mtime 距上次扫描不足1秒）总是重新列出。
+    """
+    directory = Path(directory)
+    cache = manifest.get('dirs', {})
+    dirs = {}
+    image_files = []
+    stack = [directory]
+    while stack:
+        current = stack.pop()
+        key = current.relative_to(directory).as_posix()
+        mtime_ns = os.stat(current).st_mtime_ns
+        cached = cache.get(key)
+        if cached and cached['mtime_ns'] == mtime_ns and cached['scanned_ns'] - mtime_ns > 1_000_000_000:
+            entry = cached
         else:
-            # 其他格式使用默认设置
-            cmd = ['cwebp', '-q', '90', str(image_path), '-o', str(webp_path)]
-        
-        result = subprocess.run(cmd, capture_output=True, text=True)
+            subdirs, images = [], []
+            with os.scandir(current) as it:
+                for item in it:
+                    if item.is_dir(follow_symlinks=False):
+                        # 不进入备份目录
+                        if not item.name.startswith('.backup_'):
+                            subdirs.append(item.name)
+                    elif Path(item.name).suffix.lower() in IMAGE_EXTENSIONS:
+                        images.append(item.name)
+            entry = {'mtime_ns': mtime_ns, 'scanned_ns': time.time_ns(), 'dirs': sorted(subdirs), 'images': sorted(images)}
+        dirs[key] = entry
+        image_files.extend(current / name for name in entry['images'])
+        stack.extend(current / name for name in reversed(entry['dirs']))
+    manifest['dirs'] = dirs
+    return image_files
+
+def _skipped(image_path, webp_path, reason, adaptive=None):
+    """未转换的文件的记录，字段与 convert_one 一致"""
+    return {
+        'source': image_path, 'webp': webp_path, 'status': 'skipped',
+        'original_size': 0, 'webp_size': 0, 'backup': None, 'error': reason, 'encoder': None,
+        'quality': None, 'variants': [], 'size': None, 'mtime_ns': None, 'hash': None, 'webp_hash': None,
+        'settings': encoder_settings(image_path, adaptive),
+    }
+
+def plan_conversions(image_files, manifest=None, root=None, adaptive=None):
+    """
+    确定需要转换的图片
+    
+    同一目录下同名不同格式的图片（如 a.png 和 a.jpg）会输出到同一个WebP文件，只转换第一个。
+    指定清单时:
+        - 清单中没有记录的图片: 转换；已有同名WebP文件时（手工制作或其他工具生成）跳过，与不使用清单时一致
+        - 大小、mtime 与记录一致且编码设置未变: 跳过，不读取文件内容
+        - 大小或 mtime 变化: 由转换任务计算内容哈希，与记录一致时跳过
+        - 已转换、源文件在备份中的图片，编码设置变化时从备份重新编码
+        - 保留原图的图片（WebP不比原图小）同样按大小、mtime 和内容哈希跳过
+    
+    Returns:
+        任务列表，每项为 {'key': 清单键, 'record': 跳过的记录} 或 {'key': 清单键, 'job': convert_one 的参数}
+    """
+    items = []
+    targets = {}
+    files = manifest['files'] if manifest is not None else {}
+    seen = set()
+    for image_path in image_files:
+        webp_path = image_path.with_suffix('.webp')
+        key = image_path.relative_to(root).as_posix() if manifest is not None else None
+        seen.add(key)
+        if webp_path in targets:
+            items.append({'key': key, 'record': _skipped(
+                image_path, webp_path, f"与 {targets[webp_path].name} 输出到同一个WebP文件", adaptive)})
+            continue
+        targets[webp_path] = image_path
         
-        if result.returncode == 0:
-            # 检查文件大小
-            original_size = image_path.stat().st_size
-            webp_size = webp_path.stat().st_size
-            compression_ratio = (1 - webp_size / original_size) * 100
-            
-            print(f"  ✓ 转换成功")
-            print(f"  原文件: {original_size:,} bytes")
-            print(f"  WebP文件: {webp_size:,} bytes")
-            print(f"  压缩率: {compression_ratio:.1f}%")
-            
-            # 备份原文件
-            backup_dir = image_path.parent / f".backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
-            backup_dir.mkdir(exist_ok=True)
-            shutil.move(str(image_path), str(backup_dir / image_path.name))
-            print(f"  原文件已备份到: {backup_dir / image_path.name}")
+        job = {'image_path': image_path, 'webp_path': webp_path, 'adaptive': adaptive}
+        entry = files.get(key)
+        if manifest is not None:
+            job['incremental'] = True
+            if (entry is None or entry['webp'] is None) and webp_path.exists():
+                # 清单之外的WebP文件，不覆盖
+                items.append({'key': key, 'record': _skipped(image_path, webp_path, '已存在', adaptive)})
+                continue
+            if entry is not None and entry.get('variants'):
+                job['previous_variants'] = [root / variant['webp'] for variant in entry['variants']]
+            if entry is not None and entry['settings'] == encoder_settings(image_path, adaptive):
+                stat = image_path.stat()
+                if webp_path.exists() or entry['webp'] is None:
+                    if stat.st_size == entry['size'] and stat.st_mtime_ns == entry['mtime_ns']:
+                        items.append({'key': key, 'record': _skipped(image_path, webp_path, '未变化', adaptive)})
+                        continue
+                    job['expected_hash'] = entry['hash']
+        items.append({'key': key, 'job': job})
+    
+    # 编码设置变化：源文件已在备份目录中，从备份重新编码
+    for key, entry in files.items():
+        if key in seen or not entry.get('backup') or entry['settings'] == encoder_settings(key, adaptive):
+            continue
+        backup_path = root / entry['backup']
+        if backup_path.exists():
+            items.append({'key': key, 'job': {
+                'image_path': backup_path, 'webp_path': root / entry['webp'], 'backup': False, 'incremental': True,
+                'adaptive': adaptive,
+                'previous_variants': [root / variant['webp'] for variant in entry.get('variants', [])],
+            }})
+    return items
+
+def update_manifest(manifest, items, records, root):
+    """把转换结果写回清单"""
+    files = manifest['files']
+    for item, record in zip(items, records):
+        key = item['key']
+        if record['hash'] is None:
+            continue
+        if record['status'] in ('converted', 'kept'):
+            entry = files.get(key, {})
+            backup = record['backup'].relative_to(root).as_posix() if record['backup'] else entry.get('backup')
+            if record['status'] == 'kept':
+                # 没有采用新的WebP：从备份重新编码时之前的WebP和尺寸保持不变，新图片没有WebP文件；
+                # 都记录新的编码设置，设置不变时不再重新编码
+                reencoded = record['source'].parent.name.startswith('.backup_')
+                files[key] = {
+                    'size': record['size'],
+                    'mtime_ns': record['mtime_ns'],
+                    'hash': record['hash'],
+                    'webp': entry.get('webp') if reencoded else None,
+                    'webp_hash': entry.get('webp_hash') if reencoded else None,
+                    'settings': record['settings'],
+                    'encoder': entry.get('encoder') if reencoded else record['encoder'],
+                    'quality': entry.get('quality') if reencoded else record['quality'],
+                    'variants': entry.get('variants', []) if reencoded else [],
+                    'backup': backup,
+                }
+                continue
+            files[key] = {
+                'size': record['size'],
+                'mtime_ns': record['mtime_ns'],
+                'hash': record['hash'],
+                'webp': record['webp'].relative_to(root).as_posix(),
+                'webp_hash': record['webp_hash'],
+                'settings': record['settings'],
+                'encoder': record['encoder'],
+                'quality': record['quality'],
+                'variants': [{'width': v['width'], 'webp': v['webp'].relative_to(root).as_posix()}
+                             for v in record['variants']],
+                'backup': backup,
+            }
+        elif record['status'] == 'skipped' and key in files:
+            # 内容未变，只更新大小和 mtime，下次不必再计算哈希
+            files[key].update(size=record['size'], mtime_ns=record['mtime_ns'])
+
+def _progress_line(index, total, record):
+    """单个文件的一行进度"""
+    prefix = f"[{index:>{len(str(total))}}/{total}]"
+    name = f"{record['source'].name} -> {record['webp'].name}"
+    detail = ''
+    if record['quality'] is not None:
+        detail += f"  q={record['quality']}"
+    if record['variants']:
+        detail += f"  尺寸: {', '.join(str(v['width']) + 'w' for v in record['variants'])}"
+    if record['status'] == 'converted':
+        ratio = (1 - record['webp_size'] / record['original_size']) * 100 if record['original_size'] else 0.0
+        return (f"{prefix} ✓ {name}  {record['original_size']:,} -> {record['webp_size']:,} bytes "
+                f"({ratio:.1f}%){detail}")
+    if record['status'] == 'kept':
+        return (f"{prefix} = {name}  保留原图 (WebP {record['webp_size']:,} >= "
+                f"{record['original_size']:,} bytes){detail}")
+    if record['status'] == 'skipped':
+        return f"{prefix} - {name}  跳过 ({record['error']})"
+    return f"{prefix} ✗ {name}  {record['error']}"
+
+def convert_images(image_files, workers=None, backup_stamp=None, log_file=None, manifest=None, root=None,
+                   encoder=None, adaptive=None):
+    """
+    用有界线程池并行转换图片（Pillow 编码时释放GIL；cwebp 时每个线程等待一个子进程）
+    
+    Args:
+        image_files: 图片路径列表
+        workers: 并行数，默认为CPU核心数；1 为逐个转换
+        backup_stamp: 备份目录的时间戳，默认为当前时间
+        log_file: 逐个文件的转换记录追加到该日志
+        manifest: 转换清单（load_manifest），只转换新增或变化的图片，并就地更新清单
+        root: 清单中路径的根目录（图片目录）
+        encoder: 编码后端，见 convert_one
+        adaptive: 自适应编码参数，见 adaptive_options
+    
+    Returns:
+        转换记录，见 convert_one；顺序与 image_files 一致，之后是从备份重新编码的图片
+    """
+    workers = workers or os.cpu_count() or 1
+    backup_stamp = backup_stamp or datetime.now().strftime('%Y%m%d_%H%M%S')
+    image_files = [Path(p) for p in image_files]
+    root = Path(root) if root is not None else None
+    items = plan_conversions(image_files, manifest, root, adaptive)
+    jobs = [item['job'] for item in items if 'job' in item]
+    
+    records = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # map 按提交顺序返回，进度按文件顺序输出
+        converted = executor.map(lambda job: convert_one(backup_stamp=backup_stamp, encoder=encoder, **job), jobs)
+        for item in items:
+            record = item['record'] if 'record' in item else next(converted)
+            records.append(record)
+            print(_progress_line(len(records), len(items), record))
+    
+    if manifest is not None:
+        update_manifest(manifest, items, records, root)
+    if log_file:
+        with open(log_file, 'a', encoding='utf-8') as f:
+            for record in records:
+                f.write(f"{record['status']}\t{record['source']}\t{record['webp']}\t"
+                        f"{record['original_size']}\t{record['webp_size']}\t{record['error'] or ''}\n")
+    return records
+
+def benchmark_encoders(image_files, encoders=None, workers=1):
+    """
+    用各编码后端转换同一组图片到临时目录，比较耗时和输出大小（不修改、不备份原文件）
+    
+    Args:
+        image_files: 图片路径列表
+        encoders: 比较的后端，默认为所有可用的后端
+        workers: 并行数
+    
+    Returns:
+        每个后端一项: encoder, files, failed, seconds, original_size, webp_size
+    """
+    image_files = [Path(p) for p in image_files]
+    if encoders is None:
+        encoders = [name for name in ENCODERS if (name == 'pillow' and pillow_webp_available())
+                    or (name == 'cwebp' and shutil.which('cwebp'))]
+    original_size = sum(p.stat().st_size for p in image_files)
+    results = []
+    for encoder in encoders:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            outputs = [Path(tmp_dir) / f"{i}.webp" for i in range(len(image_files))]
             
-            return webp_path, True
-        else:
-            print(f"  ✗ 转换失败: {result.stderr}")
-            if webp_path.exists():
-                webp_path.unlink()
-            return None, False
+            def encode(job):
+                try:
+                    ENCODERS[encoder](*job)
+                    return True
+                except Exception:
+                    return False
             
-    except Exception as e:
-        print(f"  ✗ 转换出错: {e}")
-        if webp_path.exists():
-            webp_path.unlink()
-        return None, False
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                ok = list(executor.map(encode, zip(image_files, outputs)))
+            seconds = time.perf_counter() - start
+            results.append({
+                'encoder': encoder,
+                'files': len(image_files),
+                'failed': ok.count(False),
+                'seconds': seconds,
+                'original_size': original_size,
+                'webp_size': sum(p.stat().st_size for p in outputs if p.exists()),
+            })
+    return results
+
+def print_benchmark(results):
+    """以Markdown表格输出 benchmark_encoders 的结果，可直接贴入转换报告"""
+    print("| 编码后端 | 文件数 | 失败 | 耗时 (s) | 每个文件 (ms) | 原文件 (bytes) | WebP (bytes) |")
+    print("|---|---:|---:|---:|---:|---:|---:|")
+    for r in results:
+        per_file = r['seconds'] / r['files'] * 1000 if r['files'] else 0.0
+        print(f"| {r['encoder']} | {r['files']} | {r['failed']} | {r['seconds']:.2f} | {per_file:.1f} | "
+              f"{r['original_size']:,} | {r['webp_size']:,} |")
+
+def print_summary(records):
+    """汇总转换结果"""
+    converted = [r for r in records if r['status'] == 'converted']
+    kept = [r for r in records if r['status'] == 'kept']
+    skipped = [r for r in records if r['status'] == 'skipped']
+    failed = [r for r in records if r['status'] == 'failed']
+    original_size = sum(r['original_size'] for r in converted)
+    webp_size = sum(r['webp_size'] for r in converted)
+    variants = sum(len(r['variants']) for r in records)
+    
+    print(f"转换: {len(converted)}  保留原图: {len(kept)}  跳过: {len(skipped)}  失败: {len(failed)}")
+    if variants:
+        print(f"生成尺寸: {variants} 个")
+    if original_size:
+        print(f"原文件合计: {original_size:,} bytes")
+        print(f"WebP合计: {webp_size:,} bytes")
+        print(f"压缩率: {(1 - webp_size / original_size) * 100:.1f}%")
+    for record in failed:
+        print(f"  ✗ {record['source']}: {record['error']}")
 
 def find_image_files(directory):
     """查找所有需要转换的图片文件"""
     image_files = []
     for root, dirs, files in os.walk(directory):
+        # 不进入备份目录，否则重复运行时会转换已备份的原文件
+        dirs[:] = [d for d in dirs if not d.startswith('.backup_')]
         for file in files:
             file_path = Path(root) / file
             if file_path.suffix.lower() in IMAGE_EXTENSIONS:
                 image_files.append(file_path)
     return image_files
 
-def update_file_references(file_path, conversion_map):
-    """更新文件中的图片引用"""
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        
-        original_content = content
-        updated = False
+def build_conversion_map(records, manifest=None):
+    """
+    由转换记录（和清单中之前转换的图片）生成引用替换表 {原文件名: WebP文件名}
+    
+    引用只按文件名匹配，不区分所在目录：同名图片在别的目录中保留原图、转换失败或被跳过时，
+    替换该文件名会让指向那个图片的引用失效，这样的文件名不放入替换表。
+    
+    Returns:
+        (替换表, 因同名冲突而排除的文件名列表)
+    """
+    conversion_map = {
+        r['source'].name: r['webp'].name for r in records if r['status'] == 'converted'
+    }
+    if manifest is not None:
+        # 之前运行转换的图片也一并更新，中断或新增的引用在重复运行时得到修正
+        for key, entry in manifest['files'].items():
+            if entry['webp'] is not None:
+                conversion_map.setdefault(Path(key).name, Path(entry['webp']).name)
+    
+    # 仍在图片目录中、没有转换的图片（从备份重新编码的图片不在图片目录中）
+    unconverted = {
+        r['source'].name.lower() for r in records
+        if r['status'] != 'converted' and not r['source'].parent.name.startswith('.backup_')
+    }
+    conflicts = sorted(name for name in conversion_map if name.lower() in unconverted)
+    for name in conflicts:
+        del conversion_map[name]
+    return conversion_map, conflicts
+
+def reference_rewriter(conversion_map):
+    """
+    编译替换引用用的正则，返回 rewrite(content) -> (新内容, 替换次数)
+    
+    先匹配以图片扩展名结尾、两侧为分隔符的文件名，再查表替换，耗时与 conversion_map 的大小无关。
+    扩展名不区分大小写；URL 编码的文件名（如 my%20image.png）替换为同样编码的WebP文件名；
+    文件名前紧挨着中文（如 "见图.png"）时，表中没有整个名字则按中文之后的部分查找。
+    没有转换的图片、文件名中间的 ".png" 等其他文本保持不变。
+    含分隔符的文件名（如带空格）不能作为一个整体匹配，另用这些名字组成的正则先替换。
+    rewrite.extensions 为映射中出现的扩展名（小写字节串），用于读取文件后快速过滤。
+    """
+    lookup = {}
+    for name, webp in conversion_map.items():
+        lookup[urllib.parse.quote(name).lower()] = urllib.parse.quote(webp)
+        lookup[name.lower()] = webp
+    extensions = {Path(name).suffix.lower() for name in lookup if Path(name).suffix}
+    
+    pattern = irregular = None
+    if extensions:
+        # 长的扩展名在前，避免 .jp 之类的前缀抢先匹配
+        suffixes = '|'.join(re.escape(ext[1:]) for ext in sorted(extensions, key=len, reverse=True))
+        pattern = re.compile(
+            rf'(?<![^{REFERENCE_SEPARATORS}])[^{REFERENCE_SEPARATORS}]+?\.(?:{suffixes})(?![\w-]|\.\w)', re.IGNORECASE
+        )
+        separator = re.compile(rf'[{REFERENCE_SEPARATORS}]')
+        names = sorted((name for name in lookup if separator.search(name)), key=len, reverse=True)
+        if names:
+            irregular = re.compile(
+                rf'(?<![A-Za-z0-9_.%-])(?:' + '|'.join(map(re.escape, names)) + r')(?![\w-]|\.\w)', re.IGNORECASE
+            )
+    
+    def replace(match):
+        token = match.group()
+        webp = lookup.get(token.lower())
+        if webp is not None:
+            return webp
+        for i, char in enumerate(token):
+            if not char.isascii():
+                webp = lookup.get(token[i + 1:].lower())
+                if webp is not None:
+                    return token[:i + 1] + webp
+        return token
+    
+    def rewrite(content):
+        if pattern is None:
+            return content, 0
+        count = 0
+        if irregular is not None:
+            content, count = irregular.subn(lambda m: lookup[m.group().lower()], content)
+        changed = 0
         
-        # 更新所有图片扩展名为webp
-        for old_ext in ['.jpg', '.jpeg', '.png', '.gif', '.bmp', '.tiff']:
-            pattern = re.compile(re.escape(old_ext), re.IGNORECASE)
-            if pattern.search(content):
-                content = pattern.sub('.webp', content)
-                updated = True
+        def counted(match):
+            nonlocal changed
+            result = replace(match)
+            changed += result != match.group()
+            return result
         
-        if updated:
-            with open(file_path, 'w', encoding='utf-8') as f:
+        content = pattern.sub(counted, content)
+        return content, count + changed
+    
+    rewrite.extensions = {ext.encode() for ext in extensions}
+    return rewrite
+
+def rewrite_file(file_path, rewrite):
+    """
+    更新单个文件中的图片引用，不打印输出（供并行更新汇总）
+    
+    先按字节检查是否包含已转换图片的扩展名，不包含时不解码、不做正则匹配。
+    
+    Returns:
+        (替换次数, 错误信息)
+    """
+    try:
+        with open(file_path, 'rb') as f:
+            data = f.read()
+        lowered = data.lower()
+        if not any(ext in lowered for ext in rewrite.extensions):
+            return 0, None
+        content, count = rewrite(data.decode('utf-8'))
+        if count:
+            with open(file_path, 'w', encoding='utf-8', newline='') as f:
                 f.write(content)
-            print(f"✓ 已更新文件: {file_path}")
-            return True
-        else:
-            print(f"  无需更新: {file_path}")
-            return False
-            
+        return count, None
     except Exception as e:
-        print(f"✗ 更新文件失败 {file_path}: {e}")
+        return 0, str(e)
+
+def update_file_references(file_path, conversion_map):
+    """更新文件中的图片引用"""
+    rewrite = conversion_map if callable(conversion_map) else reference_rewriter(conversion_map)
+    count, error = rewrite_file(file_path, rewrite)
+    if error:
+        print(f"✗ 更新文件失败 {file_path}: {error}")
         return False
+    if count:
+        print(f"✓ 已更新文件: {file_path} ({count} 处)")
+        return True
+    print(f"  无需更新: {file_path}")
+    return False
+
+def update_references(files, conversion_map, workers=None):
+    """
+    并行更新多个文件中的图片引用，只打印有改动或失败的文件
+    
+    Args:
+        files: 文件路径列表（重复的路径只处理一次）
+        conversion_map: {原图片名: WebP文件名}，或 reference_rewriter 编译好的替换函数
+        workers: 并行数，默认为CPU核心数
+    
+    Returns:
+        更新的文件数
+    """
+    files = list(dict.fromkeys(Path(p) for p in files))
+    rewrite = conversion_map if callable(conversion_map) else reference_rewriter(conversion_map)
+    if not rewrite.extensions:
+        print("没有需要更新的图片引用")
+        return 0
+    updated = 0
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        for file_path, (count, error) in zip(files, executor.map(lambda p: rewrite_file(p, rewrite), files)):
+            if error:
+                print(f"✗ 更新文件失败 {file_path}: {error}")
+            elif count:
+                updated += 1
+                print(f"✓ 已更新文件: {file_path} ({count} 处)")
+    print(f"检查 {len(files)} 个文件，更新 {updated} 个")
+    return updated
+
+def find_reference_files(directory, patterns, exclude=('node_modules', '.git', 'logs')):
+    """查找可能包含图片引用的文件，不进入 exclude 中的目录"""
+    matched = []
+    for root, dirs, files in os.walk(directory):
+        dirs[:] = [d for d in dirs if d not in exclude]
+        for file in files:
+            if any(fnmatch.fnmatch(file, pattern) for pattern in patterns):
+                matched.append(Path(root) / file)
+    return matched
 
-def main():
+def parse_args(argv=None):
+    """命令行参数"""
+    parser = argparse.ArgumentParser(description="图片转换为WebP格式并更新引用")
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help="并行转换数，默认为CPU核心数；1 为逐个转换")
+    parser.add_argument('--manifest', default=None,
+                        help=f"转换清单路径，默认为图片目录下的 {MANIFEST_NAME}")
+    parser.add_argument('--no-manifest', action='store_true',
+                        help="不使用转换清单，转换所有没有对应WebP文件的图片")
+    parser.add_argument('--encoder', choices=['auto', *ENCODERS], default='auto',
+                        help="编码后端，默认 Pillow 可用时使用 Pillow，否则使用cwebp")
+    parser.add_argument('--benchmark', type=int, nargs='?', const=50, default=None, metavar='N',
+                        help="只比较各编码后端转换前 N 个图片（默认50）的耗时和大小，不转换")
+    adaptive = parser.add_argument_group('自适应编码（需要 Pillow；WebP不比原图小时保留原图）')
+    adaptive.add_argument('--target-ssim', type=float, default=None, metavar='S',
+                          help="选择 SSIM 不低于 S 的最低质量，如 0.98")
+    adaptive.add_argument('--max-bytes', type=int, default=None, metavar='N',
+                          help="单个WebP文件的字节预算，超出时降低质量")
+    adaptive.add_argument('--widths', type=lambda s: [int(w) for w in s.split(',') if w], default=[],
+                          help="额外生成的宽度（srcset），如 480,960,1440")
+    adaptive.add_argument('--min-quality', type=int, default=50,
+                          help="自适应搜索的最低质量（默认50）")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """主函数"""
+    args = parse_args(argv)
     print("WebP图片转换工具")
     print("=" * 50)
     
     # 检查工具
-    if not check_cwebp():
+    adaptive = adaptive_options(args.target_ssim, args.max_bytes, args.widths, args.min_quality)
+    encoder = select_encoder('pillow' if adaptive else args.encoder)
+    if encoder is None:
+        sys.exit(1)
+    if adaptive and args.encoder == 'cwebp':
+        print("错误: 自适应编码需要 Pillow 后端")
         sys.exit(1)
+    print(f"编码后端: {encoder}")
+    if adaptive:
+        print(f"自适应编码: {adaptive}")
     
     # 创建转换日志
     log_file = "/tmp/webp_conversion.log"
@@ -149,53 +994,67 @@ def main():
     
     # 查找所有图片文件
     print("扫描图片文件...")
-    image_files = find_image_files(IMAGES_DIR)
-    print(f"找到 {len(image_files)} 个图片文件需要转换")
+    manifest = None
+    manifest_path = Path(args.manifest or Path(IMAGES_DIR) / MANIFEST_NAME)
+    if args.no_manifest:
+        image_files = find_image_files(IMAGES_DIR)
+    else:
+        manifest = load_manifest(manifest_path)
+        image_files = scan_image_files(IMAGES_DIR, manifest)
+        print(f"转换清单: {manifest_path} ({len(manifest['files'])} 条记录)")
+    print(f"找到 {len(image_files)} 个图片文件")
     print()
     
-    if not image_files:
+    if not image_files and not (manifest and manifest['files']):
         print("没有找到需要转换的图片文件")
         return
     
+    if args.benchmark:
+        sample = image_files[:args.benchmark]
+        print(f"比较编码后端 ({len(sample)} 个图片, {args.workers or 1} 个并行任务)...")
+        print_benchmark(benchmark_encoders(sample, workers=args.workers or 1))
+        return
+    
     # 转换图片
-    print("开始转换图片...")
-    conversion_map = {}
-    converted_count = 0
-    
-    for image_file in image_files:
-        webp_file, success = convert_image_to_webp(image_file)
-        if success and webp_file:
-            conversion_map[image_file.name] = webp_file.name
-            converted_count += 1
-        print()
+    workers = args.workers or os.cpu_count() or 1
+    print(f"开始转换图片 ({workers} 个并行任务)...")
+    records = convert_images(image_files, workers=workers, log_file=log_file, manifest=manifest, root=IMAGES_DIR,
+                             encoder=encoder, adaptive=adaptive)
+    if manifest is not None:
+        save_manifest(manifest_path, manifest)
+    converted = sum(r['status'] == 'converted' for r in records)
+    conversion_map, conflicts = build_conversion_map(records, manifest)
     
-    print(f"图片转换完成！成功转换 {converted_count} 个文件")
     print()
+    print(f"图片转换完成！成功转换 {converted} 个文件")
+    print_summary(records)
+    print()
+    if conflicts:
+        print(f"以下文件名在其他目录中有未转换的同名图片，不更新引用 ({len(conflicts)} 个):")
+        for name in conflicts:
+            print(f"  {name}")
+        print()
     
-    # 更新引用
+    # 更新引用：所有文件共用一个编译好的匹配
     print("更新文件中的图片引用...")
+    rewrite = reference_rewriter(conversion_map)
     
     # 更新Markdown文件
     print("更新Markdown文件...")
-    md_files = list(Path(POSTS_DIR).glob("*.md"))
-    for md_file in md_files:
-        update_file_references(md_file, conversion_map)
+    update_references(sorted(Path(POSTS_DIR).glob("*.md")), rewrite, workers)
     
     # 更新配置文件
     print("\n更新配置文件...")
-    for config_file in CONFIG_FILES:
-        if os.path.exists(config_file):
-            update_file_references(config_file, conversion_map)
+    update_references([f for f in CONFIG_FILES if os.path.exists(f)], rewrite, workers)
     
     # 更新其他文件
     print("\n更新其他可能包含图片引用的文件...")
     project_root = Path("/Users/channing/file/chen-blog")
-    for pattern in ["*.yml", "*.yaml", "*.json", "*.html"]:
-        for file_path in project_root.rglob(pattern):
-            # 跳过某些目录
-            if any(part in str(file_path) for part in ['node_modules', '.git', 'logs']):
-                continue
-            update_file_references(file_path, conversion_map)
+    other_files = find_reference_files(project_root, ["*.yml", "*.yaml", "*.json", "*.html"])
+    # 配置文件已在上面处理；转换清单中的路径是原图片，不能替换
+    skip = {Path(f).resolve() for f in CONFIG_FILES} | {manifest_path.resolve()}
+    other_files = [f for f in other_files if f.resolve() not in skip]
+    update_references(other_files, rewrite, workers)
     
     print()
     print("=" * 50)
@@ -7,47 +7,735 @@
 import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
-from typing import Dict, List, Callable, Optional, Tuple
-from dataclasses import dataclass
+from typing import Dict, List, Callable, Optional, Tuple, Union
 from abc import ABC, abstractmethod
+import contextlib
+import cProfile
+import hashlib
+import importlib.util
+import itertools
 import json
+import math
+import os
+import re
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import OrderedDict, deque
 
-# 可选依赖
 try:
-    import matplotlib.pyplot as plt
-    MATPLOTLIB_AVAILABLE = True
-    # 设置中文显示
-    plt.rcParams['font.sans-serif'] = ['DejaVu Sans']
-    plt.rcParams['axes.unicode_minus'] = False
-except ImportError:
-    MATPLOTLIB_AVAILABLE = False
-    print("⚠️  matplotlib 未安装，可视化功能不可用。运行: pip install matplotlib")
+    import resource
+except ImportError:  # Windows
+    resource = None
 
-try:
-    import yfinance as yf
-    YFINANCE_AVAILABLE = True
-except ImportError:
-    YFINANCE_AVAILABLE = False
-    print("⚠️  yfinance 未安装，数据获取功能不可用。运行: pip install yfinance")
+# 可选依赖：导入时只检查是否安装，首次使用时才导入，
+# 避免每次启动（含进程池的子进程）加载 matplotlib / yfinance / numba
+MATPLOTLIB_AVAILABLE = importlib.util.find_spec('matplotlib') is not None
+YFINANCE_AVAILABLE = importlib.util.find_spec('yfinance') is not None
+# numba 仅用于加速成交内核，未安装时使用 NumPy 实现
+NUMBA_AVAILABLE = importlib.util.find_spec('numba') is not None
+
+_plt = None
+
+
+def _pyplot():
+    """首次绘图时导入 matplotlib.pyplot 并设置字体"""
+    global _plt
+    if _plt is None:
+        import matplotlib.pyplot as plt
+        # 设置中文显示
+        plt.rcParams['font.sans-serif'] = ['DejaVu Sans']
+        plt.rcParams['axes.unicode_minus'] = False
+        _plt = plt
+    return _plt
+
+
+# 可选的执行引擎
+ENGINES = ('loop', 'vectorized')
+
+
+# 交易记录的列式结构：每笔成交一行，预分配后按需转换为 dict 列表
+TRADE_DTYPE = np.dtype([
+    ('bar', np.int64),  # 成交所在K线位置
+    ('side', np.int8),  # 1 买入 / -1 卖出
+    ('price', np.float64),  # 成交价（含滑点）
+    ('shares', np.int64),
+    ('amount', np.float64),  # 买入为总成本，卖出为净收入
+    ('pnl', np.float64),
+    ('pnl_pct', np.float64),
+    ('capital', np.float64),  # 成交后现金
+])
+
+
+def _equity_index(index: pd.Index) -> pd.Index:
+    """构造权益曲线索引（与逐行引擎 set_index('date') 的结果一致）"""
+    if isinstance(index, pd.DatetimeIndex):
+        return pd.DatetimeIndex(index, freq=None, name='date')
+    return pd.Index(index, name='date')
+
+
+def _random_walk_ohlcv(dates: pd.DatetimeIndex, seed: int = 42, drift: float = 0.001,
+                       volatility: float = 0.02) -> pd.DataFrame:
+    """在给定时间索引上生成随机游走 OHLCV 模拟数据（drift / volatility 为每根K线的对数收益均值和标准差）"""
+    rng = np.random.RandomState(seed)
+    n = len(dates)
+    returns = rng.normal(drift, volatility, n)
+    prices = 100 * np.exp(np.cumsum(returns))
+    
+    return pd.DataFrame({
+        'Open': prices * (1 + rng.normal(0, 0.001, n)),
+        'High': prices * (1 + abs(rng.normal(0, 0.01, n))),
+        'Low': prices * (1 - abs(rng.normal(0, 0.01, n))),
+        'Close': prices,
+        'Volume': rng.randint(1000000, 10000000, n)
+    }, index=dates)
+
+
+def _fill_kernel_bars(close, signal, state, commission, slippage, stop_loss, take_profit,
+                      bars, sides, prices, shares, amounts, pnls, pnl_pcts, capitals, equity):
+    """
+    逐K线成交内核（安装 numba 时编译执行）
+    
+    只使用标量与预分配数组，持仓成本 O(1) 维护；stop_loss / take_profit 为 NaN 表示不启用。
+    state 为 [现金, 持仓数量, 买入价, 持仓成本]，开始时读取、结束时写回，分段执行时可接续。
+    成交写入预分配的列数组，返回成交笔数。
+    """
+    capital = state[0]
+    position = int(state[1])
+    entry_price = state[2]  # 持仓的买入价（含滑点）
+    open_cost = state[3]  # 持仓的总成本（含手续费）
+    count = 0
+    
+    for i in range(len(close)):
+        price = close[i]
+        stopped = False
+        if position > 0:
+            if stop_loss == stop_loss and price <= entry_price * (1 - stop_loss):
+                stopped = True
+            elif take_profit == take_profit and price >= entry_price * (1 + take_profit):
+                stopped = True
+        
+        if signal[i] == 1 and position == 0:
+            cost_price = price * (1 + slippage)
+            max_shares = int(capital * (1 - commission) / cost_price)
+            if max_shares > 0:
+                cost = max_shares * cost_price
+                total_cost = cost + cost * commission
+                if total_cost <= capital:
+                    position = max_shares
+                    capital -= total_cost
+                    entry_price = cost_price
+                    open_cost = total_cost
+                    bars[count] = i
+                    sides[count] = 1
+                    prices[count] = cost_price
+                    shares[count] = max_shares
+                    amounts[count] = total_cost
+                    pnls[count] = 0.0
+                    pnl_pcts[count] = 0.0
+                    capitals[count] = capital
+                    count += 1
+        
+        elif (signal[i] == -1 or stopped) and position > 0:
+            sell_price = price * (1 - slippage)
+            revenue = position * sell_price
+            net_revenue = revenue - revenue * commission
+            pnl = net_revenue - open_cost
+            capital += net_revenue
+            bars[count] = i
+            sides[count] = -1
+            prices[count] = sell_price
+            shares[count] = position
+            amounts[count] = net_revenue
+            pnls[count] = pnl
+            pnl_pcts[count] = pnl / open_cost
+            capitals[count] = capital
+            count += 1
+            position = 0
+        
+        equity[i] = capital + position * price
+    
+    state[0] = capital
+    state[1] = position
+    state[2] = entry_price if position > 0 else 0.0
+    state[3] = open_cost if position > 0 else 0.0
+    return count
+
+
+def _fill_kernel_jump(close, signal, state, commission, slippage, stop_loss, take_profit,
+                      bars, sides, prices, shares, amounts, pnls, pnl_pcts, capitals, equity):
+    """
+    NumPy 成交内核（未安装 numba 时使用，参数与 _fill_kernel_bars 相同）
+    
+    持仓状态只在信号点和止损止盈点变化，因此只需在候选成交点之间跳转，
+    逐笔成交按与逐行引擎相同的公式计算；现金和持仓由成交点通过数组运算展开到每根K线。
+    """
+    n = len(close)
+    buy_idx = np.flatnonzero(signal == 1)
+    sell_idx = np.flatnonzero(signal == -1)
+    position = np.zeros(n, dtype=np.int64)
+    
+    opening_capital = capital = state[0]
+    held, entry_price, open_cost = int(state[1]), state[2], state[3]
+    count = 0
+    start = 0
+    
+    # 接续上一段的持仓：持有至第一个卖出信号或止损/止盈触发
+    if held > 0:
+        s = sell_idx[0] if len(sell_idx) else n
+        s = _first_stop(close, 0, s, entry_price, stop_loss, take_profit)
+        if s >= n:
+            position[:] = held
+            start = n
+        else:
+            position[:s] = held
+            count, capital = _jump_sell(close, s, held, open_cost, capital, commission, slippage,
+                                        count, bars, sides, prices, shares, amounts, pnls, pnl_pcts, capitals)
+            held = 0
+            start = s + 1
+    
+    while True:
+        k = np.searchsorted(buy_idx, start)
+        if k >= len(buy_idx):
+            break
+        b = buy_idx[k]
+        
+        # 买入（与逐行引擎公式一致）
+        cost_price = close[b] * (1 + slippage)
+        max_shares = int(capital * (1 - commission) / cost_price)
+        if max_shares <= 0:
+            start = b + 1
+            continue
+        cost = max_shares * cost_price
+        total_cost = cost + cost * commission
+        if total_cost > capital:
+            start = b + 1
+            continue
+        
+        capital -= total_cost
+        bars[count], sides[count], prices[count], shares[count] = b, 1, cost_price, max_shares
+        amounts[count], pnls[count], pnl_pcts[count], capitals[count] = total_cost, 0.0, 0.0, capital
+        count += 1
+        
+        # 持有至下一个卖出信号或止损/止盈触发
+        k = np.searchsorted(sell_idx, b)
+        s = sell_idx[k] if k < len(sell_idx) else n
+        s = _first_stop(close, b + 1, s, cost_price, stop_loss, take_profit)
+        if s >= n:
+            position[b:] = max_shares
+            held, entry_price, open_cost = max_shares, cost_price, total_cost
+            break
+        position[b:s] = max_shares
+        
+        count, capital = _jump_sell(close, s, max_shares, total_cost, capital, commission, slippage,
+                                    count, bars, sides, prices, shares, amounts, pnls, pnl_pcts, capitals)
+        start = s + 1
+    
+    # 将成交后的现金展开到每根K线
+    cash = np.full(n, opening_capital, dtype=np.float64)
+    if count:
+        last_event = np.searchsorted(bars[:count], np.arange(n), side='right') - 1
+        has_event = last_event >= 0
+        cash[has_event] = capitals[:count][last_event[has_event]]
+    equity[:] = cash + position * close
+    
+    if held == 0:
+        entry_price = open_cost = 0.0
+    state[:] = (capital, held, entry_price, open_cost)
+    return count
+
+
+def _first_stop(close, start, end, entry_price, stop_loss, take_profit) -> int:
+    """[start, end) 内第一次触发止损/止盈的位置，未触发返回 end"""
+    if stop_loss != stop_loss and take_profit != take_profit:
+        return end
+    window = close[start:end]
+    triggered = np.zeros(len(window), dtype=bool)
+    if stop_loss == stop_loss:
+        triggered |= window <= entry_price * (1 - stop_loss)
+    if take_profit == take_profit:
+        triggered |= window >= entry_price * (1 + take_profit)
+    return start + int(np.argmax(triggered)) if triggered.any() else end
+
+
+def _jump_sell(close, s, held, open_cost, capital, commission, slippage,
+               count, bars, sides, prices, shares, amounts, pnls, pnl_pcts, capitals):
+    """在第 s 根K线卖出全部持仓，写入成交记录，返回 (成交笔数, 现金)"""
+    sell_price = close[s] * (1 - slippage)
+    revenue = held * sell_price
+    net_revenue = revenue - revenue * commission
+    pnl = net_revenue - open_cost
+    capital += net_revenue
+    bars[count], sides[count], prices[count], shares[count] = s, -1, sell_price, held
+    amounts[count], pnls[count], pnl_pcts[count], capitals[count] = net_revenue, pnl, pnl / open_cost, capital
+    return count + 1, capital
+
+
+_fill_kernel_impl = None  # 当前使用的成交内核，首次成交时由 _select_fill_kernel 选择
+
+
+def _select_fill_kernel():
+    """安装 numba 时编译 _fill_kernel_bars（此时才导入 numba），否则使用 _fill_kernel_jump"""
+    global _fill_kernel_impl
+    if _fill_kernel_impl is None:
+        if NUMBA_AVAILABLE:
+            import numba
+            _fill_kernel_impl = numba.njit(cache=True)(_fill_kernel_bars)
+        else:
+            _fill_kernel_impl = _fill_kernel_jump
+    return _fill_kernel_impl
+
+
+def _fill_state(initial_capital: float) -> np.ndarray:
+    """成交内核的账户状态：[现金, 持仓数量, 买入价, 持仓成本]"""
+    return np.array([initial_capital, 0.0, 0.0, 0.0], dtype=np.float64)
+
+
+def _fill_kernel(
+    close: np.ndarray,
+    signal: np.ndarray,
+    initial_capital: float,
+    commission: float,
+    slippage: float,
+    stop_loss: Optional[float] = None,
+    take_profit: Optional[float] = None,
+    state: Optional[np.ndarray] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    全仓买入 / 全部卖出的成交模拟
+    
+    Args:
+        state: 分段执行时接续的账户状态，见 _fill_state；执行后原地更新，为None时从空仓开始，
+               此时 initial_capital 为起始现金
+    
+    Returns:
+        (每根K线的权益数组, TRADE_DTYPE 结构化数组形式的成交记录)
+    """
+    n = len(close)
+    close = np.ascontiguousarray(close, dtype=np.float64)
+    signal = np.ascontiguousarray(signal, dtype=np.float64)
+    
+    # 每根K线至多成交一次，按K线数预分配
+    columns = [np.zeros(n, dtype=TRADE_DTYPE[name]) for name in TRADE_DTYPE.names]
+    equity = np.empty(n, dtype=np.float64)
+    if state is None:
+        state = _fill_state(initial_capital)
+    count = _select_fill_kernel()(
+        close, signal, state, float(commission), float(slippage),
+        np.nan if stop_loss is None else float(stop_loss),
+        np.nan if take_profit is None else float(take_profit),
+        *columns, equity
+    )
+    trades = np.empty(count, dtype=TRADE_DTYPE)
+    for name, column in zip(TRADE_DTYPE.names, columns):
+        trades[name] = column[:count]
+    return equity, trades
+
+
+# 计时的阶段
+STAGES = ('fetch_data', 'generate_signals', 'execute', 'metrics', 'plot', 'save_report')
+
+# 阶段计时钩子：[(适用阶段, hook)]，适用阶段为None表示全部阶段
+_STAGE_HOOKS: List[Tuple[Optional[frozenset], Callable]] = []
+
+
+def add_stage_hook(hook: Callable, stages: Optional[List[str]] = None) -> Callable:
+    """
+    注册阶段钩子
+    
+    hook(stage, labels) 返回上下文管理器，包裹对应阶段的执行，可用于挂载 cProfile 或采样分析器。
+    
+    Args:
+        hook: 钩子函数，stage 为阶段名，labels 为 {'symbol', 'strategy', 'engine'} 等标签
+        stages: 适用的阶段，见 STAGES；None 表示全部阶段
+    """
+    _STAGE_HOOKS.append((frozenset(stages) if stages is not None else None, hook))
+    return hook
+
+
+def remove_stage_hook(hook: Callable):
+    """移除 add_stage_hook 注册的钩子"""
+    _STAGE_HOOKS[:] = [(stages, h) for stages, h in _STAGE_HOOKS if h is not hook]
+
+
+def cprofile_hook(output_dir: Optional[str] = None, sort: str = 'cumulative', limit: int = 25) -> Callable:
+    """
+    cProfile 阶段钩子
+    
+    Args:
+        output_dir: 保存 .prof 文件的目录（可用 snakeviz 等工具查看）；None 时直接打印统计
+        sort: 打印统计时的排序字段
+        limit: 打印的函数条数
+    """
+    @contextlib.contextmanager
+    def hook(stage: str, labels: Dict):
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            name = '-'.join(str(v) for v in [stage, *labels.values()]).replace(os.sep, '_')
+            if output_dir:
+                os.makedirs(output_dir, exist_ok=True)
+                path = os.path.join(output_dir, f"{name}-{datetime.now():%Y%m%d%H%M%S%f}.prof")
+                profiler.dump_stats(path)
+                print(f"🔬 {stage} 阶段分析已保存至: {path}")
+            else:
+                print(f"🔬 {name}")
+                pstats.Stats(profiler).sort_stats(sort).print_stats(limit)
+    
+    return hook
+
+
+# 环境变量启用 cProfile，无需修改代码：
+#   BACKTEST_PROFILE=execute,metrics (或 all)  BACKTEST_PROFILE_DIR=/tmp/prof
+if os.environ.get('BACKTEST_PROFILE'):
+    _profile_stages = [s.strip() for s in os.environ['BACKTEST_PROFILE'].split(',') if s.strip()]
+    add_stage_hook(
+        cprofile_hook(os.environ.get('BACKTEST_PROFILE_DIR')),
+        stages=None if 'all' in _profile_stages else _profile_stages
+    )
+
+
+def _max_rss() -> Optional[int]:
+    """进程常驻内存峰值（字节），不支持的平台返回None"""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class StageTimings:
+    """
+    分阶段计时
+    
+    每个阶段记录墙钟时间、CPU时间、处理行数和进程内存峰值 (max_rss)；
+    trace_memory=True 时额外用 tracemalloc 统计阶段内 Python 分配的峰值 (peak_memory)，有明显开销。
+    """
+    
+    FIELDS = ('stage', 'wall', 'cpu', 'rows', 'peak_memory', 'max_rss')
+    
+    def __init__(self, labels: Optional[Dict[str, str]] = None, trace_memory: bool = False):
+        self.labels = dict(labels or {})
+        self.trace_memory = trace_memory
+        self.records: List[Dict] = []
+    
+    @contextlib.contextmanager
+    def stage(self, name: str, rows: Optional[int] = None):
+        """计时上下文，yield 的记录可在阶段内补充 rows"""
+        record = {'stage': name, 'wall': 0.0, 'cpu': 0.0, 'rows': rows, 'peak_memory': None, 'max_rss': None}
+        
+        started_tracing = False
+        if self.trace_memory:
+            if tracemalloc.is_tracing():
+                tracemalloc.reset_peak()
+            else:
+                tracemalloc.start()
+                started_tracing = True
+            base_memory = tracemalloc.get_traced_memory()[0]
+        
+        with contextlib.ExitStack() as stack:
+            for stages, hook in list(_STAGE_HOOKS):
+                if stages is None or name in stages:
+                    stack.enter_context(hook(name, self.labels))
+            
+            wall, cpu = time.perf_counter(), time.process_time()
+            try:
+                yield record
+            finally:
+                record['wall'] = time.perf_counter() - wall
+                record['cpu'] = time.process_time() - cpu
+                if self.trace_memory:
+                    record['peak_memory'] = max(tracemalloc.get_traced_memory()[1] - base_memory, 0)
+                    if started_tracing:
+                        tracemalloc.stop()
+                record['max_rss'] = _max_rss()
+                self.records.append(record)
+    
+    def summary(self) -> pd.DataFrame:
+        """按阶段汇总：调用次数、耗时合计、行数合计、内存峰值"""
+        columns = ['calls', 'wall', 'cpu', 'rows', 'peak_memory', 'max_rss']
+        if not self.records:
+            return pd.DataFrame(columns=columns, index=pd.Index([], name='stage'))
+        df = pd.DataFrame(self.records, columns=list(self.FIELDS))
+        grouped = df.groupby('stage', sort=False)
+        return pd.DataFrame({
+            'calls': grouped.size(),
+            'wall': grouped['wall'].sum(),
+            'cpu': grouped['cpu'].sum(),
+            'rows': grouped['rows'].sum(min_count=1),
+            'peak_memory': grouped['peak_memory'].max(),
+            'max_rss': grouped['max_rss'].max(),
+        })[columns]
+    
+    def to_dict(self) -> Dict:
+        """转换为字典：{'labels': {...}, 'stages': [每次阶段调用的记录]}"""
+        return {'labels': dict(self.labels), 'stages': [dict(r) for r in self.records]}
+    
+    def to_json(self, filepath: Optional[str] = None) -> str:
+        """导出为 JSON 字符串，指定 filepath 时同时写入文件"""
+        text = json.dumps(self.to_dict(), indent=2)
+        if filepath:
+            with open(filepath, 'w') as f:
+                f.write(text)
+        return text
+    
+    def to_prometheus(self, prefix: str = 'backtest_stage') -> str:
+        """导出为 Prometheus 文本格式，见 timings_to_prometheus"""
+        return timings_to_prometheus([self], prefix=prefix)
+    
+    def __str__(self) -> str:
+        lines = [f"{'阶段':<18}{'次数':>4}{'墙钟(s)':>10}{'CPU(s)':>12}{'行数':>10}"]  # 中文占两列
+        for stage, row in self.summary().iterrows():
+            rows = '-' if pd.isna(row['rows']) else f"{int(row['rows']):,}"
+            lines.append(f"{stage:<20}{int(row['calls']):>6}{row['wall']:>12.4f}{row['cpu']:>12.4f}{rows:>12}")
+        return '\n'.join(lines)
+
+
+# Prometheus 导出的指标：(名称后缀, summary 列, 说明)
+_PROMETHEUS_METRICS = (
+    ('wall_seconds', 'wall', 'Wall-clock time spent in backtest stage'),
+    ('cpu_seconds', 'cpu', 'Process CPU time spent in backtest stage'),
+    ('rows', 'rows', 'Rows processed by backtest stage'),
+    ('calls', 'calls', 'Number of times backtest stage ran'),
+    ('peak_memory_bytes', 'peak_memory', 'Peak traced Python allocations during backtest stage'),
+    ('max_rss_bytes', 'max_rss', 'Process peak resident set size after backtest stage'),
+)
+
+
+def _prometheus_labels(labels: Dict) -> str:
+    escape = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{escape(v)}"' for k, v in labels.items()) + '}'
+
+
+def timings_to_prometheus(timings: List['StageTimings'], prefix: str = 'backtest_stage') -> str:
+    """
+    将多次回测的阶段计时合并导出为 Prometheus 文本格式
+    
+    每个阶段的各项指标一行，标签为 StageTimings.labels 加 stage。
+    """
+    summaries = [(t.labels, t.summary()) for t in timings]
+    lines = []
+    for suffix, column, description in _PROMETHEUS_METRICS:
+        samples = []
+        for labels, summary in summaries:
+            for stage, value in summary[column].items():
+                if pd.notna(value):
+                    samples.append(f"{prefix}_{suffix}{_prometheus_labels({**labels, 'stage': stage})} {float(value)!r}")
+        if samples:
+            lines.append(f"# HELP {prefix}_{suffix} {description}")
+            lines.append(f"# TYPE {prefix}_{suffix} gauge")
+            lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+# 权益曲线共用的日期索引：相同日期轴的回测结果引用同一个 Index 对象
+_DATE_INDEX_POOL: 'OrderedDict[str, pd.Index]' = OrderedDict()
+_DATE_INDEX_POOL_SIZE = 64
+
+
+def _shared_dates(index: pd.Index) -> pd.Index:
+    """返回与 index 相同的共享日期索引"""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(index, pd.DatetimeIndex):
+        digest.update(index.as_unit('ns').asi8.tobytes())
+        digest.update(str(index.tz).encode())
+    else:
+        digest.update(pd.util.hash_pandas_object(index, index=False).to_numpy().tobytes())
+    digest.update(str(index.name).encode())
+    key = digest.hexdigest()
+    
+    shared = _DATE_INDEX_POOL.get(key)
+    if shared is None:
+        shared = _DATE_INDEX_POOL[key] = index
+        while len(_DATE_INDEX_POOL) > _DATE_INDEX_POOL_SIZE:
+            _DATE_INDEX_POOL.popitem(last=False)
+    else:
+        _DATE_INDEX_POOL.move_to_end(key)
+    return shared
+
+
+class TradeLog:
+    """
+    列式交易记录
+    
+    成交以 TRADE_DTYPE 结构化数组保存，日期通过K线位置引用共享的日期索引；
+    迭代、下标访问时按需生成与原 dict 列表相同格式的记录，可直接替代 List[Dict] 使用。
+    """
+    
+    __slots__ = ('records', 'dates')
+    
+    def __init__(self, records: np.ndarray, dates: pd.Index):
+        self.records = records
+        self.dates = dates
+    
+    @classmethod
+    def from_dicts(cls, trades: List[Dict], dates: pd.Index) -> 'TradeLog':
+        """由 dict 格式的交易记录构造"""
+        records = np.zeros(len(trades), dtype=TRADE_DTYPE)
+        if trades:
+            records['bar'] = dates.get_indexer([t['date'] for t in trades])
+            records['side'] = [1 if t['type'] == 'BUY' else -1 for t in trades]
+            records['price'] = [t['price'] for t in trades]
+            records['shares'] = [t['shares'] for t in trades]
+            records['amount'] = [t['cost'] if t['type'] == 'BUY' else t['revenue'] for t in trades]
+            records['pnl'] = [t.get('pnl', 0.0) for t in trades]
+            records['pnl_pct'] = [t.get('pnl_pct', 0.0) for t in trades]
+            records['capital'] = [t['capital'] for t in trades]
+        return cls(records, dates)
+    
+    def _record(self, t) -> Dict:
+        if t['side'] == 1:
+            return {
+                'date': self.dates[t['bar']],
+                'type': 'BUY',
+                'price': t['price'],
+                'shares': int(t['shares']),
+                'cost': t['amount'],
+                'capital': t['capital']
+            }
+        return {
+            'date': self.dates[t['bar']],
+            'type': 'SELL',
+            'price': t['price'],
+            'shares': int(t['shares']),
+            'revenue': t['amount'],
+            'pnl': t['pnl'],
+            'pnl_pct': t['pnl_pct'],
+            'capital': t['capital']
+        }
+    
+    def __len__(self) -> int:
+        return len(self.records)
+    
+    def __iter__(self):
+        for t in self.records:
+            yield self._record(t)
+    
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return TradeLog(self.records[item], self.dates)
+        return self._record(self.records[item])
+    
+    def __eq__(self, other) -> bool:
+        if isinstance(other, TradeLog):
+            return self.to_list() == other.to_list()
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+    
+    def __repr__(self) -> str:
+        return f"TradeLog({len(self)} trades)"
+    
+    def to_list(self) -> List[Dict]:
+        """转换为 dict 列表"""
+        return list(self)
+    
+    def to_frame(self) -> pd.DataFrame:
+        """转换为DataFrame（每笔成交一行）"""
+        df = pd.DataFrame(self.records)
+        df.insert(0, 'date', self.dates[self.records['bar']])
+        df['type'] = np.where(self.records['side'] == 1, 'BUY', 'SELL')
+        return df.drop(columns=['bar', 'side'])
+    
+    @property
+    def nbytes(self) -> int:
+        """成交记录占用的字节数（不含共享的日期索引）"""
+        return self.records.nbytes
+
+
+# 二进制报告与批量汇总中保存的字段：描述字段 + 数值指标
+REPORT_METRICS = (
+    'final_capital', 'total_return', 'annualized_return', 'max_drawdown', 'sharpe_ratio',
+    'sortino_ratio', 'calmar_ratio', 'turnover', 'exposure', 'trade_count', 'win_rate',
+)
+REPORT_FIELDS = ('strategy_name', 'symbol', 'start_date', 'end_date', 'initial_capital') + REPORT_METRICS
 
 
-@dataclass
 class BacktestResult:
-    """回测结果数据结构"""
-    strategy_name: str
-    symbol: str
-    start_date: str
-    end_date: str
-    initial_capital: float
-    final_capital: float
-    total_return: float  # 总收益率
-    annualized_return: float  # 年化收益率
-    max_drawdown: float  # 最大回撤
-    sharpe_ratio: float  # 夏普比率
-    trade_count: int  # 交易次数
-    win_rate: float  # 胜率
-    equity_curve: pd.Series  # 权益曲线
-    trades: List[Dict]  # 交易记录
+    """
+    回测结果数据结构
+    
+    权益曲线以 float64 数组加共享日期索引保存，equity_curve 访问时才组装为 Series；
+    交易记录为 TradeLog 时按需展开为 dict。
+    """
+    
+    __slots__ = (
+        'strategy_name', 'symbol', 'start_date', 'end_date', 'initial_capital', 'final_capital',
+        'total_return', 'annualized_return', 'max_drawdown', 'sharpe_ratio', 'trade_count', 'win_rate',
+        'sortino_ratio', 'calmar_ratio', 'turnover', 'exposure',
+        'equity_values', 'dates', 'trades', 'timings',
+    )
+    
+    def __init__(
+        self,
+        strategy_name: str,
+        symbol: str,
+        start_date: str,
+        end_date: str,
+        initial_capital: float,
+        final_capital: float,
+        total_return: float,  # 总收益率
+        annualized_return: float,  # 年化收益率
+        max_drawdown: float,  # 最大回撤
+        sharpe_ratio: float,  # 夏普比率
+        trade_count: int,  # 交易次数
+        win_rate: float,  # 胜率
+        equity_curve: pd.Series,  # 权益曲线
+        trades: Union[TradeLog, List[Dict]],  # 交易记录
+        timings: Optional[StageTimings] = None,  # 各阶段计时
+        sortino_ratio: float = 0.0,  # 索提诺比率
+        calmar_ratio: float = 0.0,  # 卡玛比率
+        turnover: float = 0.0,  # 年化换手率
+        exposure: float = 0.0,  # 持仓时间占比
+    ):
+        self.strategy_name = strategy_name
+        self.symbol = symbol
+        self.start_date = start_date
+        self.end_date = end_date
+        self.initial_capital = initial_capital
+        self.final_capital = final_capital
+        self.total_return = total_return
+        self.annualized_return = annualized_return
+        self.max_drawdown = max_drawdown
+        self.sharpe_ratio = sharpe_ratio
+        self.trade_count = trade_count
+        self.win_rate = win_rate
+        self.sortino_ratio = sortino_ratio
+        self.calmar_ratio = calmar_ratio
+        self.turnover = turnover
+        self.exposure = exposure
+        self.equity_values = np.asarray(equity_curve, dtype=np.float64)
+        self.dates = _shared_dates(equity_curve.index)
+        self.trades = trades
+        self.timings = timings
+    
+    @property
+    def equity_curve(self) -> pd.Series:
+        """权益曲线（基于数组的零拷贝视图）"""
+        return pd.Series(self.equity_values, index=self.dates, name='equity', copy=False)
+    
+    @property
+    def nbytes(self) -> int:
+        """权益曲线与交易记录占用的字节数（不含共享的日期索引）"""
+        trades = self.trades.nbytes if isinstance(self.trades, TradeLog) else 0
+        return self.equity_values.nbytes + trades
+    
+    def __repr__(self) -> str:
+        return (f"BacktestResult(strategy_name={self.strategy_name!r}, symbol={self.symbol!r}, "
+                f"total_return={self.total_return:.4f}, trade_count={self.trade_count})")
+    
+    def summary(self) -> Dict:
+        """数值形式的回测指标（to_dict 为格式化后的字符串），用于二进制报告和批量汇总"""
+        summary = {name: getattr(self, name) for name in REPORT_FIELDS}
+        for name in ('initial_capital',) + REPORT_METRICS:
+            summary[name] = float(summary[name])
+        summary['trade_count'] = int(self.trade_count)
+        summary['bars'] = len(self.equity_values)
+        return summary
     
     def to_dict(self) -> Dict:
         """转换为字典"""
@@ -64,6 +752,10 @@ class BacktestResult:
             'sharpe_ratio': f"{self.sharpe_ratio:.2f}",
             'trade_count': self.trade_count,
             'win_rate': f"{self.win_rate:.2%}",
+            'sortino_ratio': f"{self.sortino_ratio:.2f}",
+            'calmar_ratio': f"{self.calmar_ratio:.2f}",
+            'turnover': f"{self.turnover:.2f}",
+            'exposure': f"{self.exposure:.2%}",
         }
     
     def __str__(self) -> str:
@@ -81,26 +773,543 @@ class BacktestResult:
 ║ 年化收益: {self.annualized_return:>11.2%}                               ║
 ║ 最大回撤: {self.max_drawdown:>11.2%}                               ║
 ║ 夏普比率: {self.sharpe_ratio:>11.2f}                               ║
+║ 索提诺:   {self.sortino_ratio:>11.2f}                               ║
+║ 卡玛比率: {self.calmar_ratio:>11.2f}                               ║
 ║ 交易次数: {self.trade_count:>12}                               ║
 ║ 胜率:     {self.win_rate:>11.2%}                               ║
+║ 年换手率: {self.turnover:>11.2f}                               ║
+║ 持仓占比: {self.exposure:>11.2%}                               ║
 ╚══════════════════════════════════════════════════════════╝
 """
 
 
+# 每年的K线数量，按每年252个交易日、每日6.5小时交易计算
+_BARS_PER_YEAR = {'m': 252 * 390, 'h': 252 * 6.5, 'd': 252, 'wk': 52, 'mo': 12}
+
+
+def _periods_per_year(interval: str) -> float:
+    """由数据周期（如 '1m', '1h', '1d', '1wk'）换算每年的K线数量，用于年化夏普比率"""
+    match = re.fullmatch(r'(\d+)(m|h|d|wk|mo)', interval)
+    if match is None:
+        raise ValueError(f"无法识别的数据周期: {interval}，请直接指定 periods_per_year")
+    return _BARS_PER_YEAR[match.group(2)] / int(match.group(1))
+
+
+def _years_between(start, end) -> float:
+    """两个时间点之间的年数（按自然日计，日内数据取小数）"""
+    return (end - start) / pd.Timedelta(days=365.25)
+
+
+def _holding_mask(n: int, trades: np.ndarray, held: bool = False) -> np.ndarray:
+    """
+    由成交记录（TRADE_DTYPE）还原每根K线收盘时是否持仓
+    
+    买入当根K线即计入持仓，卖出当根不计；held 为第一根K线之前是否持仓（分段执行时接续）。
+    """
+    mask = np.full(n, held, dtype=bool)
+    if len(trades):
+        last = np.searchsorted(trades['bar'], np.arange(n), side='right') - 1
+        has_trade = last >= 0
+        mask[has_trade] = trades['side'][last[has_trade]] == 1
+    return mask
+
+
+def _performance_metrics(
+    equity_df: pd.Series,
+    trades: Union[TradeLog, List[Dict]],
+    initial_capital: float,
+    periods_per_year: float = 252
+) -> Dict:
+    """由权益曲线和交易记录计算 BacktestResult 的各项指标（periods_per_year 为每年的K线数量）"""
+    if not isinstance(trades, TradeLog):
+        trades = TradeLog.from_dicts(trades, equity_df.index)
+    
+    metrics = OnlineMetrics(initial_capital, periods_per_year)
+    metrics.update_many(equity_df.index, equity_df.to_numpy(), _holding_mask(len(equity_df), trades.records))
+    metrics.record_trades(trades.records)
+    return metrics.result()
+
+
+class OnlineMetrics:
+    """
+    在线回测指标
+    
+    逐根或逐段接收权益，单次遍历累积收益率的均值/方差（Welford）、下行偏差、回撤峰值、
+    持仓时间、成交金额和胜负统计，不保留权益曲线，内存占用与K线数量无关。
+    批量回测通过 update_many 按块输入，实盘 / 逐根回放通过 update 和 record_trade 逐笔输入，
+    两种方式的结果一致。
+    
+    Args:
+        initial_capital: 初始资金
+        periods_per_year: 每年的K线数量，用于年化夏普 / 索提诺比率；为None时按已处理的K线数和时间跨度推算
+    
+    Example:
+        metrics = OnlineMetrics(100000.0, periods_per_year=252)
+        for date, equity, position in live_feed:
+            metrics.update(date, equity, exposed=position > 0)
+        metrics.record_trade({'type': 'SELL', 'revenue': 10500.0, 'pnl': 500.0})
+        metrics.result()['sortino_ratio']
+    """
+    
+    def __init__(self, initial_capital: float, periods_per_year: Optional[float] = None):
+        self.initial_capital = initial_capital
+        self.periods_per_year = periods_per_year
+        self.reset()
+    
+    def reset(self):
+        """清空累积状态"""
+        self.bars = 0
+        self.exposed_bars = 0  # 收盘时持仓的K线数
+        self.first_date = None
+        self.last_date = None
+        self.last_equity = None
+        self.equity_sum = 0.0  # 用于平均权益（换手率）
+        self.peak = -np.inf
+        self.max_drawdown = 0.0
+        self.return_count = 0
+        self.return_mean = 0.0
+        self.return_m2 = 0.0  # 收益率离差平方和
+        self.downside_sq = 0.0  # 负收益率的平方和（索提诺比率）
+        self.trade_count = 0
+        self.win_count = 0
+        self.loss_count = 0
+        self.traded_amount = 0.0  # 买入成本与卖出收入合计
+    
+    def update(self, date, equity: float, exposed: bool = False):
+        """
+        输入一根K线的权益
+        
+        Args:
+            date: K线时间
+            equity: 收盘权益
+            exposed: 收盘时是否持仓
+        """
+        equity = float(equity)
+        if self.last_equity is None:
+            self.first_date = date
+        else:
+            r = equity / self.last_equity - 1 if self.last_equity != 0 else np.nan
+            if r == r:
+                self.return_count += 1
+                delta = r - self.return_mean
+                self.return_mean += delta / self.return_count
+                self.return_m2 += delta * (r - self.return_mean)
+                if r < 0:
+                    self.downside_sq += r * r
+        
+        self.peak = max(self.peak, equity)
+        self.max_drawdown = min(self.max_drawdown, (equity - self.peak) / self.peak)
+        self.equity_sum += equity
+        self.exposed_bars += bool(exposed)
+        self.bars += 1
+        self.last_date = date
+        self.last_equity = equity
+    
+    def update_many(self, dates: pd.Index, equity: np.ndarray, exposed: Optional[np.ndarray] = None):
+        """
+        输入一段连续K线的权益，按块合并收益率的均值/方差（Chan 并行算法）
+        
+        Args:
+            dates: K线时间
+            equity: 每根K线的收盘权益
+            exposed: 每根K线收盘时是否持仓（布尔数组），None 表示全部空仓
+        """
+        equity = np.asarray(equity, dtype=np.float64)
+        if not len(equity):
+            return
+        
+        if self.last_equity is None:
+            self.first_date = dates[0]
+            previous = equity[:-1]
+            current = equity[1:]
+        else:
+            previous = np.concatenate(([self.last_equity], equity[:-1]))
+            current = equity
+        with np.errstate(divide='ignore', invalid='ignore'):
+            returns = current / previous - 1
+        returns = returns[~np.isnan(returns)]
+        
+        if len(returns):
+            n_a, n_b = self.return_count, len(returns)
+            mean_b = returns.mean()
+            m2_b = float(((returns - mean_b) ** 2).sum())
+            n = n_a + n_b
+            delta = mean_b - self.return_mean
+            self.return_mean += delta * n_b / n
+            self.return_m2 += m2_b + delta * delta * n_a * n_b / n
+            self.return_count = n
+            downside = np.minimum(returns, 0.0)
+            self.downside_sq += float(downside @ downside)
+        
+        peaks = np.maximum(np.maximum.accumulate(equity), self.peak)
+        self.max_drawdown = min(self.max_drawdown, float(((equity - peaks) / peaks).min()))
+        self.peak = float(peaks[-1])
+        self.equity_sum += float(equity.sum())
+        if exposed is not None:
+            self.exposed_bars += int(np.count_nonzero(exposed))
+        self.bars += len(equity)
+        self.last_date = dates[-1]
+        self.last_equity = float(equity[-1])
+    
+    def record_trade(self, trade: Dict):
+        """累积一笔 dict 格式的成交（逐行引擎 / 实盘的交易记录格式）"""
+        if trade['type'] == 'BUY':
+            self.traded_amount += trade['cost']
+            return
+        self.traded_amount += trade['revenue']
+        self.trade_count += 1
+        pnl = trade.get('pnl', 0)
+        self.win_count += pnl > 0
+        self.loss_count += pnl < 0
+    
+    def record_trades(self, trades: np.ndarray):
+        """累积成交记录（TRADE_DTYPE 结构化数组）"""
+        sells = trades['side'] == -1
+        self.traded_amount += float(trades['amount'].sum())
+        self.trade_count += int(np.count_nonzero(sells))
+        self.win_count += int(np.count_nonzero(sells & (trades['pnl'] > 0)))
+        self.loss_count += int(np.count_nonzero(sells & (trades['pnl'] < 0)))
+    
+    def result(self) -> Dict:
+        """
+        当前累积的回测指标
+        
+        除 _performance_metrics 原有指标外:
+            sortino_ratio: 年化超额收益 / 年化下行偏差（以0为目标收益）
+            calmar_ratio: 年化收益率 / 最大回撤的绝对值
+            turnover: 年化换手率，成交金额合计 / 平均权益 / 年数
+            exposure: 收盘时持仓的K线占比
+        """
+        if self.last_equity is None:
+            raise ValueError("尚未输入任何权益数据")
+        
+        final_capital = self.last_equity
+        total_return = (final_capital - self.initial_capital) / self.initial_capital
+        years = _years_between(self.first_date, self.last_date)
+        annualized_return = (1 + total_return) ** (1 / years) - 1 if years > 0 else 0
+        
+        periods_per_year = self.periods_per_year
+        if periods_per_year is None:
+            periods_per_year = (self.bars - 1) / years if years > 0 else 252
+        
+        # 夏普比率 (假设无风险利率为2%)
+        excess_mean = self.return_mean - 0.02 / periods_per_year
+        std = math.sqrt(self.return_m2 / (self.return_count - 1)) if self.return_count > 1 else np.nan
+        sharpe_ratio = np.sqrt(periods_per_year) * excess_mean / std if std != 0 else 0
+        
+        downside = math.sqrt(self.downside_sq / self.return_count) if self.return_count > 0 else np.nan
+        sortino_ratio = np.sqrt(periods_per_year) * excess_mean / downside if downside != 0 else 0
+        
+        calmar_ratio = annualized_return / -self.max_drawdown if self.max_drawdown < 0 else 0
+        
+        turnover = self.traded_amount / (self.equity_sum / self.bars)
+        if years > 0:
+            turnover /= years
+        
+        return {
+            'final_capital': final_capital,
+            'total_return': total_return,
+            'annualized_return': annualized_return,
+            'max_drawdown': self.max_drawdown,
+            'sharpe_ratio': sharpe_ratio,
+            'trade_count': self.trade_count,
+            'win_rate': self.win_count / self.trade_count if self.trade_count > 0 else 0,
+            'sortino_ratio': sortino_ratio,
+            'calmar_ratio': calmar_ratio,
+            'turnover': turnover,
+            'exposure': self.exposed_bars / self.bars,
+        }
+
+
+# ==================== 指标缓存 ====================
+
+class IndicatorCache:
+    """
+    指标缓存
+    
+    按 (数据指纹, 指标, 参数) 缓存计算结果，多个策略在同一份数据上请求相同指标时只计算一次。
+    数据指纹由序列的值和索引计算，不同 Backtester 各自加载的相同行情也能命中。
+    超过 maxsize 时按最近最少使用 (LRU) 淘汰。
+    """
+    
+    def __init__(self, maxsize: int = 256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Tuple, pd.Series]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def fingerprint(series: pd.Series) -> str:
+        """数据指纹：值与索引的哈希"""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(np.ascontiguousarray(series.to_numpy(dtype=np.float64)).tobytes())
+        index = series.index
+        if isinstance(index, pd.DatetimeIndex):
+            digest.update(index.as_unit('ns').asi8.tobytes())
+            digest.update(str(index.tz).encode())
+        else:
+            digest.update(pd.util.hash_pandas_object(index, index=False).to_numpy().tobytes())
+        return digest.hexdigest()
+    
+    def get(self, series: pd.Series, name: str, params: Tuple, compute: Callable[[pd.Series], pd.Series]) -> pd.Series:
+        """读取缓存，未命中时调用 compute(series) 计算并写入；maxsize 为0时直接计算，不计算指纹"""
+        if self.maxsize == 0:
+            self.misses += 1
+            return compute(series)
+        key = (self.fingerprint(series), name, params)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+        
+        value = compute(series)
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return value
+    
+    def sma(self, series: pd.Series, window: int) -> pd.Series:
+        """简单移动平均"""
+        return self.get(series, 'sma', (window,), lambda s: s.rolling(window=window).mean())
+    
+    def rolling_std(self, series: pd.Series, window: int) -> pd.Series:
+        """滚动标准差"""
+        return self.get(series, 'rolling_std', (window,), lambda s: s.rolling(window=window).std())
+    
+    def ema(self, series: pd.Series, span: int) -> pd.Series:
+        """指数移动平均"""
+        return self.get(series, 'ema', (span,), lambda s: s.ewm(span=span).mean())
+    
+    def rsi(self, series: pd.Series, period: int) -> pd.Series:
+        """RSI（涨跌幅的简单滚动均值）"""
+        def compute(prices: pd.Series) -> pd.Series:
+            delta = prices.diff()
+            gain = (delta.where(delta > 0, 0)).rolling(window=period).mean()
+            loss = (-delta.where(delta < 0, 0)).rolling(window=period).mean()
+            rs = gain / loss
+            return 100 - (100 / (1 + rs))
+        return self.get(series, 'rsi', (period,), compute)
+    
+    def stats(self) -> Dict:
+        """命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'size': len(self._entries),
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+    
+    def clear(self):
+        """清空缓存和计数"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+# 进程内共享的默认指标缓存
+INDICATORS = IndicatorCache()
+
+
+# ==================== 增量指标状态 ====================
+# 以下状态类每根K线 O(1) 更新，数值口径与 pandas 的 rolling / ewm 实现一致，
+# 保证 on_bar 回放历史时与 generate_signals 产生相同的信号。
+
+class _RollingMean:
+    """滚动均值：环形缓冲 + 补偿求和（等价于 rolling(window).mean()）"""
+    
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.sum = 0.0
+        self.compensation_add = 0.0
+        self.compensation_remove = 0.0
+        self.neg_count = 0
+        self.same_count = 0  # 末尾连续相同值的个数
+        self.prev = math.nan
+    
+    def update(self, value: float) -> float:
+        self.values.append(value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.nobs -= 1
+                y = -old - self.compensation_remove
+                t = self.sum + y
+                self.compensation_remove = t - self.sum - y
+                self.sum = t
+                if math.copysign(1.0, old) < 0:
+                    self.neg_count -= 1
+        
+        if value == value:
+            self.nobs += 1
+            y = value - self.compensation_add
+            t = self.sum + y
+            self.compensation_add = t - self.sum - y
+            self.sum = t
+            if math.copysign(1.0, value) < 0:
+                self.neg_count += 1
+            self.same_count = self.same_count + 1 if value == self.prev else 1
+            self.prev = value
+        
+        if self.nobs < self.window or self.nobs == 0:
+            return math.nan
+        result = self.sum / self.nobs
+        if self.same_count >= self.nobs:
+            result = self.prev
+        elif self.neg_count == 0 and result < 0:
+            result = 0.0
+        elif self.neg_count == self.nobs and result > 0:
+            result = 0.0
+        return result
+
+
+class _RollingStd:
+    """滚动标准差：Welford 在线方差（对应 rolling(window).std()，ddof=1）"""
+    
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.nobs = 0
+        self.mean = 0.0
+        self.ssqdm = 0.0  # 离差平方和
+        self.removals = 0  # 距上次重新校准的移除次数
+    
+    def _recalibrate(self):
+        """每滚动一整个窗口按两遍法重算一次，消除增删累积的舍入误差（均摊 O(1)）"""
+        observed = [v for v in self.values if v == v]
+        self.nobs = len(observed)
+        self.mean = math.fsum(observed) / self.nobs if observed else 0.0
+        self.ssqdm = math.fsum((v - self.mean) ** 2 for v in observed)
+        self.removals = 0
+    
+    def update(self, value: float) -> float:
+        self.values.append(value)
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            self.removals += 1
+            if self.removals >= self.window:
+                self._recalibrate()
+                return self._result()
+            if old == old:
+                self.nobs -= 1
+                if self.nobs:
+                    delta = old - self.mean
+                    self.mean -= delta / self.nobs
+                    self.ssqdm -= delta * (old - self.mean)
+                else:
+                    self.mean = 0.0
+                    self.ssqdm = 0.0
+        
+        if value == value:
+            self.nobs += 1
+            delta = value - self.mean
+            self.mean += delta / self.nobs
+            self.ssqdm += delta * (value - self.mean)
+        return self._result()
+    
+    def _result(self) -> float:
+        if self.nobs < self.window or self.nobs <= 1:
+            return math.nan
+        variance = self.ssqdm / (self.nobs - 1)
+        return math.sqrt(variance) if variance > 0 else 0.0
+
+
+class _EWMean:
+    """指数加权均值：递推形式（等价于 ewm(span).mean()，adjust=True）"""
+    
+    def __init__(self, span: float):
+        self.decay = 1.0 - 2.0 / (span + 1.0)
+        self.weighted = None
+        self.old_weight = 1.0
+    
+    def update(self, value: float) -> float:
+        if self.weighted is None:
+            self.weighted = value
+            self.old_weight = 1.0
+        elif self.weighted == self.weighted:
+            if value == value:
+                self.old_weight *= self.decay
+                if self.weighted != value:
+                    self.weighted = (self.old_weight * self.weighted + value) / (self.old_weight + 1.0)
+                self.old_weight += 1.0
+            else:
+                self.old_weight *= self.decay
+        elif value == value:
+            self.weighted = value
+        return self.weighted
+
+
 class Strategy(ABC):
     """策略基类"""
     
     def __init__(self, name: str):
         self.name = name
+        self._stream_ready = False
+        self._indicators = None
+    
+    @property
+    def indicators(self) -> IndicatorCache:
+        """指标缓存，默认使用进程内共享的 INDICATORS"""
+        cache = getattr(self, '_indicators', None)
+        return cache if cache is not None else INDICATORS
+    
+    @indicators.setter
+    def indicators(self, cache: Optional[IndicatorCache]):
+        self._indicators = cache
     
     @abstractmethod
     def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
         """
         生成交易信号
         返回DataFrame，包含'signal'列：1(买入), -1(卖出), 0(持有)
+        不要原地修改 data（并行回测时它是共享内存的只读视图），先复制再添加列
         """
         pass
     
+    def reset(self):
+        """重置增量计算状态"""
+        self._bars = []
+        self._stream_ready = True
+    
+    def on_bar(self, bar) -> int:
+        """
+        增量计算：输入一根新K线，返回该K线的信号
+        
+        Args:
+            bar: 包含 'Close' 等字段的 dict 或 Series
+        
+        Returns:
+            1(买入), -1(卖出), 0(持有)，与 generate_signals 在同一位置的信号一致
+        """
+        if not getattr(self, '_stream_ready', False):
+            self.reset()
+        return self._update(bar)
+    
+    def _update(self, bar) -> int:
+        """
+        默认实现：保留全部历史并调用 generate_signals（每根K线 O(N)）
+        内置策略重写为 O(1) 的滚动状态更新
+        """
+        self._bars.append(dict(bar))
+        signal = self.generate_signals(pd.DataFrame(self._bars))['signal'].iloc[-1]
+        return int(signal) if signal == signal else 0
+    
+    def replay(self, data: pd.DataFrame) -> pd.Series:
+        """从头逐根回放历史K线，返回 on_bar 产生的信号序列"""
+        self.reset()
+        signals = [self.on_bar(bar) for bar in data.to_dict('records')]
+        return pd.Series(signals, index=data.index, name='signal')
+    
     def __str__(self):
         return f"Strategy({self.name})"
 
@@ -115,8 +1324,8 @@ class MovingAverageCrossStrategy(Strategy):
     
     def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
         df = data.copy()
-        df['MA_short'] = df['Close'].rolling(window=self.short_window).mean()
-        df['MA_long'] = df['Close'].rolling(window=self.long_window).mean()
+        df['MA_short'] = self.indicators.sma(df['Close'], self.short_window)
+        df['MA_long'] = self.indicators.sma(df['Close'], self.long_window)
         
         # 生成信号
         df['signal'] = 0
@@ -127,6 +1336,21 @@ class MovingAverageCrossStrategy(Strategy):
         df['position'] = df['signal'].diff().fillna(0)
         
         return df
+    
+    def reset(self):
+        super().reset()
+        self._ma_short = _RollingMean(self.short_window)
+        self._ma_long = _RollingMean(self.long_window)
+    
+    def _update(self, bar) -> int:
+        close = float(bar['Close'])
+        ma_short = self._ma_short.update(close)
+        ma_long = self._ma_long.update(close)
+        if ma_short > ma_long:
+            return 1
+        if ma_short < ma_long:
+            return -1
+        return 0
 
 
 class RSIStrategy(Strategy):
@@ -140,12 +1364,7 @@ class RSIStrategy(Strategy):
     
     def calculate_rsi(self, prices: pd.Series) -> pd.Series:
         """计算RSI"""
-        delta = prices.diff()
-        gain = (delta.where(delta > 0, 0)).rolling(window=self.period).mean()
-        loss = (-delta.where(delta < 0, 0)).rolling(window=self.period).mean()
-        rs = gain / loss
-        rsi = 100 - (100 / (1 + rs))
-        return rsi
+        return self.indicators.rsi(prices, self.period)
     
     def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
         df = data.copy()
@@ -156,6 +1375,30 @@ class RSIStrategy(Strategy):
         df.loc[df['RSI'] > self.overbought, 'signal'] = -1  # 超买卖出
         
         return df
+    
+    def reset(self):
+        super().reset()
+        self._gain = _RollingMean(self.period)
+        self._loss = _RollingMean(self.period)
+        self._prev_close = math.nan
+    
+    def _update(self, bar) -> int:
+        close = float(bar['Close'])
+        delta = close - self._prev_close
+        self._prev_close = close
+        
+        # 与 calculate_rsi 一致：首根K线的涨跌幅记为0
+        gain = self._gain.update(delta if delta > 0 else 0.0)
+        loss = self._loss.update(-(delta if delta < 0 else 0.0))
+        if gain != gain or loss != loss or (gain == 0 and loss == 0):
+            return 0
+        rsi = 100.0 if loss == 0 else 100 - (100 / (1 + gain / loss))
+        
+        if rsi > self.overbought:
+            return -1
+        if rsi < self.oversold:
+            return 1
+        return 0
 
 
 class MACDStrategy(Strategy):
@@ -171,10 +1414,10 @@ class MACDStrategy(Strategy):
         df = data.copy()
         
         # 计算MACD
-        ema_fast = df['Close'].ewm(span=self.fast).mean()
-        ema_slow = df['Close'].ewm(span=self.slow).mean()
+        ema_fast = self.indicators.ema(df['Close'], self.fast)
+        ema_slow = self.indicators.ema(df['Close'], self.slow)
         df['MACD'] = ema_fast - ema_slow
-        df['Signal_Line'] = df['MACD'].ewm(span=self.signal).mean()
+        df['Signal_Line'] = self.indicators.ema(df['MACD'], self.signal)
         df['Histogram'] = df['MACD'] - df['Signal_Line']
         
         # 生成信号
@@ -183,6 +1426,22 @@ class MACDStrategy(Strategy):
         df.loc[df['MACD'] < df['Signal_Line'], 'signal'] = -1  # MACD下穿信号线卖出
         
         return df
+    
+    def reset(self):
+        super().reset()
+        self._ema_fast = _EWMean(self.fast)
+        self._ema_slow = _EWMean(self.slow)
+        self._signal_line = _EWMean(self.signal)
+    
+    def _update(self, bar) -> int:
+        close = float(bar['Close'])
+        macd = self._ema_fast.update(close) - self._ema_slow.update(close)
+        signal_line = self._signal_line.update(macd)
+        if macd > signal_line:
+            return 1
+        if macd < signal_line:
+            return -1
+        return 0
 
 
 class BollingerBandsStrategy(Strategy):
@@ -197,8 +1456,8 @@ class BollingerBandsStrategy(Strategy):
         df = data.copy()
         
         # 计算布林带
-        df['MA'] = df['Close'].rolling(window=self.window).mean()
-        df['STD'] = df['Close'].rolling(window=self.window).std()
+        df['MA'] = self.indicators.sma(df['Close'], self.window)
+        df['STD'] = self.indicators.rolling_std(df['Close'], self.window)
         df['Upper'] = df['MA'] + (df['STD'] * self.num_std)
         df['Lower'] = df['MA'] - (df['STD'] * self.num_std)
         
@@ -208,6 +1467,222 @@ class BollingerBandsStrategy(Strategy):
         df.loc[df['Close'] > df['Upper'], 'signal'] = -1  # 触及上轨卖出
         
         return df
+    
+    def reset(self):
+        super().reset()
+        self._ma = _RollingMean(self.window)
+        self._std = _RollingStd(self.window)
+    
+    def _update(self, bar) -> int:
+        close = float(bar['Close'])
+        ma = self._ma.update(close)
+        std = self._std.update(close)
+        if close > ma + (std * self.num_std):
+            return -1
+        if close < ma - (std * self.num_std):
+            return 1
+        return 0
+
+
+# ==================== 图表 ====================
+
+# 分辨率预设：缩略图 / 屏幕预览 / 出版
+CHART_DPI = {'thumbnail': 72, 'screen': 100, 'print': 300}
+
+
+def _chart_dpi(dpi: Union[int, str]) -> int:
+    if isinstance(dpi, str):
+        if dpi not in CHART_DPI:
+            raise ValueError(f"未知的分辨率预设: {dpi}，可选: {', '.join(CHART_DPI)}")
+        return CHART_DPI[dpi]
+    return dpi
+
+
+def _decimate(values: np.ndarray, max_points: Optional[int]) -> np.ndarray:
+    """
+    长序列降采样：均分为 max_points / 2 个桶，每桶保留最小值与最大值所在位置（及首尾点）
+    
+    保留每个桶的极值，曲线的峰谷与最大回撤在图上不变。返回保留点的位置（升序）。
+    """
+    n = len(values)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    buckets = max(1, max_points // 2)
+    size = -(-n // buckets)
+    padded = np.concatenate([values, np.full(buckets * size - n, values[-1])]).reshape(buckets, size)
+    offsets = np.arange(buckets) * size
+    keep = np.concatenate([[0, n - 1], offsets + padded.argmin(axis=1), offsets + padded.argmax(axis=1)])
+    return np.unique(np.minimum(keep, n - 1))
+
+
+def _decimate_series(series: pd.Series, max_points: Optional[int]) -> pd.Series:
+    """按 _decimate 降采样 Series"""
+    return series.iloc[_decimate(series.to_numpy(dtype=np.float64), max_points)]
+
+
+def _chart_x(index: pd.Index) -> np.ndarray:
+    """横轴数值：日期转为 matplotlib 日期数（按当地时间显示），其他索引按原值"""
+    if isinstance(index, pd.DatetimeIndex):
+        from matplotlib.dates import date2num
+        return date2num(index.tz_localize(None).to_numpy() if index.tz is not None else index.to_numpy())
+    return np.asarray(index, dtype=np.float64)
+
+
+def _trade_markers(trades: Union[TradeLog, List[Dict]]) -> Dict[str, Tuple[pd.Index, np.ndarray]]:
+    """买入、盈利卖出、亏损卖出三组成交点 {名称: (日期, 价格)}"""
+    if isinstance(trades, TradeLog):
+        records = trades.records
+        dates = trades.dates[records['bar']]
+        buy = records['side'] == 1
+        win = ~buy & (records['pnl'] > 0)
+        masks = {'buy': buy, 'win': win, 'loss': ~buy & ~win}
+        return {name: (dates[mask], records['price'][mask]) for name, mask in masks.items()}
+    
+    groups = {'buy': [], 'win': [], 'loss': []}
+    for trade in trades:
+        if trade['type'] == 'BUY':
+            name = 'buy'
+        else:
+            name = 'win' if trade.get('pnl', 0) > 0 else 'loss'
+        groups[name].append((trade['date'], trade['price']))
+    return {
+        name: (pd.Index([d for d, _ in points]), np.array([p for _, p in points], dtype=np.float64))
+        for name, points in groups.items()
+    }
+
+
+class ChartTemplate:
+    """
+    可复用的回测图表（价格与买卖点 / 权益曲线 / 回撤）
+    
+    坐标轴、图例、样式只创建一次，每次 draw 只替换各图元的数据，批量出图时同一个模板依次绘制多个结果。
+    未传入 figure 时直接使用 Agg 画布，不经过 pyplot，可在无显示环境和子进程中使用。
+    超过 max_points 的曲线按桶内极值降采样后再绘制；三组成交点各用一次 scatter。
+    """
+    
+    def __init__(
+        self,
+        dpi: Union[int, str] = 'screen',
+        figsize: Tuple[float, float] = (14, 12),
+        max_points: Optional[int] = 2000,
+        figure=None
+    ):
+        """
+        Args:
+            dpi: 保存分辨率，数值或 CHART_DPI 中的预设（'thumbnail' / 'screen' / 'print'）
+            figsize: 图表尺寸（英寸）
+            max_points: 每条曲线最多绘制的点数，None 不降采样
+            figure: 绘制到已有的 matplotlib Figure（如 pyplot 创建的交互窗口）
+        """
+        self.dpi = _chart_dpi(dpi)
+        if figure is None:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            # 画布分辨率与保存分辨率一致，保存时不必按新分辨率重新排版
+            figure = Figure(figsize=figsize, dpi=self.dpi)
+            FigureCanvasAgg(figure)
+        self.figure = figure
+        self.max_points = max_points
+        self._layout_key = None
+        self._fill = None
+        
+        ax1, ax2, ax3 = self.axes = figure.subplots(3, 1)
+        
+        # 1. 价格走势和交易点
+        self._price, = ax1.plot([], [], label='Price', color='gray', alpha=0.7)
+        self._markers = {
+            'buy': ax1.scatter([], [], marker='^', color='red', s=100, zorder=5, label='Buy'),
+            'win': ax1.scatter([], [], marker='v', color='green', s=100, zorder=5, label='Sell (Win)'),
+            'loss': ax1.scatter([], [], marker='v', color='orange', s=100, zorder=5, label='Sell (Loss)'),
+        }
+        self._title = ax1.set_title('', fontsize=14, fontweight='bold')
+        ax1.set_ylabel('Price')
+        ax1.legend()
+        ax1.grid(True, alpha=0.3)
+        
+        # 2. 权益曲线
+        self._equity, = ax2.plot([], [], label='Strategy', color='blue', linewidth=2)
+        self._capital = ax2.axhline(y=0, color='gray', linestyle='--', alpha=0.5, label='Initial Capital')
+        self._return_text = ax2.text(0.02, 0.95, '', transform=ax2.transAxes, fontsize=11, verticalalignment='top',
+                                     bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+        ax2.set_title('Equity Curve', fontsize=12, fontweight='bold')
+        ax2.set_ylabel('Capital')
+        ax2.legend()
+        ax2.grid(True, alpha=0.3)
+        
+        # 3. 回撤曲线
+        self._drawdown, = ax3.plot([], [], color='red', linewidth=1)
+        self._drawdown_title = ax3.set_title('', fontsize=12, fontweight='bold')
+        ax3.set_ylabel('Drawdown')
+        ax3.set_xlabel('Date')
+        ax3.grid(True, alpha=0.3)
+    
+    def draw(self, result: BacktestResult, prices: Optional[pd.Series] = None):
+        """
+        绘制一个回测结果
+        
+        Args:
+            result: 回测结果
+            prices: 收盘价序列，None 时价格图只显示买卖点
+        """
+        ax1, ax2, ax3 = self.axes
+        is_date = isinstance(result.dates, pd.DatetimeIndex)
+        
+        if prices is not None:
+            prices = _decimate_series(prices, self.max_points)
+            self._price.set_data(_chart_x(prices.index), prices.to_numpy(dtype=np.float64))
+        else:
+            self._price.set_data([], [])
+        ax1.relim()
+        for name, (dates, values) in _trade_markers(result.trades).items():
+            points = np.column_stack([_chart_x(dates), values]) if len(values) else np.empty((0, 2))
+            self._markers[name].set_offsets(points)
+            if len(points):
+                ax1.update_datalim(points)
+        self._title.set_text(f'{result.symbol} - {result.strategy_name}')
+        
+        # 降采样保留桶内极值，由降采样后的曲线计算的回撤峰谷不变
+        equity = _decimate_series(result.equity_curve, self.max_points)
+        x = _chart_x(equity.index)
+        values = equity.to_numpy(dtype=np.float64)
+        self._equity.set_data(x, values)
+        self._capital.set_ydata([result.initial_capital, result.initial_capital])
+        self._return_text.set_text(f'Total Return: {result.total_return:.2%}')
+        ax2.relim()
+        
+        cummax = np.maximum.accumulate(values)
+        drawdown = (values - cummax) / cummax
+        self._drawdown.set_data(x, drawdown)
+        if self._fill is not None:
+            self._fill.remove()
+        self._fill = ax3.fill_between(x, drawdown, 0, color='red', alpha=0.3)
+        self._drawdown_title.set_text(f'Drawdown (Max: {result.max_drawdown:.2%})')
+        ax3.relim()
+        
+        for ax in self.axes:
+            if is_date:
+                ax.xaxis_date()
+            ax.autoscale_view()
+        
+        # 布局只在刻度标签变化时重新计算（如权益从六位数变为七位数），否则沿用上一次的结果
+        layout_key = self._tick_labels()
+        if layout_key != self._layout_key:
+            self.figure.tight_layout()
+            self._layout_key = layout_key
+    
+    def _tick_labels(self) -> Tuple:
+        """各坐标轴当前视图下的刻度标签与偏移文字，决定标签所占的宽度"""
+        labels = []
+        for ax in self.axes:
+            for axis in (ax.xaxis, ax.yaxis):
+                formatter = axis.get_major_formatter()
+                labels.append(tuple(formatter.format_ticks(axis.get_majorticklocs())))
+                labels.append(formatter.get_offset())
+        return tuple(labels)
+    
+    def save(self, path: str):
+        """按模板分辨率保存当前图表"""
+        self.figure.savefig(path, dpi=self.dpi)
 
 
 class Backtester:
@@ -222,6 +1697,13 @@ class Backtester:
         initial_capital: float = 100000.0,
         commission: float = 0.001,  # 手续费率
         slippage: float = 0.001,  # 滑点
+        engine: str = 'loop',  # 执行引擎
+        data_store=None,  # 本地行情缓存
+        interval: str = '1d',  # 数据周期
+        stop_loss: Optional[float] = None,  # 止损比例
+        take_profit: Optional[float] = None,  # 止盈比例
+        trace_memory: bool = False,  # 计时时是否统计内存分配峰值
+        periods_per_year: Optional[float] = None,  # 每年K线数量，用于年化
     ):
         """
         初始化回测引擎
@@ -234,7 +1716,18 @@ class Backtester:
             initial_capital: 初始资金
             commission: 手续费率
             slippage: 滑点率
+            engine: 执行引擎，'loop' 逐行遍历 / 'vectorized' 基于NumPy数组
+            data_store: 行情缓存 (如 backtest_data.MarketDataStore)，
+                        提供 get(symbol, start, end, interval) 方法；为None时直接请求yfinance
+            interval: 数据周期，如 '1d', '1h', '1m'
+            stop_loss: 止损比例，如 0.05 表示收盘价跌破买入价5%时卖出；None 不启用
+            take_profit: 止盈比例，如 0.2 表示收盘价高于买入价20%时卖出；None 不启用
+            trace_memory: 各阶段计时时用 tracemalloc 统计内存分配峰值（有额外开销），见 StageTimings
+            periods_per_year: 每年的K线数量，用于年化夏普比率；默认按 interval 换算（'1d' 为252，'1h' 为1638）
         """
+        if engine not in ENGINES:
+            raise ValueError(f"未知的执行引擎: {engine}，可选: {', '.join(ENGINES)}")
+        
         self.symbol = symbol
         self.strategy = strategy
         self.start_date = datetime.strptime(start_date, '%Y-%m-%d')
@@ -242,12 +1735,25 @@ class Backtester:
         self.initial_capital = initial_capital
         self.commission = commission
         self.slippage = slippage
+        self.engine = engine
+        self.data_store = data_store
+        self.interval = interval
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.trace_memory = trace_memory
+        self.periods_per_year = periods_per_year if periods_per_year is not None else _periods_per_year(interval)
         self.data = None
         self.trades = []
-        
+        self.metrics = None  # 执行引擎在成交的同时累积的 OnlineMetrics
+        self.timings = self._new_timings()
+    
+    def _new_timings(self) -> StageTimings:
+        labels = {'symbol': self.symbol, 'strategy': self.strategy.name, 'engine': self.engine}
+        return StageTimings(labels, trace_memory=self.trace_memory)
+    
     def fetch_data(self) -> pd.DataFrame:
         """获取历史数据"""
-        if not YFINANCE_AVAILABLE:
+        if self.data_store is None and not YFINANCE_AVAILABLE:
             raise ImportError("yfinance 未安装，无法获取数据。运行: pip install yfinance")
         
         print(f"📊 正在获取 {self.symbol} 数据 ({self.start_date.date()} ~ {self.end_date.date()})...")
@@ -255,14 +1761,20 @@ class Backtester:
         # 多获取一些数据用于计算指标
         extended_start = self.start_date - timedelta(days=100)
         
-        ticker = yf.Ticker(self.symbol)
-        data = ticker.history(start=extended_start, end=self.end_date)
-        
-        if data.empty:
-            raise ValueError(f"无法获取 {self.symbol} 的数据")
-        
-        # 过滤到指定日期范围
-        self.data = data[data.index >= self.start_date.strftime('%Y-%m-%d')].copy()
+        with self.timings.stage('fetch_data') as record:
+            if self.data_store is not None:
+                data = self.data_store.get(self.symbol, extended_start, self.end_date, interval=self.interval)
+            else:
+                import yfinance as yf
+                ticker = yf.Ticker(self.symbol)
+                data = ticker.history(start=extended_start, end=self.end_date, interval=self.interval)
+            
+            if data.empty:
+                raise ValueError(f"无法获取 {self.symbol} 的数据")
+            
+            # 过滤到指定日期范围
+            self.data = data[data.index >= self.start_date.strftime('%Y-%m-%d')].copy()
+            record['rows'] = len(self.data)
         
         print(f"✅ 获取到 {len(self.data)} 条数据")
         return self.data
@@ -282,20 +1794,9 @@ class Backtester:
         
         # 生成随机游走模拟数据
         print("📊 生成模拟数据...")
-        dates = pd.date_range(start=self.start_date - timedelta(days=50), 
+        dates = pd.date_range(start=self.start_date - timedelta(days=50),
                              end=self.end_date, freq='D')
-        
-        np.random.seed(42)
-        returns = np.random.normal(0.001, 0.02, len(dates))
-        prices = 100 * np.exp(np.cumsum(returns))
-        
-        self.data = pd.DataFrame({
-            'Open': prices * (1 + np.random.normal(0, 0.001, len(dates))),
-            'High': prices * (1 + abs(np.random.normal(0, 0.01, len(dates)))),
-            'Low': prices * (1 - abs(np.random.normal(0, 0.01, len(dates)))),
-            'Close': prices,
-            'Volume': np.random.randint(1000000, 10000000, len(dates))
-        }, index=dates)
+        self.data = _random_walk_ohlcv(dates)
         
         # 过滤到指定日期范围
         self.data = self.data[self.data.index >= self.start_date.strftime('%Y-%m-%d')]
@@ -304,23 +1805,53 @@ class Backtester:
         return self.data
     
     def run(self) -> BacktestResult:
-        """运行回测"""
+        """
+        运行回测
+        
+        各阶段计时记录在 result.timings，之后对该结果调用 plot_results / save_report 的耗时也会追加其中。
+        """
         if self.data is None:
             self.fetch_data()
         
         # 生成信号
-        df = self.strategy.generate_signals(self.data)
+        with self.timings.stage('generate_signals', rows=len(self.data)):
+            df = self.strategy.generate_signals(self.data)
         
-        # 初始化
+        with self.timings.stage('execute', rows=len(df)):
+            if self.engine == 'vectorized':
+                equity_curve = self._execute_vectorized(df)
+            else:
+                equity_curve = self._execute_loop(df)
+        
+        # 计算回测指标
+        with self.timings.stage('metrics', rows=len(equity_curve)):
+            result = self._calculate_metrics(equity_curve)
+        
+        result.timings, self.timings = self.timings, self._new_timings()
+        return result
+    
+    def _execute_loop(self, df: pd.DataFrame) -> List[Dict]:
+        """逐行执行引擎（参考实现）"""
         capital = self.initial_capital
         position = 0  # 持仓数量
+        entry_price = 0.0  # 持仓买入价（含滑点）
+        open_cost = 0.0  # 持仓总成本（含手续费）
         equity_curve = []
         self.trades = []
+        self.metrics = OnlineMetrics(self.initial_capital, self.periods_per_year)
         
         for i, (date, row) in enumerate(df.iterrows()):
             price = row['Close']
             signal = row.get('signal', 0)
             
+            # 止损 / 止盈
+            stopped = False
+            if position > 0:
+                if self.stop_loss is not None and price <= entry_price * (1 - self.stop_loss):
+                    stopped = True
+                elif self.take_profit is not None and price >= entry_price * (1 + self.take_profit):
+                    stopped = True
+            
             # 买入信号
             if signal == 1 and position == 0:
                 # 计算可买入数量（考虑手续费和滑点）
@@ -335,6 +1866,8 @@ class Backtester:
                     if total_cost <= capital:
                         position = max_shares
                         capital -= total_cost
+                        entry_price = cost_price
+                        open_cost = total_cost
                         self.trades.append({
                             'date': date,
                             'type': 'BUY',
@@ -343,21 +1876,18 @@ class Backtester:
                             'cost': total_cost,
                             'capital': capital
                         })
+                        self.metrics.record_trade(self.trades[-1])
             
-            # 卖出信号
-            elif signal == -1 and position > 0:
+            # 卖出信号（或触发止损/止盈）
+            elif (signal == -1 or stopped) and position > 0:
                 sell_price = price * (1 - self.slippage)
                 revenue = position * sell_price
                 commission_fee = revenue * self.commission
                 net_revenue = revenue - commission_fee
                 
-                # 计算盈亏
-                buy_trade = next((t for t in reversed(self.trades) if t['type'] == 'BUY'), None)
-                if buy_trade:
-                    pnl = net_revenue - buy_trade['cost']
-                    pnl_pct = pnl / buy_trade['cost']
-                else:
-                    pnl = pnl_pct = 0
+                # 计算盈亏（持仓成本在买入时记录，O(1)）
+                pnl = net_revenue - open_cost
+                pnl_pct = pnl / open_cost
                 
                 capital += net_revenue
                 self.trades.append({
@@ -370,44 +1900,49 @@ class Backtester:
                     'pnl_pct': pnl_pct,
                     'capital': capital
                 })
+                self.metrics.record_trade(self.trades[-1])
                 position = 0
             
             # 计算当前权益
             equity = capital + position * price
             equity_curve.append({'date': date, 'equity': equity})
+            self.metrics.update(date, equity, exposed=position > 0)
         
-        # 计算回测指标
-        return self._calculate_metrics(equity_curve)
+        return equity_curve
     
-    def _calculate_metrics(self, equity_curve: List[Dict]) -> BacktestResult:
-        """计算回测指标"""
-        equity_df = pd.DataFrame(equity_curve).set_index('date')['equity']
-        
-        # 基本指标
-        final_capital = equity_df.iloc[-1]
-        total_return = (final_capital - self.initial_capital) / self.initial_capital
-        
-        # 年化收益率
-        days = (equity_df.index[-1] - equity_df.index[0]).days
-        years = days / 365.25
-        annualized_return = (1 + total_return) ** (1 / years) - 1 if years > 0 else 0
-        
-        # 最大回撤
-        cummax = equity_df.cummax()
-        drawdown = (equity_df - cummax) / cummax
-        max_drawdown = drawdown.min()
+    def _execute_vectorized(self, df: pd.DataFrame) -> pd.Series:
+        """向量化执行引擎"""
+        close = df['Close'].to_numpy(dtype=np.float64)
+        if 'signal' in df.columns:
+            signal = df['signal'].to_numpy()
+        else:
+            signal = np.zeros(len(df))
         
-        # 夏普比率 (假设无风险利率为2%)
-        daily_returns = equity_df.pct_change().dropna()
-        risk_free_rate = 0.02 / 252  # 日无风险利率
-        excess_returns = daily_returns - risk_free_rate
-        sharpe_ratio = np.sqrt(252) * excess_returns.mean() / daily_returns.std() if daily_returns.std() != 0 else 0
+        equity, trades = _fill_kernel(
+            close, signal, self.initial_capital, self.commission, self.slippage,
+            self.stop_loss, self.take_profit
+        )
+        dates = _shared_dates(_equity_index(df.index))
+        self.trades = TradeLog(trades, dates)
+        self.metrics = OnlineMetrics(self.initial_capital, self.periods_per_year)
+        self.metrics.update_many(dates, equity, _holding_mask(len(equity), trades))
+        self.metrics.record_trades(trades)
+        return pd.Series(equity, index=dates, name='equity')
+    
+    def _calculate_metrics(self, equity_curve) -> BacktestResult:
+        """计算回测指标"""
+        if isinstance(equity_curve, pd.Series):
+            equity_df = equity_curve
+        else:
+            equity_df = pd.DataFrame(equity_curve).set_index('date')['equity']
+        if not isinstance(self.trades, TradeLog):
+            self.trades = TradeLog.from_dicts(self.trades, _shared_dates(equity_df.index))
         
-        # 交易统计
-        completed_trades = [t for t in self.trades if t['type'] == 'SELL']
-        trade_count = len(completed_trades)
-        win_count = sum(1 for t in completed_trades if t.get('pnl', 0) > 0)
-        win_rate = win_count / trade_count if trade_count > 0 else 0
+        # 执行引擎已在成交时单次遍历累积指标；传入其他权益曲线时重新计算
+        if self.metrics is not None and self.metrics.bars == len(equity_df) and self.metrics.last_date == equity_df.index[-1]:
+            metrics = self.metrics.result()
+        else:
+            metrics = _performance_metrics(equity_df, self.trades, self.initial_capital, self.periods_per_year)
         
         return BacktestResult(
             strategy_name=self.strategy.name,
@@ -415,107 +1950,192 @@ class Backtester:
             start_date=self.start_date.strftime('%Y-%m-%d'),
             end_date=self.end_date.strftime('%Y-%m-%d'),
             initial_capital=self.initial_capital,
-            final_capital=final_capital,
-            total_return=total_return,
-            annualized_return=annualized_return,
-            max_drawdown=max_drawdown,
-            sharpe_ratio=sharpe_ratio,
-            trade_count=trade_count,
-            win_rate=win_rate,
             equity_curve=equity_df,
-            trades=self.trades
+            trades=self.trades,
+            **metrics
         )
     
-    def plot_results(self, result: BacktestResult, save_path: Optional[str] = None):
-        """可视化回测结果"""
+    def plot_results(
+        self,
+        result: BacktestResult,
+        save_path: Optional[str] = None,
+        dpi: Union[int, str] = 'print',
+        max_points: Optional[int] = 5000
+    ):
+        """
+        可视化回测结果
+        
+        Args:
+            result: 回测结果
+            save_path: 保存路径；None 时在窗口中显示
+            dpi: 保存分辨率，数值或 CHART_DPI 中的预设（'thumbnail' / 'screen' / 'print'）
+            max_points: 每条曲线最多绘制的点数，None 不降采样
+        
+        批量出图见 backtest_parallel.render_charts。
+        """
         if not MATPLOTLIB_AVAILABLE:
             print("⚠️  matplotlib 未安装，无法生成图表")
             print("   运行: pip install matplotlib")
             return None
         
-        fig, axes = plt.subplots(3, 1, figsize=(14, 12))
-        
-        # 1. 价格走势和交易点
-        ax1 = axes[0]
-        ax1.plot(self.data.index, self.data['Close'], label='Price', color='gray', alpha=0.7)
-        
-        # 标记买卖点
-        for trade in result.trades:
-            if trade['type'] == 'BUY':
-                ax1.scatter(trade['date'], trade['price'], marker='^', color='red', s=100, zorder=5, label='Buy' if trade == result.trades[0] else '')
-            else:
-                color = 'green' if trade.get('pnl', 0) > 0 else 'orange'
-                ax1.scatter(trade['date'], trade['price'], marker='v', color=color, s=100, zorder=5, label='Sell (Win)' if color == 'green' and trade == result.trades[1] else 'Sell (Loss)' if color == 'orange' and trade == result.trades[1] else '')
-        
-        ax1.set_title(f'{result.symbol} - {result.strategy_name}', fontsize=14, fontweight='bold')
-        ax1.set_ylabel('Price')
-        ax1.legend()
-        ax1.grid(True, alpha=0.3)
-        
-        # 2. 权益曲线
-        ax2 = axes[1]
-        ax2.plot(result.equity_curve.index, result.equity_curve, label='Strategy', color='blue', linewidth=2)
-        ax2.axhline(y=result.initial_capital, color='gray', linestyle='--', alpha=0.5, label='Initial Capital')
-        
-        # 添加收益率标注
-        ax2.text(0.02, 0.95, f'Total Return: {result.total_return:.2%}', 
-                transform=ax2.transAxes, fontsize=11, verticalalignment='top',
-                bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
-        
-        ax2.set_title('Equity Curve', fontsize=12, fontweight='bold')
-        ax2.set_ylabel('Capital')
-        ax2.legend()
-        ax2.grid(True, alpha=0.3)
-        
-        # 3. 回撤曲线
-        ax3 = axes[2]
-        cummax = result.equity_curve.cummax()
-        drawdown = (result.equity_curve - cummax) / cummax
-        ax3.fill_between(drawdown.index, drawdown, 0, color='red', alpha=0.3)
-        ax3.plot(drawdown.index, drawdown, color='red', linewidth=1)
-        ax3.set_title(f'Drawdown (Max: {result.max_drawdown:.2%})', fontsize=12, fontweight='bold')
-        ax3.set_ylabel('Drawdown')
-        ax3.set_xlabel('Date')
-        ax3.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
+        timings = result.timings if result.timings is not None else self.timings
+        with timings.stage('plot', rows=len(result.equity_values)):
+            return self._draw_results(result, save_path, dpi, max_points)
+    
+    def _draw_results(
+        self,
+        result: BacktestResult,
+        save_path: Optional[str] = None,
+        dpi: Union[int, str] = 'print',
+        max_points: Optional[int] = 5000
+    ):
+        prices = self.data['Close'] if self.data is not None else None
         
         if save_path:
-            plt.savefig(save_path, dpi=300, bbox_inches='tight')
+            # 保存文件时直接使用 Agg 画布，不创建 pyplot 窗口
+            chart = ChartTemplate(dpi=dpi, max_points=max_points)
+            chart.draw(result, prices)
+            chart.save(save_path)
             print(f"📊 图表已保存至: {save_path}")
         else:
+            plt = _pyplot()
+            chart = ChartTemplate(dpi=dpi, max_points=max_points, figure=plt.figure(figsize=(14, 12)))
+            chart.draw(result, prices)
             plt.show()
         
-        return fig
+        return chart.figure
     
-    def save_report(self, result: BacktestResult, filepath: str):
-        """保存回测报告"""
-        report = {
-            'summary': result.to_dict(),
-            'trades': result.trades,
-            'equity_curve': result.equity_curve.to_dict()
-        }
+    def save_report(self, result: BacktestResult, filepath: str, format: Optional[str] = None):
+        """
+        保存回测报告
         
-        with open(filepath, 'w') as f:
-            json.dump(report, f, indent=2, default=str)
+        Args:
+            result: 回测结果
+            filepath: 保存路径
+            format: 'json' 便于阅读 / 'npz' 压缩的列式二进制格式（体积小、写入快，由 load_report 读取）；
+                    None 时按扩展名判断，'.npz' 为二进制，其余为 JSON
+        """
+        if format is None:
+            format = 'npz' if str(filepath).endswith('.npz') else 'json'
+        if format not in REPORT_FORMATS:
+            raise ValueError(f"未知的报告格式: {format}，可选: {', '.join(REPORT_FORMATS)}")
+        
+        timings = result.timings if result.timings is not None else self.timings
+        with timings.stage('save_report', rows=len(result.equity_values)):
+            if format == 'npz':
+                np.savez_compressed(filepath, **_report_arrays(result))
+            else:
+                report = {
+                    'summary': result.to_dict(),
+                    'trades': list(result.trades),
+                    # JSON 键必须是字符串
+                    'equity_curve': dict(zip(result.dates.astype(str), result.equity_values.tolist()))
+                }
+                
+                with open(filepath, 'w') as f:
+                    json.dump(report, f, indent=2, default=str)
         
         print(f"📄 报告已保存至: {filepath}")
 
 
+# ==================== 二进制报告 ====================
+
+# save_report 支持的格式
+REPORT_FORMATS = ('json', 'npz')
+
+
+def _encode_dates(dates: pd.Index) -> Tuple[np.ndarray, Dict]:
+    """日期索引编码为数组：DatetimeIndex 保存为 int64 纳秒（UTC）和时区，其他索引按原值保存"""
+    if isinstance(dates, pd.DatetimeIndex):
+        tz = str(dates.tz) if dates.tz is not None else None
+        return dates.as_unit('ns').asi8, {'kind': 'datetime', 'tz': tz}
+    values = dates.to_numpy()
+    if values.dtype == object:
+        values = values.astype(str)
+    return values, {'kind': 'values', 'tz': None}
+
+
+def _decode_dates(values: np.ndarray, meta: Dict) -> pd.Index:
+    """_encode_dates 的逆变换，返回权益曲线索引"""
+    if meta['kind'] == 'datetime':
+        dates = pd.DatetimeIndex(values.view('datetime64[ns]'))
+        if meta['tz']:
+            dates = dates.tz_localize('UTC').tz_convert(meta['tz'])
+        return _equity_index(dates)
+    return _equity_index(pd.Index(values))
+
+
+def _report_arrays(result: BacktestResult) -> Dict[str, np.ndarray]:
+    """
+    报告的列式数组：权益、日期、成交记录 (TRADE_DTYPE) 和 JSON 格式的数值摘要
+    
+    非 TradeLog 的交易记录（如组合回测带 symbol 字段的 dict）以 JSON 文本保存；
+    TradeLog 引用的日期索引与权益曲线不同时（如流式回测降采样）另存 trade_dates。
+    """
+    dates, date_meta = _encode_dates(result.dates)
+    meta = {'summary': result.summary(), 'dates': date_meta}
+    arrays = {'equity': result.equity_values, 'dates': dates}
+    if isinstance(result.trades, TradeLog):
+        arrays['trades'] = result.trades.records
+        if result.trades.dates is not result.dates and not result.trades.dates.equals(result.dates):
+            arrays['trade_dates'], meta['trade_dates'] = _encode_dates(result.trades.dates)
+    else:
+        meta['trades'] = json.loads(json.dumps(list(result.trades), default=str))
+    arrays['meta'] = np.array(json.dumps(meta))
+    return arrays
+
+
+def _result_from_arrays(
+    meta: Dict,
+    equity: np.ndarray,
+    dates: np.ndarray,
+    trades: Optional[np.ndarray] = None,
+    trade_dates: Optional[np.ndarray] = None
+) -> BacktestResult:
+    """由 _report_arrays 的各部分重建 BacktestResult（不含阶段计时）"""
+    summary = {name: meta['summary'][name] for name in REPORT_FIELDS}
+    result = BacktestResult(
+        equity_curve=pd.Series(equity, index=_decode_dates(dates, meta['dates']), name='equity'),
+        trades=meta.get('trades', []),
+        **summary
+    )
+    if trades is not None:
+        index = result.dates if trade_dates is None else _decode_dates(trade_dates, meta['trade_dates'])
+        result.trades = TradeLog(trades, index)
+    return result
+
+
+def load_report(filepath: str) -> BacktestResult:
+    """读取 save_report(format='npz') 保存的报告"""
+    with np.load(filepath, allow_pickle=False) as data:
+        meta = json.loads(str(data['meta']))
+        arrays = {key: data[key] for key in ('trades', 'trade_dates') if key in data.files}
+        return _result_from_arrays(meta, data['equity'], data['dates'], **arrays)
+
+
 def compare_strategies(
     symbol: str,
     strategies: List[Strategy],
     start_date: str,
     end_date: str,
-    initial_capital: float = 100000.0
+    initial_capital: float = 100000.0,
+    engine: str = 'loop',
+    data_store=None,
+    trace_memory: bool = False
 ) -> pd.DataFrame:
     """
     对比多个策略
     
+    Args:
+        data_store: 本地行情缓存，见 Backtester
+        trace_memory: 阶段计时是否统计内存分配峰值，见 Backtester
+    
     Returns:
-        DataFrame 包含各策略的回测指标
+        DataFrame 包含各策略的回测指标；
+        各策略的阶段计时在 attrs['timings'] = {策略名: StageTimings}，可用 timings_to_prometheus 导出
     """
     results = []
+    timings = {}
     
     for strategy in strategies:
         print(f"\n{'='*60}")
@@ -527,17 +2147,322 @@ def compare_strategies(
             strategy=strategy,
             start_date=start_date,
             end_date=end_date,
-            initial_capital=initial_capital
+            initial_capital=initial_capital,
+            engine=engine,
+            data_store=data_store,
+            trace_memory=trace_memory
         )
         
         try:
             result = backtester.run()
             results.append(result.to_dict())
+            timings[strategy.name] = result.timings
             print(result)
         except Exception as e:
+            timings[strategy.name] = backtester.timings
             print(f"❌ 回测失败: {e}")
     
-    return pd.DataFrame(results)
+    df = pd.DataFrame(results)
+    df.attrs['timings'] = timings
+    return df
+
+
+def _expand_param_grid(param_grid) -> List[Dict]:
+    """展开参数网格：支持 {参数名: 取值列表} 或 参数字典列表"""
+    if isinstance(param_grid, dict):
+        names = list(param_grid.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*param_grid.values())]
+    return [dict(params) for params in param_grid]
+
+
+def _indicator_matrix(cache: Dict, keys: List[Tuple], compute: Callable) -> np.ndarray:
+    """按列组装指标矩阵，每个不同的指标只计算一次"""
+    unique = list(dict.fromkeys(keys))
+    for key in unique:
+        if key not in cache:
+            cache[key] = np.asarray(compute(key), dtype=np.float64)
+    if cache[unique[0]].ndim == 2:
+        # 路径模式（见 _signal_matrix）：单个策略，指标本身就是 (K线 × 路径) 矩阵
+        return cache[keys[0]]
+    columns = np.column_stack([cache[key] for key in unique])
+    position = {key: i for i, key in enumerate(unique)}
+    return columns[:, [position[key] for key in keys]]
+
+
+def _ma_cross_signal_matrix(data: pd.DataFrame, strategies: List[Strategy], cache: Dict) -> np.ndarray:
+    close = data['Close']
+    indicators = strategies[0].indicators
+    sma = lambda key: indicators.sma(close, key[1])
+    ma_short = _indicator_matrix(cache, [('sma', s.short_window) for s in strategies], sma)
+    ma_long = _indicator_matrix(cache, [('sma', s.long_window) for s in strategies], sma)
+    
+    signal = np.zeros(ma_short.shape, dtype=np.int8)
+    signal[ma_short > ma_long] = 1
+    signal[ma_short < ma_long] = -1
+    return signal
+
+
+def _rsi_signal_matrix(data: pd.DataFrame, strategies: List[Strategy], cache: Dict) -> np.ndarray:
+    close = data['Close']
+    indicators = strategies[0].indicators
+    rsi = _indicator_matrix(
+        cache, [('rsi', s.period) for s in strategies],
+        lambda key: indicators.rsi(close, key[1])
+    )
+    oversold = np.array([s.oversold for s in strategies], dtype=np.float64)
+    overbought = np.array([s.overbought for s in strategies], dtype=np.float64)
+    
+    signal = np.zeros(rsi.shape, dtype=np.int8)
+    signal[rsi < oversold] = 1
+    signal[rsi > overbought] = -1
+    return signal
+
+
+def _macd_signal_matrix(data: pd.DataFrame, strategies: List[Strategy], cache: Dict) -> np.ndarray:
+    close = data['Close']
+    indicators = strategies[0].indicators
+    
+    def macd(key):
+        _, fast, slow = key
+        return indicators.ema(close, fast) - indicators.ema(close, slow)
+    
+    def signal_line(key):
+        _, fast, slow, span = key
+        values = _indicator_matrix(cache, [('macd', fast, slow)], macd)
+        if isinstance(close, pd.DataFrame):
+            macd_line = pd.DataFrame(values, index=close.index)
+        else:
+            macd_line = pd.Series(values[:, 0], index=close.index)
+        return indicators.ema(macd_line, span)
+    
+    macd_line = _indicator_matrix(cache, [('macd', s.fast, s.slow) for s in strategies], macd)
+    signal_lines = _indicator_matrix(
+        cache, [('macd_signal', s.fast, s.slow, s.signal) for s in strategies], signal_line
+    )
+    
+    signal = np.zeros(macd_line.shape, dtype=np.int8)
+    signal[macd_line > signal_lines] = 1
+    signal[macd_line < signal_lines] = -1
+    return signal
+
+
+def _bollinger_signal_matrix(data: pd.DataFrame, strategies: List[Strategy], cache: Dict) -> np.ndarray:
+    close = data['Close']
+    indicators = strategies[0].indicators
+    ma = _indicator_matrix(
+        cache, [('sma', s.window) for s in strategies],
+        lambda key: indicators.sma(close, key[1])
+    )
+    std = _indicator_matrix(
+        cache, [('rolling_std', s.window) for s in strategies],
+        lambda key: indicators.rolling_std(close, key[1])
+    )
+    num_std = np.array([s.num_std for s in strategies], dtype=np.float64)
+    upper = ma + (std * num_std)
+    lower = ma - (std * num_std)
+    prices = close.to_numpy(dtype=np.float64)
+    if prices.ndim == 1:
+        prices = prices[:, None]
+    
+    signal = np.zeros(ma.shape, dtype=np.int8)
+    signal[prices < lower] = 1
+    signal[prices > upper] = -1
+    return signal
+
+
+# 支持矩阵化信号计算的内置策略；其他策略逐个调用 generate_signals
+_SIGNAL_MATRIX_BUILDERS = {
+    MovingAverageCrossStrategy: _ma_cross_signal_matrix,
+    RSIStrategy: _rsi_signal_matrix,
+    MACDStrategy: _macd_signal_matrix,
+    BollingerBandsStrategy: _bollinger_signal_matrix,
+}
+
+
+def _signal_matrix(data: pd.DataFrame, strategies: List[Strategy], cache: Dict) -> np.ndarray:
+    """
+    生成 (K线 × 参数组合) 信号矩阵
+    
+    内置策略的矩阵构建函数使用 strategies[0].indicators 计算指标。
+    路径模式：只有一个内置策略、data['Close'] 为 (K线 × 路径) 的 DataFrame 时，返回 (K线 × 路径) 信号矩阵
+    （蒙特卡洛检验在全部合成路径上一次计算）。
+    """
+    builder = _SIGNAL_MATRIX_BUILDERS.get(type(strategies[0]))
+    if builder is not None:
+        return builder(data, strategies, cache)
+    
+    columns = []
+    for strategy in strategies:
+        df = strategy.generate_signals(data)
+        columns.append(df['signal'].to_numpy() if 'signal' in df.columns else np.zeros(len(df)))
+    return np.column_stack(columns)
+
+
+def _matrix_metrics(
+    equity: np.ndarray,
+    index: pd.Index,
+    initial_capital: float,
+    periods_per_year: float = 252
+) -> Dict[str, np.ndarray]:
+    """对 (K线 × 参数组合) 权益矩阵按列计算回测指标，口径与 _calculate_metrics 一致"""
+    equity_df = pd.DataFrame(equity)
+    
+    final_capital = equity[-1]
+    total_return = (final_capital - initial_capital) / initial_capital
+    
+    years = _years_between(index[0], index[-1])
+    if years > 0:
+        annualized_return = (1 + total_return) ** (1 / years) - 1
+    else:
+        annualized_return = np.zeros_like(total_return)
+    
+    cummax = equity_df.cummax()
+    max_drawdown = ((equity_df - cummax) / cummax).min().to_numpy()
+    
+    daily_returns = equity_df.pct_change().iloc[1:]
+    risk_free_rate = 0.02 / periods_per_year
+    mean_excess = (daily_returns - risk_free_rate).mean().to_numpy()
+    std = daily_returns.std().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sharpe_ratio = np.where(std != 0, np.sqrt(periods_per_year) * mean_excess / std, 0.0)
+    
+    return {
+        'final_capital': final_capital,
+        'total_return': total_return,
+        'annualized_return': annualized_return,
+        'max_drawdown': max_drawdown,
+        'sharpe_ratio': sharpe_ratio,
+    }
+
+
+def _evaluate_signal_matrix(
+    close: np.ndarray,
+    signals: np.ndarray,
+    index: pd.Index,
+    initial_capital: float,
+    commission: float,
+    slippage: float,
+    stop_loss: Optional[float] = None,
+    take_profit: Optional[float] = None,
+    periods_per_year: float = 252
+) -> Tuple[np.ndarray, Dict[str, np.ndarray]]:
+    """
+    逐列执行 (K线 × 参数组合) 信号矩阵
+    
+    close 为一维时所有列共用同一价格序列；为 (K线 × 列) 矩阵时每列使用各自的价格。
+    
+    Returns:
+        (权益矩阵, 按列计算的回测指标，含 trade_count 和 win_rate)
+    """
+    k = signals.shape[1]
+    close = np.asarray(close, dtype=np.float64)
+    equity = np.empty((len(close), k), dtype=np.float64)
+    trade_count = np.zeros(k, dtype=np.int64)
+    win_count = np.zeros(k, dtype=np.int64)
+    for j in range(k):
+        equity[:, j], trades = _fill_kernel(
+            close[:, j] if close.ndim == 2 else close, signals[:, j],
+            initial_capital, commission, slippage, stop_loss, take_profit
+        )
+        sells = trades['side'] == -1
+        trade_count[j] = np.count_nonzero(sells)
+        win_count[j] = np.count_nonzero(sells & (trades['pnl'] > 0))
+    
+    metrics = _matrix_metrics(equity, index, initial_capital, periods_per_year)
+    metrics['trade_count'] = trade_count
+    with np.errstate(divide='ignore', invalid='ignore'):
+        metrics['win_rate'] = np.where(trade_count > 0, win_count / np.maximum(trade_count, 1), 0.0)
+    return equity, metrics
+
+
+def sweep(
+    symbol: str,
+    strategy_cls: type,
+    param_grid,
+    start_date: str,
+    end_date: str,
+    initial_capital: float = 100000.0,
+    commission: float = 0.001,
+    slippage: float = 0.001,
+    data: Optional[pd.DataFrame] = None,
+    batch_size: int = 500,
+    interval: str = '1d',
+    stop_loss: Optional[float] = None,
+    take_profit: Optional[float] = None,
+    periods_per_year: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    批量参数扫描
+    
+    数据只加载一次，每个不同的指标窗口只计算一次，所有参数组合组成
+    (K线 × 参数组合) 的信号矩阵统一执行并按列计算指标。
+    
+    Args:
+        symbol: 股票代码
+        strategy_cls: 策略类 (如 MovingAverageCrossStrategy)
+        param_grid: 参数网格，{参数名: 取值列表} 或 参数字典列表
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        initial_capital: 初始资金
+        commission: 手续费率
+        slippage: 滑点率
+        data: 自定义行情数据，为None时通过 Backtester.fetch_data 获取
+        batch_size: 每批处理的参数组合数量，控制矩阵内存占用
+        interval: 数据周期，如 '1d', '1h', '1m'
+        stop_loss: 止损比例，与 Backtester 相同；None 不启用
+        take_profit: 止盈比例，与 Backtester 相同；None 不启用
+        periods_per_year: 每年的K线数量，用于年化夏普比率；默认按 interval 换算
+    
+    Returns:
+        DataFrame 每行一个参数组合，包含参数列和数值型回测指标
+    """
+    combos = _expand_param_grid(param_grid)
+    if not combos:
+        raise ValueError("参数网格为空")
+    strategies = [strategy_cls(**params) for params in combos]
+    
+    backtester = Backtester(
+        symbol=symbol,
+        strategy=strategies[0],
+        start_date=start_date,
+        end_date=end_date,
+        initial_capital=initial_capital,
+        commission=commission,
+        slippage=slippage,
+        interval=interval,
+        stop_loss=stop_loss,
+        take_profit=take_profit,
+        periods_per_year=periods_per_year
+    )
+    if data is None:
+        data = backtester.fetch_data()
+    else:
+        data = backtester.load_mock_data(data)
+    
+    print(f"🔍 参数扫描: {strategy_cls.__name__} 共 {len(strategies)} 组参数")
+    
+    close = data['Close'].to_numpy(dtype=np.float64)
+    cache = {}
+    rows = []
+    
+    for batch_start in range(0, len(strategies), batch_size):
+        batch = strategies[batch_start:batch_start + batch_size]
+        signals = _signal_matrix(data, batch, cache)
+        _, metrics = _evaluate_signal_matrix(
+            close, signals, data.index, initial_capital, commission, slippage,
+            stop_loss, take_profit, backtester.periods_per_year
+        )
+        
+        for j, strategy in enumerate(batch):
+            row = dict(combos[batch_start + j])
+            row['strategy_name'] = strategy.name
+            for name, values in metrics.items():
+                row[name] = float(values[j])
+            row['trade_count'] = int(row['trade_count'])
+            rows.append(row)
+    
+    print(f"✅ 参数扫描完成，共计算 {len(cache)} 个不同指标")
+    return pd.DataFrame(rows)
 
 
 # ==================== 使用示例 ====================
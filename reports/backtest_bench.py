@@ -0,0 +1,354 @@
+#!/usr/bin/env python3
+"""
+回测性能基准
+在合成行情上分阶段计时（信号生成、成交执行、指标计算、报告保存），输出机器可读结果，
+并可与历史基准对比以发现性能回退
+
+用法:
+    python backtest_bench.py                                  # 默认规模 1e3 ~ 1e7 根K线
+    python backtest_bench.py --sizes 1e3,1e5 --repeat 5 --output bench.json
+    python backtest_bench.py --baseline bench_old.json --threshold 0.2
+    python backtest_bench.py --sizes 1e3 --import-repeat 10                # 同时测量模块导入耗时
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+import backtest
+from backtest import (
+    Backtester,
+    BollingerBandsStrategy,
+    IndicatorCache,
+    MACDStrategy,
+    MovingAverageCrossStrategy,
+    RSIStrategy,
+    Strategy,
+    _random_walk_ohlcv,
+)
+
+
+# 计时阶段，与 Backtester.run 的执行顺序一致
+STAGES = ('signals', 'execution', 'metrics', 'report')
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# 逐行引擎基于 iterrows，超过此规模默认跳过
+LOOP_MAX_BARS = 100_000
+
+# 合成行情的总波动固定为约10年日线的水平，避免超长序列价格溢出或趋近于0
+_REFERENCE_BARS = 2520
+
+# 测量导入耗时的模块（进程池的子进程同样需要导入）
+IMPORT_MODULES = ('backtest', 'backtest_parallel', 'backtest_stream')
+
+
+def default_strategies() -> List[Strategy]:
+    """内置策略的默认参数组合"""
+    return [
+        MovingAverageCrossStrategy(20, 50),
+        RSIStrategy(14, 30, 70),
+        MACDStrategy(12, 26, 9),
+        BollingerBandsStrategy(20, 2),
+    ]
+
+
+def synthetic_data(bars: int, freq: str = 'min', seed: int = 42) -> pd.DataFrame:
+    """
+    生成指定K线数量的随机游走行情
+
+    日线索引容纳不下 1e7 根K线，默认使用分钟线；数据由 load_mock_data 的同一生成器产生。
+    """
+    dates = pd.date_range('2000-01-03', periods=bars, freq=freq)
+    volatility = 0.02 * min(1.0, (_REFERENCE_BARS / max(bars, 1)) ** 0.5)
+    return _random_walk_ohlcv(dates, seed=seed, drift=0.0, volatility=volatility)
+
+
+def _time_stages(backtester: Backtester, data: pd.DataFrame, stages: Sequence[str], report_path: str) -> Dict:
+    """按阶段执行一次回测，返回各阶段耗时（秒）"""
+    timings = {}
+
+    start = time.perf_counter()
+    df = backtester.strategy.generate_signals(data)
+    timings['signals'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    if backtester.engine == 'vectorized':
+        equity_curve = backtester._execute_vectorized(df)
+    else:
+        equity_curve = backtester._execute_loop(df)
+    timings['execution'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = backtester._calculate_metrics(equity_curve)
+    timings['metrics'] = time.perf_counter() - start
+
+    if 'report' in stages:
+        start = time.perf_counter()
+        backtester.save_report(result, report_path)
+        timings['report'] = time.perf_counter() - start
+
+    timings['trades'] = len(result.trades)
+    return timings
+
+
+def run_benchmark(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    strategies: Optional[List[Strategy]] = None,
+    engines: Sequence[str] = backtest.ENGINES,
+    repeat: int = 3,
+    stages: Sequence[str] = STAGES,
+    loop_max_bars: int = LOOP_MAX_BARS,
+    freq: str = 'min',
+    seed: int = 42
+) -> pd.DataFrame:
+    """
+    运行基准测试
+
+    Args:
+        sizes: K线数量列表
+        strategies: 策略列表，默认使用 default_strategies()
+        engines: 执行引擎列表，见 Backtester
+        repeat: 每个组合重复次数，取中位数和最小值
+        stages: 需要计时的阶段，见 STAGES（signals / execution / metrics 总是执行）
+        loop_max_bars: 逐行引擎的最大K线数量，超过则跳过
+        freq: 合成行情的周期
+        seed: 随机种子
+
+    Returns:
+        DataFrame 每行一个 (规模, 策略, 引擎, 阶段) 的耗时统计
+    """
+    strategies = strategies if strategies is not None else default_strategies()
+    rows = []
+
+    with tempfile.TemporaryDirectory() as tmp:
+        report_path = os.path.join(tmp, 'report.json')
+
+        # 预热：加载 numba 编译缓存等一次性开销不计入结果
+        warm_up = synthetic_data(1_000, freq=freq, seed=seed)
+        for engine in engines:
+            backtester = Backtester('BENCH', MovingAverageCrossStrategy(), '2000-01-03', '2000-01-04', engine=engine)
+            backtester.strategy.indicators = IndicatorCache()
+            backtester.data = warm_up
+            with contextlib.redirect_stdout(io.StringIO()):
+                _time_stages(backtester, warm_up, stages, report_path)
+
+        for bars in sizes:
+            data = synthetic_data(bars, freq=freq, seed=seed)
+            start_date = data.index[0].strftime('%Y-%m-%d')
+            end_date = data.index[-1].strftime('%Y-%m-%d')
+
+            for strategy in strategies:
+                for engine in engines:
+                    if engine == 'loop' and bars > loop_max_bars:
+                        continue
+
+                    samples = []
+                    shared_cache = getattr(strategy, '_indicators', None)
+                    for _ in range(repeat):
+                        # 每次使用独立的指标缓存，测量冷启动耗时
+                        strategy.indicators = IndicatorCache()
+                        backtester = Backtester(
+                            symbol='BENCH',
+                            strategy=strategy,
+                            start_date=start_date,
+                            end_date=end_date,
+                            engine=engine
+                        )
+                        backtester.data = data
+                        with contextlib.redirect_stdout(io.StringIO()):
+                            samples.append(_time_stages(backtester, data, stages, report_path))
+                    strategy.indicators = shared_cache
+
+                    total = 0.0
+                    for stage in STAGES:
+                        if stage not in samples[0]:
+                            continue
+                        values = np.array([s[stage] for s in samples])
+                        total += float(np.median(values))
+                        rows.append({
+                            'bars': bars,
+                            'strategy': strategy.name,
+                            'engine': engine,
+                            'stage': stage,
+                            'median': float(np.median(values)),
+                            'min': float(values.min()),
+                            'repeat': repeat,
+                            'trades': samples[0]['trades'],
+                        })
+
+                    print(f"⏱️  {bars:>10,} bars | {strategy.name:25} | {engine:10} | {total:8.4f}s")
+
+    return pd.DataFrame(rows, columns=['bars', 'strategy', 'engine', 'stage', 'median', 'min', 'repeat', 'trades'])
+
+
+def _parse_importtime(output: str) -> List[tuple]:
+    """解析 python -X importtime 的输出，返回 [(模块名, 累计耗时 (微秒), 嵌套层级)]"""
+    records = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        _, cum, name = line[len('import time:'):].split('|')
+        if not cum.strip().isdigit():
+            continue  # 表头
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        records.append((name.strip(), int(cum), depth))
+    return records
+
+
+def measure_import_time(modules: Sequence[str] = IMPORT_MODULES, repeat: int = 5) -> pd.DataFrame:
+    """
+    在新的 Python 进程中测量模块导入耗时 (python -X importtime)
+
+    结果与 run_benchmark 的格式相同（bars=0, stage='import', strategy 为模块名），
+    可一起保存，并由 compare 与历史基准对比。
+    """
+    cwd = os.path.dirname(os.path.abspath(backtest.__file__))
+    rows = []
+    for module in modules:
+        samples = []
+        for _ in range(repeat):
+            proc = subprocess.run(
+                [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                cwd=cwd, capture_output=True, text=True, check=True
+            )
+            records = _parse_importtime(proc.stderr)
+            samples.append(next(us for name, us, depth in records if name == module and depth == 0) / 1e6)
+
+        # 最后一次导入中被测模块直接导入的、耗时最多的依赖，便于定位回退来源
+        heaviest = sorted(
+            ((name, us) for name, us, depth in records if depth == 1),
+            key=lambda item: item[1], reverse=True
+        )[:3]
+        values = np.array(samples)
+        rows.append({
+            'bars': 0,
+            'strategy': module,
+            'engine': '-',
+            'stage': 'import',
+            'median': float(np.median(values)),
+            'min': float(values.min()),
+            'repeat': repeat,
+            'trades': 0,
+        })
+        print(f"📦 import {module:20} | {np.median(values):8.4f}s | "
+              + ', '.join(f"{name} {us / 1e6:.3f}s" for name, us in heaviest))
+
+    return pd.DataFrame(rows, columns=['bars', 'strategy', 'engine', 'stage', 'median', 'min', 'repeat', 'trades'])
+
+
+def environment() -> Dict:
+    """运行环境信息，随结果一起保存，便于解释不同版本间的差异"""
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'processor': platform.processor() or platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'numba': backtest.NUMBA_AVAILABLE,
+    }
+
+
+def save_results(results: pd.DataFrame, filepath: str):
+    """保存为 JSON：{'environment': {...}, 'results': [...]}"""
+    with open(filepath, 'w') as f:
+        json.dump({'environment': environment(), 'results': results.to_dict(orient='records')}, f, indent=2)
+    print(f"📄 基准结果已保存至: {filepath}")
+
+
+def load_results(filepath: str) -> pd.DataFrame:
+    """读取 save_results 保存的结果"""
+    with open(filepath, 'r') as f:
+        return pd.DataFrame(json.load(f)['results'])
+
+
+def compare(
+    current: pd.DataFrame,
+    baseline: pd.DataFrame,
+    threshold: float = 0.2,
+    min_seconds: float = 0.001
+) -> pd.DataFrame:
+    """
+    与历史基准对比
+
+    Args:
+        current: 本次结果
+        baseline: 基准结果
+        threshold: 中位耗时增长超过该比例视为回退
+        min_seconds: 两次耗时均低于该值时视为噪声，不判定回退
+
+    Returns:
+        DataFrame 每个共同 (规模, 策略, 引擎, 阶段) 一行，含 ratio 和 regression 列
+    """
+    keys = ['bars', 'strategy', 'engine', 'stage']
+    merged = current[keys + ['median']].merge(
+        baseline[keys + ['median']], on=keys, suffixes=('', '_baseline')
+    )
+    merged['ratio'] = merged['median'] / merged['median_baseline']
+    merged['regression'] = (
+        (merged['ratio'] > 1 + threshold)
+        & (merged[['median', 'median_baseline']].max(axis=1) >= min_seconds)
+    )
+    return merged
+
+
+def _parse_sizes(text: str) -> List[int]:
+    return [int(float(s)) for s in text.split(',') if s.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='回测引擎性能基准')
+    parser.add_argument('--sizes', type=_parse_sizes, default=list(DEFAULT_SIZES),
+                        help='K线数量，逗号分隔，如 1e3,1e5,1e7')
+    parser.add_argument('--engines', default=','.join(backtest.ENGINES), help='执行引擎，逗号分隔')
+    parser.add_argument('--stages', default=','.join(STAGES), help='计时阶段，逗号分隔')
+    parser.add_argument('--repeat', type=int, default=3, help='每个组合的重复次数')
+    parser.add_argument('--loop-max-bars', type=int, default=LOOP_MAX_BARS, help='逐行引擎的最大K线数量')
+    parser.add_argument('--output', default='backtest_bench.json', help='结果输出路径 (JSON)')
+    parser.add_argument('--baseline', help='历史基准结果，对比并在回退时返回非零退出码')
+    parser.add_argument('--threshold', type=float, default=0.2, help='判定回退的耗时增长比例')
+    parser.add_argument('--import-repeat', type=int, default=5, help='测量模块导入耗时的次数，0 表示跳过')
+    args = parser.parse_args(argv)
+
+    print("🏁 回测性能基准")
+    print("=" * 70)
+
+    results = run_benchmark(
+        sizes=args.sizes,
+        engines=[e for e in args.engines.split(',') if e],
+        repeat=args.repeat,
+        stages=[s for s in args.stages.split(',') if s],
+        loop_max_bars=args.loop_max_bars
+    )
+    if args.import_repeat > 0:
+        results = pd.concat([measure_import_time(repeat=args.import_repeat), results], ignore_index=True)
+    save_results(results, args.output)
+
+    if not args.baseline:
+        return 0
+
+    comparison = compare(results, load_results(args.baseline), threshold=args.threshold)
+    regressions = comparison[comparison['regression']]
+    print(f"\n📊 与基准对比: {len(comparison)} 项, 回退 {len(regressions)} 项 (阈值 +{args.threshold:.0%})")
+    for _, row in regressions.iterrows():
+        print(f"❌ {row['bars']:>10,} bars | {row['strategy']:25} | {row['engine']:10} | {row['stage']:9} | "
+              f"{row['median_baseline']:.4f}s → {row['median']:.4f}s ({row['ratio']:.2f}x)")
+    return 1 if len(regressions) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
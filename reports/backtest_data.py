@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+行情数据存储
+按 (标的, 周期) 将历史数据缓存到本地列式文件，只向数据源补取缺失的日期区间
+"""
+
+import json
+import os
+import re
+import shutil
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+
+DateLike = Union[str, datetime, pd.Timestamp]
+
+
+def _to_timestamp(value: DateLike) -> pd.Timestamp:
+    """统一转换为不带时区的时间戳"""
+    ts = pd.Timestamp(value)
+    return ts.tz_localize(None) if ts.tz is not None else ts
+
+
+def _slice(data: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp) -> pd.DataFrame:
+    """截取 [start, end) 区间，兼容带时区的索引"""
+    if data.empty:
+        return data
+    tz = getattr(data.index, 'tz', None)
+    if tz is not None:
+        start, end = start.tz_localize(tz), end.tz_localize(tz)
+    return data[(data.index >= start) & (data.index < end)]
+
+
+def _interval_delta(interval: str):
+    """一根K线的时长，如 '5m' -> 5分钟，'1mo' -> 1个月"""
+    match = re.fullmatch(r'(\d+)(m|h|d|wk|mo)', interval)
+    if match is None:
+        raise ValueError(f"无法识别的数据周期: {interval}")
+    n, unit = int(match.group(1)), match.group(2)
+    if unit == 'mo':
+        return pd.DateOffset(months=n)
+    return pd.Timedelta(**{'m': {'minutes': n}, 'h': {'hours': n}, 'd': {'days': n}, 'wk': {'weeks': n}}[unit])
+
+
+def _today(data: pd.DataFrame) -> pd.Timestamp:
+    """数据所在时区的今天零点（不带时区，与 _slice 的约定一致）"""
+    tz = getattr(data.index, 'tz', None)
+    today = pd.Timestamp.now(tz=tz).normalize()
+    return today.tz_localize(None) if tz is not None else today
+
+
+def _covered_end(end: pd.Timestamp, data: pd.DataFrame, interval: str) -> Optional[pd.Timestamp]:
+    """
+    一次补取实际覆盖到的终点
+
+    end 早于今天时整段已经过去，返回 end：周末、节假日等没有K线的日期也记为已覆盖，不再重复补取。
+    包含今天或未来时，数据源返回的数据在 end 之前结束（尚未发生或当天未收盘），只覆盖到最后一根K线之后
+    一个周期且不超过今天零点，其余部分下次读取时重新补取；没有返回数据时返回 None。
+    """
+    today = _today(data)
+    if end < today:
+        return end
+    if data.empty:
+        return None
+    last = data.index[-1]
+    if getattr(data.index, 'tz', None) is not None:
+        last = last.tz_localize(None)
+    return min(end, last + _interval_delta(interval), today)
+
+
+class DataProvider(ABC):
+    """行情数据源基类"""
+
+    @abstractmethod
+    def history(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp, interval: str = '1d') -> pd.DataFrame:
+        """
+        获取 [start, end) 区间的历史行情
+        返回以时间为索引、包含 'Close' 等列的DataFrame
+        """
+        pass
+
+
+class YFinanceProvider(DataProvider):
+    """Yahoo Finance 数据源"""
+
+    def history(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp, interval: str = '1d') -> pd.DataFrame:
+        try:
+            import yfinance as yf
+        except ImportError:
+            raise ImportError("yfinance 未安装，无法获取数据。运行: pip install yfinance")
+
+        return yf.Ticker(symbol).history(start=start, end=end, interval=interval)
+
+
+class LocalProvider(DataProvider):
+    """
+    本地数据源（离线测试用）
+
+    用内存中的DataFrame代替网络数据源，并记录每次请求，便于验证缓存命中与增量补取。
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        self.frames = frames
+        self.calls: List[Tuple[str, pd.Timestamp, pd.Timestamp, str]] = []
+
+    def history(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp, interval: str = '1d') -> pd.DataFrame:
+        self.calls.append((symbol, start, end, interval))
+        if symbol not in self.frames:
+            return pd.DataFrame()
+        return _slice(self.frames[symbol], _to_timestamp(start), _to_timestamp(end)).copy()
+
+
+class FakeProvider(LocalProvider):
+    """
+    模拟网络数据源（离线测试用）
+
+    在 LocalProvider 的基础上模拟请求延迟和失败，线程安全，用于测试并发加载、限速、重试与请求合并。
+    失败时抛出 ConnectionError，与网络错误一致。
+    """
+
+    def __init__(
+        self,
+        frames: Dict[str, pd.DataFrame],
+        latency: Union[float, Tuple[float, float]] = 0.0,
+        failure_rate: float = 0.0,
+        failures: Optional[Dict[str, int]] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            frames: {symbol: 行情DataFrame}
+            latency: 每次请求的延迟（秒），或 (最小, 最大) 区间内均匀随机
+            failure_rate: 每次请求随机失败的概率
+            failures: {symbol: N}，该标的的前N次请求必定失败
+            seed: 随机种子
+        """
+        super().__init__(frames)
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.failures = dict(failures or {})
+        self.active = 0  # 当前正在处理的请求数
+        self.max_active = 0  # 观测到的最大并发请求数
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+
+    def history(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp, interval: str = '1d') -> pd.DataFrame:
+        with self._lock:
+            self.calls.append((symbol, start, end, interval))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+            if self.failures.get(symbol, 0) > 0:
+                self.failures[symbol] -= 1
+                fail = True
+            else:
+                fail = self._rng.random() < self.failure_rate
+            if isinstance(self.latency, tuple):
+                delay = self._rng.uniform(*self.latency)
+            else:
+                delay = self.latency
+
+        try:
+            if delay > 0:
+                time.sleep(delay)
+            if fail:
+                raise ConnectionError(f"模拟请求失败: {symbol}")
+            if symbol not in self.frames:
+                return pd.DataFrame()
+            return _slice(self.frames[symbol], _to_timestamp(start), _to_timestamp(end)).copy()
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+class MarketDataStore:
+    """
+    本地行情缓存
+
+    目录结构: root/{interval}/{symbol}/
+        meta.json       已覆盖的日期区间、列名、时区
+        index.npy       时间索引 (int64 纳秒)
+        {column}.npy    每列一个文件，读取时内存映射
+
+    读取时若请求区间超出已覆盖区间，只向数据源补取缺失部分并合并写回。
+    """
+
+    def __init__(self, root: Union[str, Path], provider: Optional[DataProvider] = None):
+        self.root = Path(root)
+        self.provider = provider if provider is not None else YFinanceProvider()
+
+    def _path(self, symbol: str, interval: str) -> Path:
+        return self.root / interval / symbol.replace('/', '_')
+
+    def _read_meta(self, path: Path) -> Optional[Dict]:
+        meta_file = path / 'meta.json'
+        if not meta_file.exists():
+            return None
+        with open(meta_file, 'r') as f:
+            return json.load(f)
+
+    def _load(self, path: Path, meta: Dict) -> pd.DataFrame:
+        index = np.load(path / 'index.npy', mmap_mode='r')
+        dates = pd.DatetimeIndex(np.asarray(index).view('datetime64[ns]'))
+        if meta['tz']:
+            dates = dates.tz_localize('UTC').tz_convert(meta['tz'])
+        columns = {col: np.load(path / f'{col}.npy', mmap_mode='r') for col in meta['columns']}
+        return pd.DataFrame(columns, index=dates)
+
+    def _save(self, path: Path, data: pd.DataFrame, start: pd.Timestamp, end: pd.Timestamp):
+        """写入临时目录后整体替换，避免中断时留下不完整的缓存"""
+        data = data.select_dtypes('number')
+        tmp = path.with_name(path.name + '.tmp')
+        if tmp.exists():
+            shutil.rmtree(tmp)
+        tmp.mkdir(parents=True)
+
+        index = data.index if isinstance(data.index, pd.DatetimeIndex) else pd.DatetimeIndex(data.index)
+        np.save(tmp / 'index.npy', index.as_unit('ns').asi8)
+        for col in data.columns:
+            np.save(tmp / f'{col}.npy', data[col].to_numpy())
+        meta = {
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'columns': list(data.columns),
+            'tz': str(index.tz) if index.tz is not None else None,
+            'rows': len(data),
+        }
+        with open(tmp / 'meta.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(tmp, path)
+
+    def get(self, symbol: str, start: DateLike, end: DateLike, interval: str = '1d') -> pd.DataFrame:
+        """
+        获取 [start, end) 区间的行情，优先读取本地缓存
+
+        Args:
+            symbol: 股票代码
+            start: 开始日期
+            end: 结束日期（不含）
+            interval: 数据周期，如 '1d', '1h', '1m'
+        """
+        start, end = _to_timestamp(start), _to_timestamp(end)
+        path = self._path(symbol, interval)
+        meta = self._read_meta(path)
+
+        if meta is None:
+            data = self.provider.history(symbol, start, end, interval)
+            if data.empty:
+                return data
+            covered_start, covered_end = start, _covered_end(end, data, interval)
+        else:
+            data = self._load(path, meta)
+            covered_start, covered_end = pd.Timestamp(meta['start']), pd.Timestamp(meta['end'])
+
+            # 只补取缺失的区间；已经过去的区间即使没有数据也记为已覆盖，包含今天或未来的部分见 _covered_end
+            if start >= covered_start and end <= covered_end:
+                return _slice(data, start, end).copy()
+
+            parts = [data]
+            previous = (covered_start, covered_end)
+            if start < covered_start:
+                before = self.provider.history(symbol, start, covered_start, interval)
+                if not before.empty:
+                    parts.append(before)
+                if not before.empty or covered_start < _today(data):
+                    covered_start = start
+            if end > covered_end:
+                after = self.provider.history(symbol, covered_end, end, interval)
+                if not after.empty:
+                    parts.append(after)
+                covered = _covered_end(end, after if not after.empty else data.iloc[:0], interval)
+                if covered is not None:
+                    covered_end = max(covered_end, covered)
+            if len(parts) == 1 and (covered_start, covered_end) == previous:
+                return _slice(data, start, end).copy()
+
+            data = pd.concat(parts)
+            data = data[~data.index.duplicated(keep='last')].sort_index()
+
+        self._save(path, data, covered_start, covered_end)
+        return _slice(data, start, end).copy()
+
+    def chunks(
+        self,
+        symbol: str,
+        interval: str = '1d',
+        chunk_size: int = 1_000_000,
+        start: Optional[DateLike] = None,
+        end: Optional[DateLike] = None
+    ) -> Iterator[pd.DataFrame]:
+        """
+        按块读取已缓存的 [start, end) 区间行情，不访问数据源
+
+        各列以内存映射方式打开，只有当前块会读入内存，适用于超出内存的分钟线 / Tick 数据。
+
+        Args:
+            symbol: 股票代码
+            interval: 数据周期
+            chunk_size: 每块的最大行数
+            start: 开始日期，None 表示缓存的第一根K线
+            end: 结束日期（不含），None 表示缓存的最后一根K线
+        """
+        path = self._path(symbol, interval)
+        meta = self._read_meta(path)
+        if meta is None:
+            raise FileNotFoundError(f"未找到 {symbol} ({interval}) 的本地缓存: {path}")
+
+        index = np.load(path / 'index.npy', mmap_mode='r')
+        columns = {col: np.load(path / f'{col}.npy', mmap_mode='r') for col in meta['columns']}
+
+        def _position(value: DateLike) -> int:
+            # index.npy 保存的是UTC纳秒，按 _slice 的约定把不带时区的日期视为数据所在时区
+            ts = _to_timestamp(value)
+            if meta['tz']:
+                ts = ts.tz_localize(meta['tz'])
+            return int(np.searchsorted(index, ts.value))
+
+        lo = 0 if start is None else _position(start)
+        hi = len(index) if end is None else _position(end)
+        for a in range(lo, hi, chunk_size):
+            b = min(a + chunk_size, hi)
+            dates = pd.DatetimeIndex(np.asarray(index[a:b]).view('datetime64[ns]'))
+            if meta['tz']:
+                dates = dates.tz_localize('UTC').tz_convert(meta['tz'])
+            yield pd.DataFrame({col: np.array(values[a:b]) for col, values in columns.items()}, index=dates)
+
+    def symbols(self, interval: str = '1d') -> List[str]:
+        """列出已缓存的标的"""
+        directory = self.root / interval
+        if not directory.exists():
+            return []
+        return sorted(p.name for p in directory.iterdir() if (p / 'meta.json').exists())
@@ -237,6 +237,40 @@ class MyStrategy(Strategy):
 """)
 
 
+def demo_engine_parity():
+    """演示5: 逐行引擎与向量化引擎结果一致性校验"""
+    print("\n" + "="*70)
+    print("📊 演示5: 执行引擎一致性校验 (loop vs vectorized)")
+    print("="*70)
+    
+    strategies = [
+        MovingAverageCrossStrategy(10, 30),
+        RSIStrategy(14, 30, 70),
+        MACDStrategy(12, 26, 9),
+        BollingerBandsStrategy(20, 2),
+    ]
+    
+    for strategy in strategies:
+        results = {}
+        for engine in ('loop', 'vectorized'):
+            bt = Backtester(
+                symbol='MOCK',
+                strategy=strategy,
+                start_date='2020-01-01',
+                end_date='2023-12-31',
+                initial_capital=100000,
+                engine=engine
+            )
+            bt.load_mock_data()
+            results[engine] = bt.run()
+        
+        loop, vectorized = results['loop'], results['vectorized']
+        pd.testing.assert_series_equal(loop.equity_curve, vectorized.equity_curve, check_exact=True)
+        assert loop.trades == vectorized.trades, f"{strategy.name} 交易记录不一致"
+        assert loop.to_dict() == vectorized.to_dict(), f"{strategy.name} 回测指标不一致"
+        print(f"✅ {strategy.name:25} | 交易: {loop.trade_count:>3}次 | 两种引擎结果完全一致")
+
+
 def main():
     """主函数"""
     print("\n" + "="*70)
@@ -247,12 +281,14 @@ def main():
     print("  2. 使用真实股票数据回测")
     print("  3. 多策略对比")
     print("  4. 自定义策略")
+    print("  5. 执行引擎一致性校验")
     
     # 运行演示
     demo_mock_data()
     demo_real_data()
     demo_strategy_comparison()
     demo_custom_strategy()
+    demo_engine_parity()
     
     print("\n" + "="*70)
     print("✅ 演示完成!")
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+并发行情加载
+多标的行情通过有界线程池并发获取：按请求速率限速、网络错误指数退避重试、相同请求合并，
+结果写入本地行情缓存，并可按统一的时间索引对齐
+"""
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Type, Union
+
+import numpy as np
+import pandas as pd
+
+from backtest_data import DateLike, DataProvider, MarketDataStore, _to_timestamp
+
+
+# 对齐方式：'outer' 取各标的时间索引的并集（缺失为NaN），'inner' 取交集
+ALIGN_METHODS = ('outer', 'inner')
+
+
+class RateLimiter:
+    """
+    令牌桶限速器（线程安全）
+    
+    每秒补充 rate 个令牌，最多积累 burst 个；每次请求消耗一个令牌，令牌不足时阻塞等待。
+    """
+    
+    def __init__(
+        self,
+        rate: float,
+        burst: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        if rate <= 0:
+            raise ValueError("请求速率必须为正")
+        if burst < 1:
+            raise ValueError("突发容量至少为1")
+        self.rate = rate
+        self.burst = burst
+        self._clock = clock
+        self._sleep = sleep
+        self._tokens = float(burst)
+        self._last = clock()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """获取一个令牌"""
+        while True:
+            with self._lock:
+                now = self._clock()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            self._sleep(wait)
+
+
+class ThrottledProvider(DataProvider):
+    """
+    限速 + 重试的数据源包装
+    
+    每次请求（含重试）先从 RateLimiter 获取令牌；抛出 retry_on 中的异常时按指数退避（带随机抖动）重试，
+    超过 retries 次后抛出最后一次的异常。数据源返回空数据不视为失败。
+    """
+    
+    def __init__(
+        self,
+        provider: DataProvider,
+        rate_limit: Optional[float] = None,
+        burst: int = 1,
+        retries: int = 3,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        retry_on: Tuple[Type[BaseException], ...] = (OSError,),
+        seed: Optional[int] = None
+    ):
+        """
+        Args:
+            provider: 被包装的数据源
+            rate_limit: 每秒最多请求数，None 不限速
+            burst: 允许的突发请求数
+            retries: 失败后的最大重试次数
+            backoff: 第一次重试前的等待秒数，之后每次翻倍
+            max_backoff: 单次等待的上限（秒）
+            retry_on: 需要重试的异常类型，默认网络类错误 (ConnectionError / TimeoutError 等 OSError)
+            seed: 退避抖动的随机种子
+        """
+        self.provider = provider
+        self.limiter = RateLimiter(rate_limit, burst) if rate_limit is not None else None
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.retry_on = retry_on
+        self.retry_count = 0
+        self._rng = np.random.default_rng(seed)
+        self._lock = threading.Lock()
+    
+    def history(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp, interval: str = '1d') -> pd.DataFrame:
+        attempt = 0
+        while True:
+            if self.limiter is not None:
+                self.limiter.acquire()
+            try:
+                return self.provider.history(symbol, start, end, interval)
+            except self.retry_on:
+                if attempt >= self.retries:
+                    raise
+                with self._lock:
+                    self.retry_count += 1
+                    jitter = 0.5 + 0.5 * self._rng.random()
+                time.sleep(min(self.max_backoff, self.backoff * 2 ** attempt) * jitter)
+                attempt += 1
+
+
+def align_frames(frames: Dict[str, pd.DataFrame], how: str = 'outer') -> Dict[str, pd.DataFrame]:
+    """
+    将多个标的的行情对齐到同一时间索引
+    
+    Args:
+        frames: {symbol: 行情DataFrame}
+        how: 'outer' 并集（缺失行为NaN，与 PortfolioBacktester 的约定一致）/ 'inner' 交集
+    """
+    if how not in ALIGN_METHODS:
+        raise ValueError(f"未知的对齐方式: {how}，可选: {', '.join(ALIGN_METHODS)}")
+    if not frames:
+        return {}
+    
+    indexes = [df.index for df in frames.values()]
+    index = indexes[0]
+    for other in indexes[1:]:
+        index = index.union(other) if how == 'outer' else index.intersection(other)
+    return {symbol: df.reindex(index) for symbol, df in frames.items()}
+
+
+class UniverseData:
+    """
+    多标的加载结果
+    
+    Attributes:
+        frames: {symbol: 行情DataFrame}，按请求顺序排列
+        errors: {symbol: 错误信息}，获取失败或无数据的标的
+    """
+    
+    def __init__(self, frames: Dict[str, pd.DataFrame], errors: Dict[str, str]):
+        self.frames = frames
+        self.errors = errors
+    
+    def prices(self, column: str = 'Close') -> pd.DataFrame:
+        """(日期 × 标的) 价格矩阵，可直接用于 PortfolioBacktester"""
+        return pd.concat({symbol: df[column] for symbol, df in self.frames.items()}, axis=1)
+    
+    def __len__(self) -> int:
+        return len(self.frames)
+    
+    def __repr__(self) -> str:
+        return f"UniverseData({len(self.frames)} symbols, {len(self.errors)} errors)"
+
+
+class UniverseLoader:
+    """
+    多标的并发行情加载器
+    
+    请求提交到有界线程池并发执行；相同 (标的, 区间, 周期) 的请求在执行期间只发出一次，
+    后续请求共享同一个 Future。source 为 MarketDataStore 时数据写入本地缓存，
+    限速与重试作用于缓存背后的数据源，已缓存的区间不再发起请求。
+    
+    Example:
+        store = MarketDataStore('./market_cache')
+        with UniverseLoader(store, max_workers=32, rate_limit=20) as loader:
+            universe = loader.load(symbols, '2020-01-01', '2024-01-01')
+        prices = universe.prices()
+    """
+    
+    def __init__(
+        self,
+        source,
+        max_workers: int = 16,
+        rate_limit: Optional[float] = None,
+        burst: int = 1,
+        retries: int = 3,
+        backoff: float = 0.5,
+        retry_on: Tuple[Type[BaseException], ...] = (OSError,)
+    ):
+        """
+        Args:
+            source: 本地行情缓存 (MarketDataStore 或其他提供 get 方法的缓存) 或数据源
+            max_workers: 并发请求的线程数
+            rate_limit: 对数据源的每秒最多请求数，None 不限速
+            burst: 允许的突发请求数
+            retries: 单个请求失败后的最大重试次数
+            backoff: 第一次重试前的等待秒数，之后每次翻倍
+            retry_on: 需要重试的异常类型，见 ThrottledProvider
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers 至少为1")
+        
+        if isinstance(source, MarketDataStore):
+            self.provider = ThrottledProvider(source.provider, rate_limit, burst, retries, backoff, retry_on=retry_on)
+            # 使用同一缓存目录的独立实例，不修改调用方的 store
+            self.store = MarketDataStore(source.root, self.provider)
+        elif isinstance(source, DataProvider):
+            self.provider = ThrottledProvider(source, rate_limit, burst, retries, backoff, retry_on=retry_on)
+            self.store = None
+        else:
+            # 其他提供 get(symbol, start, end, interval) 的缓存：并发与合并照常，限速重试由其自行处理
+            self.provider = None
+            self.store = source
+        self.coalesced = 0  # 被合并的重复请求数
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='loader')
+        self._inflight: Dict[Tuple, Future] = {}
+        self._symbol_locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def _fetch(self, symbol: str, start: pd.Timestamp, end: pd.Timestamp, interval: str) -> pd.DataFrame:
+        if self.store is None:
+            return self.provider.history(symbol, start, end, interval)
+        # 同一标的的缓存文件不能并发写入，不同区间的请求按标的串行
+        with self._lock:
+            lock = self._symbol_locks.setdefault((symbol, interval), threading.Lock())
+        with lock:
+            return self.store.get(symbol, start, end, interval=interval)
+    
+    def submit(self, symbol: str, start: DateLike, end: DateLike, interval: str = '1d') -> Future:
+        """提交单个请求，返回 Future；与正在执行的相同请求合并"""
+        key = (symbol, _to_timestamp(start), _to_timestamp(end), interval)
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            future = self._executor.submit(self._fetch, *key)
+            self._inflight[key] = future
+        future.add_done_callback(lambda _: self._release(key))
+        return future
+    
+    def _release(self, key: Tuple):
+        with self._lock:
+            self._inflight.pop(key, None)
+    
+    def load(
+        self,
+        symbols: Iterable[str],
+        start: DateLike,
+        end: DateLike,
+        interval: str = '1d',
+        align: Optional[str] = None
+    ) -> UniverseData:
+        """
+        并发加载多个标的 [start, end) 区间的行情
+        
+        Args:
+            symbols: 股票代码
+            start: 开始日期
+            end: 结束日期（不含）
+            interval: 数据周期
+            align: 对齐方式，见 align_frames；None 保持各标的原始索引
+        
+        Returns:
+            UniverseData，失败或无数据的标的记录在 errors 中，不中断其他标的
+        """
+        symbols = list(dict.fromkeys(symbols))
+        started = time.perf_counter()
+        futures = [(symbol, self.submit(symbol, start, end, interval)) for symbol in symbols]
+        
+        frames, errors = {}, {}
+        for symbol, future in futures:
+            try:
+                data = future.result()
+            except Exception as e:
+                errors[symbol] = f"{type(e).__name__}: {e}"
+                continue
+            if data.empty:
+                errors[symbol] = "无数据"
+                continue
+            frames[symbol] = data
+        
+        if align is not None:
+            frames = align_frames(frames, how=align)
+        
+        retries = self.provider.retry_count if self.provider is not None else 0
+        print(f"📥 并发加载: {len(frames)}/{len(symbols)} 个标的, 失败 {len(errors)} 个, "
+              f"重试 {retries} 次, 耗时 {time.perf_counter() - started:.2f}s")
+        return UniverseData(frames, errors)
+    
+    def close(self):
+        """关闭线程池（等待正在执行的请求完成）"""
+        self._executor.shutdown(wait=True)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_universe(
+    symbols: List[str],
+    start: DateLike,
+    end: DateLike,
+    source: Union[MarketDataStore, DataProvider],
+    interval: str = '1d',
+    align: Optional[str] = None,
+    **kwargs
+) -> UniverseData:
+    """
+    并发加载多个标的的行情（一次性使用的 UniverseLoader）
+    
+    Args:
+        symbols: 股票代码
+        start: 开始日期
+        end: 结束日期（不含）
+        source: 本地行情缓存或数据源
+        interval: 数据周期
+        align: 对齐方式，见 align_frames
+        **kwargs: 传给 UniverseLoader（max_workers, rate_limit, retries 等）
+    """
+    with UniverseLoader(source, **kwargs) as loader:
+        return loader.load(symbols, start, end, interval=interval, align=align)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+蒙特卡洛稳健性检验
+批量生成合成价格路径（GBM、收益率块自助抽样、状态切换），在全部路径上执行同一策略，
+输出夏普、最大回撤、最终资金等指标的分布
+"""
+
+import contextlib
+import io
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    IndicatorCache,
+    Strategy,
+    _SIGNAL_MATRIX_BUILDERS,
+    _evaluate_signal_matrix,
+    _periods_per_year,
+    _signal_matrix,
+)
+
+
+# ==================== 路径生成 ====================
+# 所有生成器返回 (K线 × 路径) 的价格矩阵，随机数全部来自传入的 np.random.Generator
+
+def _prices_from_log_returns(log_returns: np.ndarray, s0: float) -> np.ndarray:
+    return s0 * np.exp(np.cumsum(log_returns, axis=0))
+
+
+def gbm_paths(
+    rng: np.random.Generator,
+    n_paths: int,
+    n_bars: int,
+    mu: float = 0.0003,
+    sigma: float = 0.015,
+    s0: float = 100.0
+) -> np.ndarray:
+    """
+    几何布朗运动
+    
+    Args:
+        mu: 每根K线的漂移率
+        sigma: 每根K线的波动率
+        s0: 初始价格
+    """
+    log_returns = rng.standard_normal((n_bars, n_paths))
+    log_returns *= sigma
+    log_returns += mu - 0.5 * sigma ** 2
+    return _prices_from_log_returns(log_returns, s0)
+
+
+def bootstrap_paths(
+    rng: np.random.Generator,
+    n_paths: int,
+    n_bars: int,
+    returns: np.ndarray,
+    block_size: int = 20,
+    s0: float = 100.0
+) -> np.ndarray:
+    """
+    历史收益率的块自助抽样 (moving block bootstrap)
+    
+    按 block_size 根K线为一块整体抽样，保留块内的波动聚集和自相关。
+    
+    Args:
+        returns: 历史对数收益率
+        block_size: 块长度
+        s0: 初始价格
+    """
+    returns = np.asarray(returns, dtype=np.float64)
+    returns = returns[np.isfinite(returns)]
+    block_size = max(1, min(block_size, len(returns)))
+    if len(returns) == 0:
+        raise ValueError("没有可用于抽样的历史收益率")
+    
+    n_blocks = -(-n_bars // block_size)
+    starts = rng.integers(0, len(returns) - block_size + 1, size=(n_blocks, n_paths))
+    index = (starts[:, None, :] + np.arange(block_size)[None, :, None]).reshape(n_blocks * block_size, n_paths)
+    return _prices_from_log_returns(returns[index[:n_bars]], s0)
+
+
+def regime_switching_paths(
+    rng: np.random.Generator,
+    n_paths: int,
+    n_bars: int,
+    regimes: Sequence[Tuple[float, float]] = ((0.0006, 0.01), (-0.0008, 0.025)),
+    transition: Sequence[Sequence[float]] = ((0.98, 0.02), (0.05, 0.95)),
+    s0: float = 100.0
+) -> np.ndarray:
+    """
+    马尔可夫状态切换（如牛市 / 熊市）
+    
+    Args:
+        regimes: 每个状态的 (每根K线漂移率, 波动率)
+        transition: 状态转移矩阵，transition[i][j] 为从状态i转到状态j的概率
+        s0: 初始价格
+    """
+    regimes = np.asarray(regimes, dtype=np.float64)
+    transition = np.asarray(transition, dtype=np.float64)
+    if transition.shape != (len(regimes), len(regimes)):
+        raise ValueError("状态转移矩阵的维度必须与状态数一致")
+    if not np.allclose(transition.sum(axis=1), 1.0):
+        raise ValueError("状态转移矩阵每行之和必须为1")
+    
+    cumulative = np.cumsum(transition, axis=1)
+    states = np.empty((n_bars, n_paths), dtype=np.intp)
+    states[0] = rng.integers(0, len(regimes), size=n_paths)
+    uniform = rng.random((n_bars - 1, n_paths))
+    for t in range(1, n_bars):
+        states[t] = (uniform[t - 1][:, None] > cumulative[states[t - 1]]).sum(axis=1)
+    np.minimum(states, len(regimes) - 1, out=states)
+    
+    mu, sigma = regimes[states, 0], regimes[states, 1]
+    log_returns = mu - 0.5 * sigma ** 2 + sigma * rng.standard_normal((n_bars, n_paths))
+    return _prices_from_log_returns(log_returns, s0)
+
+
+GENERATORS: Dict[str, Callable] = {
+    'gbm': gbm_paths,
+    'bootstrap': bootstrap_paths,
+    'regime': regime_switching_paths,
+}
+
+
+# ==================== 路径信号 ====================
+
+def _path_signals(strategy: Strategy, close: pd.DataFrame) -> np.ndarray:
+    """
+    生成 (K线 × 路径) 信号矩阵
+    
+    内置策略复用参数扫描的矩阵构建函数（路径模式，全部路径一次计算）；
+    自定义策略逐条路径调用 generate_signals（只提供 'Close' 列）。
+    """
+    # 每条路径只用一次，不写入共享的指标缓存
+    shared_cache = getattr(strategy, '_indicators', None)
+    strategy.indicators = IndicatorCache(maxsize=0)
+    try:
+        if type(strategy) in _SIGNAL_MATRIX_BUILDERS:
+            return _signal_matrix({'Close': close}, [strategy], {})
+        columns = []
+        for path in close.columns:
+            df = strategy.generate_signals(close[[path]].rename(columns={path: 'Close'}))
+            columns.append(df['signal'].to_numpy() if 'signal' in df.columns else np.zeros(len(df)))
+    finally:
+        strategy.indicators = shared_cache
+    return np.column_stack(columns)
+
+
+# ==================== 批量执行 ====================
+
+# pandas 频率名 -> Backtester interval 的单位，年化口径与 _periods_per_year 一致
+_FREQ_UNITS = {'B': 'd', 'D': 'd', 'h': 'h', 'H': 'h', 'min': 'm', 'T': 'm', 'W': 'wk',
+               'ME': 'mo', 'MS': 'mo', 'M': 'mo', 'BME': 'mo', 'BMS': 'mo', 'BM': 'mo'}
+
+
+def _freq_periods_per_year(freq: str) -> float:
+    """由合成路径的 pandas 频率（如 'B', 'h', '30min'）换算每年的K线数量"""
+    offset = pd.tseries.frequencies.to_offset(freq)
+    unit = _FREQ_UNITS.get(offset.name.split('-')[0])
+    if unit is None:
+        raise ValueError(f"无法由频率 {freq} 推算年化周期，请直接指定 periods_per_year")
+    return _periods_per_year(f'{offset.n}{unit}')
+
+
+def _simulate_chunk(job: Tuple) -> Dict[str, np.ndarray]:
+    """生成一批路径并执行策略，返回按路径的指标数组"""
+    (seed, n_paths, n_bars, method, generator_kwargs, strategy, index,
+     initial_capital, commission, slippage, stop_loss, take_profit, periods_per_year) = job
+    
+    rng = np.random.default_rng(seed)
+    prices = GENERATORS[method](rng, n_paths, n_bars, **generator_kwargs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        signals = _path_signals(strategy, pd.DataFrame(prices, index=index))
+    
+    _, metrics = _evaluate_signal_matrix(
+        prices, signals, index, initial_capital, commission, slippage, stop_loss, take_profit, periods_per_year
+    )
+    # 标的自身的买入持有收益，便于对比
+    metrics['buy_and_hold_return'] = prices[-1] / prices[0] - 1
+    return metrics
+
+
+class MonteCarloResult:
+    """
+    蒙特卡洛检验结果
+    
+    Attributes:
+        strategy_name: 策略名称
+        method: 路径生成方法
+        metrics: DataFrame 每行一条路径的回测指标
+    """
+    
+    def __init__(self, strategy_name: str, method: str, metrics: pd.DataFrame):
+        self.strategy_name = strategy_name
+        self.method = method
+        self.metrics = metrics
+    
+    def summary(self, quantiles: Sequence[float] = (0.05, 0.25, 0.5, 0.75, 0.95)) -> pd.DataFrame:
+        """各指标的均值、标准差和分位数"""
+        numeric = self.metrics.astype(np.float64)
+        summary = numeric.quantile(list(quantiles)).T
+        summary.columns = [f"p{q * 100:g}" for q in quantiles]
+        summary.insert(0, 'std', numeric.std())
+        summary.insert(0, 'mean', numeric.mean())
+        return summary
+    
+    @property
+    def probability_of_loss(self) -> float:
+        """最终亏损的路径比例"""
+        return float((self.metrics['total_return'] < 0).mean())
+    
+    def __str__(self) -> str:
+        summary = self.summary()
+        return (
+            f"蒙特卡洛检验: {self.strategy_name} | {self.method} | {len(self.metrics)} 条路径 | "
+            f"亏损概率 {self.probability_of_loss:.2%}\n"
+            f"{summary.loc[['final_capital', 'total_return', 'max_drawdown', 'sharpe_ratio']].to_string()}"
+        )
+
+
+def monte_carlo(
+    strategy: Strategy,
+    n_paths: int = 1000,
+    n_bars: int = 2520,
+    method: str = 'gbm',
+    data: Optional[pd.DataFrame] = None,
+    seed: Optional[int] = None,
+    initial_capital: float = 100000.0,
+    commission: float = 0.001,
+    slippage: float = 0.001,
+    stop_loss: Optional[float] = None,
+    take_profit: Optional[float] = None,
+    chunk_size: int = 500,
+    max_workers: Optional[int] = None,
+    freq: str = 'B',
+    periods_per_year: Optional[float] = None,
+    **generator_kwargs
+) -> MonteCarloResult:
+    """
+    在批量合成路径上检验策略
+    
+    路径按 chunk_size 分批生成和执行，内存占用与路径总数无关；每批使用由 seed 派生的独立
+    np.random.Generator 流 (SeedSequence.spawn)，结果只取决于 seed 和 chunk_size，与进程数无关。
+    
+    Args:
+        strategy: 策略对象
+        n_paths: 路径数量
+        n_bars: 每条路径的K线数量
+        method: 路径生成方法，见 GENERATORS：'gbm' / 'bootstrap' / 'regime'
+        data: 历史行情，method='bootstrap' 时从其 'Close' 列计算抽样用的收益率
+        seed: 随机种子，None 时每次结果不同
+        initial_capital: 初始资金
+        commission: 手续费率
+        slippage: 滑点率
+        stop_loss: 止损比例，见 Backtester
+        take_profit: 止盈比例，见 Backtester
+        chunk_size: 每批路径数
+        max_workers: 并行执行的进程数，None 或 1 时串行
+        freq: 合成路径的K线周期（pandas 频率，默认交易日）
+        periods_per_year: 每年的K线数量，用于年化夏普比率；默认由 freq 换算（'B' 为252，'h' 为1638）
+        **generator_kwargs: 传给路径生成函数的参数，如 mu、sigma、block_size、regimes
+    
+    Returns:
+        MonteCarloResult
+    """
+    if method not in GENERATORS:
+        raise ValueError(f"未知的路径生成方法: {method}，可选: {', '.join(GENERATORS)}")
+    if n_paths <= 0 or n_bars <= 1:
+        raise ValueError("路径数必须为正，K线数量至少为2")
+    
+    if method == 'bootstrap' and 'returns' not in generator_kwargs:
+        if data is None:
+            raise ValueError("block bootstrap 需要提供历史行情 data")
+        close = data['Close'].to_numpy(dtype=np.float64)
+        generator_kwargs['returns'] = np.diff(np.log(close))
+        generator_kwargs.setdefault('s0', float(close[0]))
+    
+    index = pd.date_range('2000-01-03', periods=n_bars, freq=freq)
+    if periods_per_year is None:
+        periods_per_year = _freq_periods_per_year(freq)
+    sizes = [min(chunk_size, n_paths - start) for start in range(0, n_paths, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [
+        (child, size, n_bars, method, generator_kwargs, strategy, index,
+         initial_capital, commission, slippage, stop_loss, take_profit, periods_per_year)
+        for child, size in zip(seeds, sizes)
+    ]
+    
+    print(f"🎲 蒙特卡洛检验: {strategy.name} | {method} | {n_paths} 条路径 × {n_bars} 根K线")
+    
+    if max_workers is not None and max_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            outputs = list(executor.map(_simulate_chunk, jobs))
+    else:
+        outputs = [_simulate_chunk(job) for job in jobs]
+    
+    metrics = pd.DataFrame({
+        name: np.concatenate([np.asarray(output[name]) for output in outputs])
+        for name in outputs[0]
+    })
+    result = MonteCarloResult(strategy.name, method, metrics)
+    print(f"✅ 中位收益: {metrics['total_return'].median():.2%} | 亏损概率: {result.probability_of_loss:.2%}")
+    return result
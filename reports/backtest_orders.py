@@ -0,0 +1,663 @@
+#!/usr/bin/env python3
+"""
+事件驱动的订单撮合
+挂单（限价、止损、止损限价、止盈、跟踪止损）按价位建立有序索引，每根K线沿 OHLC 路径撮合，
+支持部分成交和按成交量的参与率限制；信号策略和直接下单的策略均可使用
+"""
+
+import bisect
+import itertools
+import math
+from abc import abstractmethod
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    BacktestResult,
+    OnlineMetrics,
+    Strategy,
+    TRADE_DTYPE,
+    TradeLog,
+    _equity_index,
+    _periods_per_year,
+)
+from backtest_stream import _BarView
+
+
+# 订单类型
+ORDER_TYPES = ('market', 'limit', 'stop', 'stop_limit', 'take_profit', 'trailing_stop')
+
+# 买卖方向，与 TRADE_DTYPE 的 side 字段一致
+BUY, SELL = 1, -1
+
+# 按限价撮合的订单类型（资金不足时继续挂单）
+_LIMIT_TYPES = ('limit', 'take_profit', 'stop_limit')
+
+
+class Order:
+    """
+    订单
+    
+    quantity 为 None 时: 买单按可用资金全仓买入；卖单卖出全部持仓，
+    即平仓单，持仓归零时自动撤销（止损、止盈等挂单不会作用到之后新开的仓位）。
+    
+    状态: 'pending' 已提交，下一根K线生效 / 'open' 挂单中 / 'filled' 已成交 / 'cancelled' 已撤销（可能部分成交）
+    """
+    
+    __slots__ = (
+        'id', 'side', 'type', 'quantity', 'limit_price', 'stop_price', 'trail',
+        'oco', 'tag', 'filled', 'status', 'triggered',
+    )
+    
+    def __init__(
+        self,
+        order_id: int,
+        side: int,
+        order_type: str,
+        quantity: Optional[int] = None,
+        limit_price: Optional[float] = None,
+        stop_price: Optional[float] = None,
+        trail: Optional[float] = None,
+        oco: Optional[str] = None,
+        tag: Optional[str] = None
+    ):
+        self.id = order_id
+        self.side = side
+        self.type = order_type
+        self.quantity = quantity
+        self.limit_price = limit_price
+        self.stop_price = stop_price
+        self.trail = trail
+        self.oco = oco
+        self.tag = tag
+        self.filled = 0
+        self.status = 'pending'
+        self.triggered = False  # 止损类订单是否已触发
+    
+    @property
+    def remaining(self) -> Optional[int]:
+        """未成交数量，平仓 / 全仓订单为 None"""
+        return None if self.quantity is None else self.quantity - self.filled
+    
+    @property
+    def is_open(self) -> bool:
+        return self.status in ('pending', 'open')
+    
+    def __repr__(self) -> str:
+        side = 'BUY' if self.side == BUY else 'SELL'
+        prices = ', '.join(
+            f"{name}={value:.4f}"
+            for name, value in (('limit', self.limit_price), ('stop', self.stop_price), ('trail', self.trail))
+            if value is not None
+        )
+        quantity = 'ALL' if self.quantity is None else self.quantity
+        return (f"Order(#{self.id} {side} {self.type} {quantity}" + (f", {prices}" if prices else '')
+                + f", filled={self.filled}, {self.status})")
+
+
+class _PriceLevels:
+    """
+    按价位索引的挂单
+    
+    有序的价位列表 + 每个价位一个先进先出队列：取出越过某一价格的全部挂单只需一次二分查找和切片，
+    不随挂单总数线性扫描；同一价位内按提交顺序成交（价格优先、时间优先）。
+    """
+    
+    __slots__ = ('prices', 'levels')
+    
+    def __init__(self):
+        self.prices: List[float] = []
+        self.levels: Dict[float, Deque[Order]] = {}
+    
+    def add(self, price: float, order: Order):
+        level = self.levels.get(price)
+        if level is None:
+            level = self.levels[price] = deque()
+            bisect.insort(self.prices, price)
+        level.append(order)
+    
+    def restore(self, price: float, orders: List[Order]):
+        """把未成交的订单放回原价位的队首，保持时间优先"""
+        if not orders:
+            return
+        level = self.levels.get(price)
+        if level is None:
+            self.levels[price] = deque(orders)
+            bisect.insort(self.prices, price)
+        else:
+            level.extendleft(reversed(orders))
+    
+    def pop_ge(self, threshold: float) -> List[Tuple[float, Deque[Order]]]:
+        """取出价位 >= threshold 的全部挂单，价位从高到低"""
+        i = bisect.bisect_left(self.prices, threshold)
+        taken = self.prices[i:]
+        del self.prices[i:]
+        return [(price, self.levels.pop(price)) for price in reversed(taken)]
+    
+    def pop_le(self, threshold: float) -> List[Tuple[float, Deque[Order]]]:
+        """取出价位 <= threshold 的全部挂单，价位从低到高"""
+        i = bisect.bisect_right(self.prices, threshold)
+        taken = self.prices[:i]
+        del self.prices[:i]
+        return [(price, self.levels.pop(price)) for price in taken]
+    
+    def merge(self, orders: List[Tuple[float, Deque[Order]]], price: float, stop_price: float):
+        """把若干价位的挂单合并到同一价位（跟踪止损的最高 / 最低价更新），并更新其止损价"""
+        merged = [order for _, level in orders for order in level if order.status == 'open']
+        for order in merged:
+            order.stop_price = stop_price
+        self.restore(price, merged)
+    
+    def compact(self):
+        """清除已撤销的订单"""
+        for price in list(self.prices):
+            level = deque(order for order in self.levels[price] if order.status == 'open')
+            if level:
+                self.levels[price] = level
+            else:
+                del self.levels[price]
+        self.prices = sorted(self.levels)
+
+
+class OrderEngine:
+    """
+    订单撮合与账户
+    
+    订单在提交后的下一根K线生效，每根K线按以下顺序撮合:
+        1. 市价单（含上一根K线触发后未成交完的止损单）按开盘价成交
+        2. 开盘价已越过的挂单按开盘价成交（跳空）
+        3. 价格沿 开盘 → 较近的极值 → 另一个极值 的路径移动，每段按经过的价位依次成交:
+           下跌段成交买入限价单、触发卖出止损 / 跟踪止损；上涨段成交卖出限价 / 止盈单、触发买入止损 / 跟踪止损
+    止损单触发后按触发价（跳空时为开盘价）加滑点成交；止损限价单触发后转为限价单。
+    跟踪止损的止损价随之后的最高价（卖出）/ 最低价（买入）移动，上涨段结束时更新。
+    
+    只做多：卖出数量不超过持仓。指定 max_participation 时每根K线的成交量不超过
+    成交量 × max_participation，超出部分留到之后的K线继续成交。
+    """
+    
+    def __init__(
+        self,
+        initial_capital: float = 100000.0,
+        commission: float = 0.001,
+        slippage: float = 0.001,
+        max_participation: Optional[float] = None,
+        on_fill: Optional[Callable[[Order, int, float], None]] = None
+    ):
+        """
+        Args:
+            initial_capital: 初始资金
+            commission: 手续费率
+            slippage: 市价单 / 止损单的滑点率（限价单按限价成交，不计滑点）
+            max_participation: 每根K线最多成交该K线成交量的比例，如 0.1；None 不限制
+            on_fill: 成交回调 (订单, 成交数量, 成交价)
+        """
+        if max_participation is not None and not 0 < max_participation <= 1:
+            raise ValueError("max_participation 必须在 (0, 1] 之间")
+        
+        self.capital = initial_capital
+        self.position = 0
+        self.open_cost = 0.0  # 持仓总成本（含手续费）
+        self.commission = commission
+        self.slippage = slippage
+        self.max_participation = max_participation
+        self.on_fill = on_fill
+        self.bar = -1  # 当前K线序号
+        self.last_price = math.nan
+        
+        self._ids = itertools.count(1)
+        self._orders: Dict[int, Order] = {}  # 未完成的订单
+        self._incoming: List[Order] = []
+        self._market: Deque[Order] = deque()
+        self._buy_limits = _PriceLevels()
+        self._sell_limits = _PriceLevels()
+        self._buy_stops = _PriceLevels()
+        self._sell_stops = _PriceLevels()
+        self._trailing: Dict[Tuple[int, float], _PriceLevels] = {}  # (方向, 跟踪比例) -> 最高 / 最低价索引
+        self._oco: Dict[str, List[Order]] = {}
+        self._close_orders: Dict[int, Order] = {}
+        self._stale = 0  # 索引中已撤销的订单数
+        self._capacity = math.inf
+        self._trades: List[Tuple] = []
+    
+    def submit(
+        self,
+        side: int,
+        order_type: str = 'market',
+        quantity: Optional[int] = None,
+        limit_price: Optional[float] = None,
+        stop_price: Optional[float] = None,
+        trail: Optional[float] = None,
+        oco: Optional[str] = None,
+        tag: Optional[str] = None
+    ) -> Order:
+        """
+        提交订单，下一根K线生效
+        
+        Args:
+            side: BUY / SELL
+            order_type: 'market' 市价 / 'limit' 限价 / 'stop' 止损 / 'stop_limit' 止损限价 /
+                        'take_profit' 止盈（按限价撮合）/ 'trailing_stop' 跟踪止损
+            quantity: 股数；None 表示全仓买入 / 全部平仓
+            limit_price: 限价（limit、take_profit、stop_limit）
+            stop_price: 触发价（stop、stop_limit）
+            trail: 跟踪止损的回撤比例，如 0.05 表示从最高价回落5%时卖出
+            oco: 二选一分组，同组任一订单成交后撤销其他订单
+            tag: 备注
+        """
+        if order_type not in ORDER_TYPES:
+            raise ValueError(f"未知的订单类型: {order_type}，可选: {', '.join(ORDER_TYPES)}")
+        if side not in (BUY, SELL):
+            raise ValueError("side 必须为 BUY (1) 或 SELL (-1)")
+        if quantity is not None and quantity <= 0:
+            raise ValueError("quantity 必须为正")
+        if order_type in _LIMIT_TYPES and limit_price is None:
+            raise ValueError(f"{order_type} 订单需要 limit_price")
+        if order_type in ('stop', 'stop_limit') and stop_price is None:
+            raise ValueError(f"{order_type} 订单需要 stop_price")
+        if order_type == 'trailing_stop' and (trail is None or not 0 < trail < 1):
+            raise ValueError("trailing_stop 订单需要 0 < trail < 1")
+        
+        order = Order(next(self._ids), side, order_type, quantity, limit_price, stop_price, trail, oco, tag)
+        self._orders[order.id] = order
+        self._incoming.append(order)
+        if oco is not None:
+            self._oco.setdefault(oco, []).append(order)
+        if quantity is None and side == SELL:
+            self._close_orders[order.id] = order
+        return order
+    
+    def buy(self, quantity: Optional[int] = None, order_type: str = 'market', **kwargs) -> Order:
+        """提交买单，参数见 submit"""
+        return self.submit(BUY, order_type, quantity, **kwargs)
+    
+    def sell(self, quantity: Optional[int] = None, order_type: str = 'market', **kwargs) -> Order:
+        """提交卖单，参数见 submit"""
+        return self.submit(SELL, order_type, quantity, **kwargs)
+    
+    def cancel(self, order: Order) -> bool:
+        """撤销订单，返回是否成功（已成交或已撤销的订单返回 False）"""
+        if not order.is_open:
+            return False
+        # 价位索引中的订单在取出时跳过，已撤销的订单过多时整体清理
+        if order.status == 'open':
+            self._stale += 1
+        self._finish(order, 'cancelled')
+        return True
+    
+    @property
+    def open_orders(self) -> List[Order]:
+        """未完成的订单（按提交顺序）"""
+        return list(self._orders.values())
+    
+    def equity(self, price: float) -> float:
+        """按给定价格计算的权益"""
+        return self.capital + self.position * price
+    
+    def trades(self) -> np.ndarray:
+        """全部成交记录（TRADE_DTYPE，bar 为K线序号）"""
+        return np.array(self._trades, dtype=TRADE_DTYPE)
+    
+    def process_bar(self, open_: float, high: float, low: float, close: float, volume: float = math.nan):
+        """撮合一根K线"""
+        self.bar += 1
+        self._capacity = math.inf
+        if self.max_participation is not None and volume == volume:
+            self._capacity = int(volume * self.max_participation)
+        self._activate(open_)
+        
+        # 市价单按开盘价成交
+        for _ in range(len(self._market)):
+            order = self._market.popleft()
+            if self._execute(order, open_, self.slippage, resting=False):
+                self._market.append(order)
+        
+        # 开盘跳空越过的挂单，再沿 开盘 → 较近的极值 → 另一个极值 的路径撮合
+        self._falling(open_, open_)
+        self._rising(open_, open_)
+        if open_ - low <= high - open_:
+            self._falling(open_, low)
+            self._rising(low, high)
+        else:
+            self._rising(open_, high)
+            self._falling(high, low)
+        
+        self.last_price = close
+    
+    def _activate(self, open_: float):
+        """上一根K线提交的订单生效"""
+        if self._stale > max(1024, len(self._orders)):
+            for book in (self._buy_limits, self._sell_limits, self._buy_stops, self._sell_stops,
+                         *self._trailing.values()):
+                book.compact()
+            self._market = deque(order for order in self._market if order.status == 'open')
+            self._stale = 0
+        
+        incoming, self._incoming = self._incoming, []
+        for order in incoming:
+            if order.status != 'pending':
+                continue
+            order.status = 'open'
+            if order.type == 'market':
+                self._market.append(order)
+            elif order.type in ('limit', 'take_profit'):
+                (self._buy_limits if order.side == BUY else self._sell_limits).add(order.limit_price, order)
+            elif order.type in ('stop', 'stop_limit'):
+                (self._buy_stops if order.side == BUY else self._sell_stops).add(order.stop_price, order)
+            else:
+                # 跟踪止损以提交时的收盘价为起点
+                reference = self.last_price if self.last_price == self.last_price else open_
+                order.stop_price = reference * (1 - order.trail if order.side == SELL else 1 + order.trail)
+                self._trailing.setdefault((order.side, order.trail), _PriceLevels()).add(reference, order)
+    
+    def _falling(self, start: float, end: float):
+        """价格从 start 下跌到 end：依次成交买入限价单，触发卖出止损 / 跟踪止损"""
+        events = [(price, 1, self._buy_limits, level) for price, level in self._buy_limits.pop_ge(end)]
+        events += [(price, 0, None, level) for price, level in self._sell_stops.pop_ge(end)]
+        for (side, trail), book in self._trailing.items():
+            if side == SELL:
+                events += [(peak * (1 - trail), 0, None, level) for peak, level in book.pop_ge(end / (1 - trail))]
+        # 价位从高到低依次经过；同一价位先卖后买，释放的资金可用于买入
+        events.sort(key=lambda e: (-e[0], e[1]))
+        for price, _, book, level in events:
+            self._process_level(price, min(price, start), book, level)
+        
+        for (side, trail), book in self._trailing.items():
+            if side == BUY:
+                book.merge(book.pop_ge(end), end, end * (1 + trail))
+    
+    def _rising(self, start: float, end: float):
+        """价格从 start 上涨到 end：依次成交卖出限价 / 止盈单，触发买入止损 / 跟踪止损"""
+        events = [(price, 0, self._sell_limits, level) for price, level in self._sell_limits.pop_le(end)]
+        events += [(price, 1, None, level) for price, level in self._buy_stops.pop_le(end)]
+        for (side, trail), book in self._trailing.items():
+            if side == BUY:
+                events += [(trough * (1 + trail), 1, None, level) for trough, level in book.pop_le(end / (1 + trail))]
+        events.sort(key=lambda e: (e[0], e[1]))
+        for price, _, book, level in events:
+            self._process_level(price, max(price, start), book, level)
+        
+        for (side, trail), book in self._trailing.items():
+            if side == SELL:
+                book.merge(book.pop_le(end), end, end * (1 - trail))
+    
+    def _process_level(self, price: float, fill_price: float, book: Optional[_PriceLevels], level: Deque[Order]):
+        """
+        处理一个价位的订单
+        
+        book 为限价单索引时按 fill_price 成交、未成交部分放回原价位；为 None 时是触发的止损类订单
+        """
+        survivors = []
+        for order in level:
+            if order.status != 'open':
+                self._stale -= 1
+                continue
+            if book is not None:
+                if self._execute(order, fill_price, 0.0, resting=True):
+                    survivors.append(order)
+            else:
+                self._trigger(order, fill_price)
+        if book is not None:
+            book.restore(price, survivors)
+    
+    def _trigger(self, order: Order, price: float):
+        """止损类订单在 price 触发"""
+        order.triggered = True
+        if order.type == 'trailing_stop':
+            order.stop_price = price
+        
+        if order.type == 'stop_limit':
+            # 转为限价单：触发价优于限价时立即成交，否则挂在限价上
+            crosses = price <= order.limit_price if order.side == BUY else price >= order.limit_price
+            if crosses and not self._execute(order, price, 0.0, resting=True):
+                return
+            if order.status == 'open':
+                (self._buy_limits if order.side == BUY else self._sell_limits).add(order.limit_price, order)
+            return
+        
+        # 止损 / 跟踪止损按市价成交，受参与率限制未成交的部分下一根K线开盘继续
+        if self._execute(order, price, self.slippage, resting=False):
+            self._market.append(order)
+    
+    def _execute(self, order: Order, price: float, slippage: float, resting: bool) -> bool:
+        """
+        按 price 成交尽可能多的数量
+        
+        Returns:
+            订单是否仍需继续挂单（受参与率限制，或资金不足的限价买单）
+        """
+        if order.status != 'open':
+            return False
+        
+        if order.side == BUY:
+            fill_price = price * (1 + slippage)
+            available = int(self.capital * (1 - self.commission) / fill_price)
+        else:
+            fill_price = price * (1 - slippage)
+            available = self.position
+        demand = available if order.quantity is None else min(order.quantity - order.filled, available)
+        shares = min(demand, self._capacity)
+        if shares > 0:
+            self._fill(order, shares, fill_price)
+            if not order.is_open:
+                return False
+        
+        if order.remaining == 0 or (order.quantity is None and shares == available and shares > 0):
+            self._finish(order, 'filled')
+            return False
+        if shares < demand:
+            return True
+        # 资金 / 持仓不足: 限价买单继续挂单，其余订单撤销剩余部分
+        if order.side == BUY and resting and order.type in _LIMIT_TYPES:
+            return True
+        self._finish(order, 'cancelled')
+        return False
+    
+    def _fill(self, order: Order, shares: int, price: float):
+        # 运算顺序与逐行引擎一致（金额加减手续费），结果逐位相同
+        amount = shares * price
+        if order.side == BUY:
+            total_cost = amount + amount * self.commission
+            self.capital -= total_cost
+            self.position += shares
+            self.open_cost += total_cost
+            self._trades.append((self.bar, BUY, price, shares, total_cost, 0.0, 0.0, self.capital))
+        else:
+            net_revenue = amount - amount * self.commission
+            # 按平均成本结转部分卖出的成本，全部卖出时直接结转持仓成本
+            cost = self.open_cost if shares == self.position else self.open_cost * shares / self.position
+            pnl = net_revenue - cost
+            self.capital += net_revenue
+            self.position -= shares
+            self.open_cost = self.open_cost - cost if self.position > 0 else 0.0
+            self._trades.append((self.bar, SELL, price, shares, net_revenue, pnl, pnl / cost, self.capital))
+        order.filled += shares
+        self._capacity -= shares
+        
+        if order.oco is not None:
+            for other in self._oco.pop(order.oco, []):
+                if other is not order:
+                    self.cancel(other)
+        if self.position == 0:
+            for other in list(self._close_orders.values()):
+                if other is not order:
+                    self.cancel(other)
+        if self.on_fill is not None:
+            self.on_fill(order, shares, price)
+    
+    def _finish(self, order: Order, status: str):
+        order.status = status
+        self._orders.pop(order.id, None)
+        self._close_orders.pop(order.id, None)
+
+
+class OrderStrategy(Strategy):
+    """
+    直接下单的策略基类
+    
+    每根K线撮合结束后调用 on_orders，通过 engine 提交 / 撤销订单（下一根K线生效）。
+    """
+    
+    def generate_signals(self, data: pd.DataFrame) -> pd.DataFrame:
+        df = data.copy()
+        df['signal'] = 0
+        return df
+    
+    @abstractmethod
+    def on_orders(self, engine: OrderEngine, bar):
+        """
+        Args:
+            engine: 订单引擎，提供 buy / sell / cancel、持仓与资金
+            bar: 当前K线（'Open'、'High'、'Low'、'Close'、'Volume' 等字段的只读映射）
+        """
+        pass
+    
+    def on_fill(self, order: Order, shares: int, price: float):
+        """成交回调"""
+        pass
+
+
+class OrderBacktester:
+    """
+    事件驱动回测引擎
+    
+    每根K线依次: 撮合已生效的订单 → 按收盘价记录权益 → 策略下单（下一根K线生效）。
+        - 信号策略 (Strategy): 信号为1且空仓时以市价全仓买入，为-1且持仓时市价平仓，均在下一根K线开盘成交；
+          指定 stop_loss / take_profit / trailing_stop 时，买入成交后按成交价挂出对应的平仓单，按K线最高 / 最低价触发
+        - 下单策略 (OrderStrategy): 由 on_orders 直接提交限价、止损等订单
+    缺少 Open / High / Low 列时以收盘价代替，缺少 Volume 列时不限制参与率。
+    """
+    
+    def __init__(
+        self,
+        strategy: Strategy,
+        symbol: str = '',
+        initial_capital: float = 100000.0,
+        commission: float = 0.001,
+        slippage: float = 0.001,
+        interval: str = '1d',
+        periods_per_year: Optional[float] = None,
+        stop_loss: Optional[float] = None,
+        take_profit: Optional[float] = None,
+        trailing_stop: Optional[float] = None,
+        max_participation: Optional[float] = None
+    ):
+        """
+        初始化事件驱动回测引擎
+        
+        Args:
+            strategy: 信号策略或 OrderStrategy
+            symbol: 股票代码（仅用于结果展示）
+            initial_capital: 初始资金
+            commission: 手续费率
+            slippage: 市价单 / 止损单的滑点率
+            interval: 数据周期，用于换算年化
+            periods_per_year: 每年的K线数量，默认按 interval 换算
+            stop_loss: 止损比例，如 0.05 表示最低价跌破成交价5%时卖出；None 不启用
+            take_profit: 止盈比例，如 0.2 表示最高价达到成交价120%时卖出；None 不启用
+            trailing_stop: 跟踪止损比例，如 0.1 表示从持仓期间最高价回落10%时卖出；None 不启用
+            max_participation: 每根K线最多成交该K线成交量的比例；None 不限制
+        """
+        self.strategy = strategy
+        self.symbol = symbol
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.slippage = slippage
+        self.interval = interval
+        self.periods_per_year = periods_per_year if periods_per_year is not None else _periods_per_year(interval)
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.trailing_stop = trailing_stop
+        self.max_participation = max_participation
+        self.engine: Optional[OrderEngine] = None  # 最近一次回测的订单引擎
+        self._entry: Optional[Order] = None
+        self._exit: Optional[Order] = None
+        self._bracketed = False
+    
+    def _on_fill(self, order: Order, shares: int, price: float):
+        if isinstance(self.strategy, OrderStrategy):
+            self.strategy.on_fill(order, shares, price)
+            return
+        if order.side == BUY and not self._bracketed:
+            # 第一次买入成交后挂出平仓单；平仓单在持仓归零时自动撤销
+            self._bracketed = True
+            if self.stop_loss is not None:
+                self.engine.sell(order_type='stop', stop_price=price * (1 - self.stop_loss), tag='stop_loss')
+            if self.take_profit is not None:
+                self.engine.sell(order_type='take_profit', limit_price=price * (1 + self.take_profit), tag='take_profit')
+            if self.trailing_stop is not None:
+                self.engine.sell(order_type='trailing_stop', trail=self.trailing_stop, tag='trailing_stop')
+        elif order.side == SELL and self.engine.position == 0:
+            self._bracketed = False
+    
+    def _on_signal(self, signal: float):
+        engine = self.engine
+        if signal == 1 and engine.position == 0 and not (self._entry is not None and self._entry.is_open):
+            self._entry = engine.buy(tag='signal')
+        elif signal == -1 and engine.position > 0 and not (self._exit is not None and self._exit.is_open):
+            self._exit = engine.sell(tag='signal')
+    
+    def run(self, data: pd.DataFrame) -> BacktestResult:
+        """
+        执行回测
+        
+        Args:
+            data: 行情数据，至少包含 'Close' 列
+        """
+        if data.empty:
+            raise ValueError("没有可回测的行情数据")
+        print(f"📒 开始事件驱动回测: {self.symbol} - {self.strategy.name}")
+        
+        self.engine = engine = OrderEngine(
+            self.initial_capital, self.commission, self.slippage, self.max_participation, on_fill=self._on_fill
+        )
+        self._entry = self._exit = None
+        self._bracketed = False
+        
+        close = data['Close'].to_numpy(dtype=np.float64)
+        columns = {col: data[col].to_numpy() for col in data.columns}
+        open_, high, low = (
+            data[col].to_numpy(dtype=np.float64) if col in data.columns else close
+            for col in ('Open', 'High', 'Low')
+        )
+        volume = data['Volume'].to_numpy(dtype=np.float64) if 'Volume' in data.columns else np.full(len(data), np.nan)
+        
+        order_strategy = isinstance(self.strategy, OrderStrategy)
+        signals = None
+        if order_strategy:
+            self.strategy.reset()
+        else:
+            signals = self.strategy.generate_signals(data)['signal'].to_numpy(dtype=np.float64)
+        
+        metrics = OnlineMetrics(self.initial_capital, self.periods_per_year)
+        equity = np.empty(len(data), dtype=np.float64)
+        view = _BarView(columns)
+        dates = data.index
+        
+        for i in range(len(data)):
+            engine.process_bar(open_[i], high[i], low[i], close[i], volume[i])
+            equity[i] = engine.capital + engine.position * close[i]
+            metrics.update(dates[i], equity[i], exposed=engine.position > 0)
+            if order_strategy:
+                view._row = i
+                self.strategy.on_orders(engine, view)
+            else:
+                self._on_signal(signals[i])
+        
+        trades = engine.trades()
+        metrics.record_trades(trades)
+        index = _equity_index(dates)
+        result = BacktestResult(
+            strategy_name=self.strategy.name,
+            symbol=self.symbol,
+            start_date=dates[0].strftime('%Y-%m-%d'),
+            end_date=dates[-1].strftime('%Y-%m-%d'),
+            initial_capital=self.initial_capital,
+            equity_curve=pd.Series(equity, index=index, name='equity'),
+            trades=TradeLog(trades, index),
+            **metrics.result()
+        )
+        print(f"✅ 事件驱动回测完成: {len(data):,} 根K线, {len(trades)} 笔成交, {len(engine.open_orders)} 笔挂单未完成")
+        return result
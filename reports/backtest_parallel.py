@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+并行回测
+将 (标的, 策略) 任务分发到进程池执行，行情数据通过共享内存提供给子进程；
+回测结果的图表同样可在进程池中批量渲染
+"""
+
+import contextlib
+import io
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from multiprocessing import shared_memory
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    MATPLOTLIB_AVAILABLE,
+    BacktestResult,
+    Backtester,
+    ChartTemplate,
+    Strategy,
+    _decimate_series,
+)
+from backtest_data import YFinanceProvider
+from backtest_loader import load_universe
+
+
+# 子进程中挂载的共享行情数据 {symbol: DataFrame}
+_WORKER_DATA: Dict[str, pd.DataFrame] = {}
+_WORKER_SEGMENTS: List[shared_memory.SharedMemory] = []
+# 子进程中复用的图表模板
+_WORKER_CHART: Dict[str, ChartTemplate] = {}
+
+
+class SharedMarketData:
+    """
+    共享内存中的多标的行情数据
+
+    所有标的的数值列按行拼接成一个 float64 矩阵，时间索引拼接成一个 int64 数组，
+    分别放入两段共享内存；子进程只需接收段名和每个标的的偏移量即可零拷贝挂载。
+    """
+
+    def __init__(self, frames: Dict[str, pd.DataFrame]):
+        if not frames:
+            raise ValueError("没有可共享的行情数据")
+
+        first = next(iter(frames.values()))
+        columns = [c for c in first.select_dtypes('number').columns
+                   if all(c in df.columns for df in frames.values())]
+        if 'Close' not in columns:
+            raise ValueError("行情数据必须包含 'Close' 列")
+
+        total_rows = sum(len(df) for df in frames.values())
+        self.columns = columns
+        self.layout: Dict[str, Tuple[int, int, object]] = {}  # symbol -> (起始行, 行数, 时区)
+
+        self._values = shared_memory.SharedMemory(create=True, size=max(total_rows * len(columns) * 8, 1))
+        self._index = shared_memory.SharedMemory(create=True, size=max(total_rows * 8, 1))
+        values = np.ndarray((total_rows, len(columns)), dtype=np.float64, buffer=self._values.buf)
+        index = np.ndarray((total_rows,), dtype=np.int64, buffer=self._index.buf)
+
+        offset = 0
+        for symbol, df in frames.items():
+            if not isinstance(df.index, pd.DatetimeIndex):
+                raise ValueError(f"{symbol} 的索引必须是 DatetimeIndex")
+            rows = len(df)
+            values[offset:offset + rows] = df[columns].to_numpy(dtype=np.float64)
+            index[offset:offset + rows] = df.index.as_unit('ns').asi8
+            self.layout[symbol] = (offset, rows, df.index.tz)
+            offset += rows
+
+        self.total_rows = total_rows
+
+    def spec(self) -> Dict:
+        """子进程挂载所需的元数据（每个子进程只传一次）"""
+        return {
+            'values': self._values.name,
+            'index': self._index.name,
+            'total_rows': self.total_rows,
+            'columns': self.columns,
+            'layout': self.layout,
+        }
+
+    def close(self):
+        """释放共享内存"""
+        for segment in (self._values, self._index):
+            segment.close()
+            segment.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _attach_shared_data(spec: Dict):
+    """子进程初始化：挂载共享内存并构建各标的的 DataFrame 视图"""
+    values_segment = shared_memory.SharedMemory(name=spec['values'])
+    index_segment = shared_memory.SharedMemory(name=spec['index'])
+    _WORKER_SEGMENTS.extend([values_segment, index_segment])
+
+    total_rows = spec['total_rows']
+    values = np.ndarray((total_rows, len(spec['columns'])), dtype=np.float64, buffer=values_segment.buf)
+    index = np.ndarray((total_rows,), dtype=np.int64, buffer=index_segment.buf)
+    # 所有任务共用同一份数据：只读，策略生成信号前会自行复制
+    values.flags.writeable = False
+    index.flags.writeable = False
+
+    for symbol, (offset, rows, tz) in spec['layout'].items():
+        dates = pd.DatetimeIndex(index[offset:offset + rows].view('datetime64[ns]'))
+        if tz is not None:
+            dates = dates.tz_localize('UTC').tz_convert(tz)
+        _WORKER_DATA[symbol] = pd.DataFrame(
+            values[offset:offset + rows], index=dates, columns=spec['columns'], copy=False
+        )
+
+
+def _run_job(job: Tuple) -> Tuple[str, str, Optional[Dict], Optional[str]]:
+    """子进程执行单个 (标的, 策略) 回测，返回 (标的, 策略名, 指标, 错误信息)"""
+    symbol, strategy, start_date, end_date, initial_capital, engine = job
+    try:
+        backtester = Backtester(
+            symbol=symbol,
+            strategy=strategy,
+            start_date=start_date,
+            end_date=end_date,
+            initial_capital=initial_capital,
+            engine=engine
+        )
+        # 子进程的输出统一由主进程汇总打印
+        with contextlib.redirect_stdout(io.StringIO()):
+            # 直接使用共享内存视图，不按任务复制
+            backtester.data = _WORKER_DATA[symbol]
+            result = backtester.run()
+        return symbol, strategy.name, result.to_dict(), None
+    except Exception as e:
+        return symbol, strategy.name, None, str(e)
+
+
+def parallel_compare(
+    symbols: List[str],
+    strategies: List[Strategy],
+    start_date: str,
+    end_date: str,
+    initial_capital: float = 100000.0,
+    max_workers: Optional[int] = None,
+    engine: str = 'vectorized',
+    data: Optional[Dict[str, pd.DataFrame]] = None,
+    data_store=None,
+    fetch_workers: int = 16,
+    rate_limit: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    多标的、多策略并行回测
+
+    Args:
+        symbols: 股票代码列表
+        strategies: 策略列表
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        initial_capital: 初始资金
+        max_workers: 进程数，默认使用全部CPU核心
+        engine: 执行引擎，见 Backtester
+        data: 预先加载的行情数据 {symbol: DataFrame}，缺失的标的并发获取
+        data_store: 本地行情缓存，见 Backtester；为None时直接请求yfinance
+        fetch_workers: 并发获取行情的线程数
+        rate_limit: 获取行情时每秒最多请求数，None 不限速
+
+    Returns:
+        DataFrame 每行一个 (标的, 策略) 的回测指标
+    """
+    data = dict(data or {})
+    missing = [symbol for symbol in symbols if symbol not in data]
+    fetched = {}
+    if missing:
+        # 与 Backtester.fetch_data 相同：多获取100天后截取到开始日期
+        start = datetime.strptime(start_date, '%Y-%m-%d')
+        universe = load_universe(
+            missing, start - timedelta(days=100), datetime.strptime(end_date, '%Y-%m-%d'),
+            source=data_store if data_store is not None else YFinanceProvider(),
+            max_workers=fetch_workers, rate_limit=rate_limit
+        )
+        for symbol, error in universe.errors.items():
+            print(f"❌ 数据获取失败: {symbol}: {error}")
+        fetched = {symbol: df[df.index >= start_date] for symbol, df in universe.frames.items()}
+
+    frames = {}
+    for symbol in symbols:
+        if symbol in data:
+            frames[symbol] = data[symbol]
+        elif symbol in fetched:
+            frames[symbol] = fetched[symbol]
+
+    if not frames:
+        return pd.DataFrame()
+
+    jobs = [
+        (symbol, strategy, start_date, end_date, initial_capital, engine)
+        for symbol in frames
+        for strategy in strategies
+    ]
+    max_workers = max_workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (max_workers * 4))
+
+    print(f"🚀 并行回测: {len(frames)} 个标的 × {len(strategies)} 个策略, {max_workers} 个进程")
+
+    results = []
+    with SharedMarketData(frames) as shared:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_attach_shared_data,
+            initargs=(shared.spec(),)
+        ) as executor:
+            for symbol, strategy_name, metrics, error in executor.map(_run_job, jobs, chunksize=chunksize):
+                if error is not None:
+                    print(f"❌ 回测失败: {symbol} {strategy_name}: {error}")
+                    continue
+                print(f"✅ {symbol:<10} {strategy_name:25} | 收益: {metrics['total_return']:>8}")
+                results.append(metrics)
+
+    return pd.DataFrame(results)
+
+
+def _init_chart_worker(dpi: Union[int, str], figsize: Tuple[float, float], max_points: Optional[int]):
+    """子进程初始化：使用无界面的 Agg 后端，创建本进程复用的图表模板"""
+    import matplotlib
+    matplotlib.use('Agg')
+    _WORKER_CHART['template'] = ChartTemplate(dpi=dpi, figsize=figsize, max_points=max_points)
+
+
+def _render_job(job: Tuple) -> Tuple[str, Optional[str]]:
+    """用本进程的模板绘制并保存单个结果，返回 (路径, 错误信息)"""
+    result, prices, path = job
+    try:
+        chart = _WORKER_CHART['template']
+        chart.draw(result, prices)
+        chart.save(path)
+        return path, None
+    except Exception as e:
+        return path, str(e)
+
+
+def _chart_filename(i: int, result: BacktestResult, fmt: str) -> str:
+    name = re.sub(r'[^\w.-]+', '_', f"{result.symbol}_{result.strategy_name}")
+    return f"{i:05d}_{name}.{fmt}"
+
+
+def render_charts(
+    results: List[BacktestResult],
+    output_dir: Union[str, Path],
+    prices: Optional[Dict[str, pd.Series]] = None,
+    dpi: Union[int, str] = 'thumbnail',
+    figsize: Tuple[float, float] = (14, 12),
+    max_points: Optional[int] = 2000,
+    max_workers: Optional[int] = None,
+    fmt: str = 'png',
+    filenames: Optional[List[str]] = None
+) -> List[str]:
+    """
+    批量渲染回测结果图表
+
+    每个子进程创建一个 ChartTemplate 并依次绘制分到的结果；收盘价在主进程中先降采样，
+    只向子进程传递绘制所需的点。
+
+    Args:
+        results: 回测结果列表
+        output_dir: 输出目录（不存在时创建）
+        prices: {symbol: 收盘价序列}，缺失的标的价格图只显示买卖点
+        dpi: 分辨率，数值或 CHART_DPI 中的预设；缩略图用 'thumbnail'，出版用 'print'
+        figsize: 图表尺寸（英寸）
+        max_points: 每条曲线最多绘制的点数，None 不降采样
+        max_workers: 进程数，默认使用全部CPU核心；为1时在当前进程中渲染
+        fmt: 图片格式，如 'png', 'svg', 'pdf'
+        filenames: 各结果的文件名，默认 '{序号}_{标的}_{策略}.{fmt}'
+
+    Returns:
+        成功保存的文件路径
+    """
+    if not MATPLOTLIB_AVAILABLE:
+        raise ImportError("matplotlib 未安装，无法生成图表。运行: pip install matplotlib")
+    if filenames is not None and len(filenames) != len(results):
+        raise ValueError("filenames 的数量必须与 results 一致")
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    prices = {symbol: _decimate_series(series, max_points) for symbol, series in (prices or {}).items()}
+    jobs = [
+        (
+            result,
+            prices.get(result.symbol),
+            str(output_dir / (filenames[i] if filenames is not None else _chart_filename(i, result, fmt)))
+        )
+        for i, result in enumerate(results)
+    ]
+    if not jobs:
+        return []
+
+    max_workers = min(max_workers or os.cpu_count() or 1, len(jobs))
+    print(f"🖼️  批量出图: {len(jobs)} 张, {max_workers} 个进程")
+
+    if max_workers == 1:
+        _init_chart_worker(dpi, figsize, max_points)
+        outcomes = map(_render_job, jobs)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_init_chart_worker,
+            initargs=(dpi, figsize, max_points)
+        )
+        chunksize = max(1, len(jobs) // (max_workers * 4))
+        outcomes = executor.map(_render_job, jobs, chunksize=chunksize)
+
+    saved = []
+    try:
+        for path, error in outcomes:
+            if error is not None:
+                print(f"❌ 出图失败: {path}: {error}")
+                continue
+            saved.append(path)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    print(f"✅ 已保存 {len(saved)} 张图表至: {output_dir}")
+    return saved
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+组合回测
+在 (日期 × 标的) 价格矩阵上按目标权重定期调仓，调仓计算在整个标的池上以矩阵运算完成
+"""
+
+from typing import Dict, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from backtest import BacktestResult, OnlineMetrics, _equity_index, _periods_per_year
+
+
+# 调仓周期：'D' 每根K线, 'W' 每周, 'M' 每月, 'Q' 每季度, 'Y' 每年；或整数N表示每N根K线
+REBALANCE_RULES = ('D', 'W', 'M', 'Q', 'Y')
+
+
+def _rebalance_mask(index: pd.DatetimeIndex, rebalance: Union[str, int]) -> np.ndarray:
+    """标记调仓日：每个周期的第一根K线"""
+    n = len(index)
+    if isinstance(rebalance, int):
+        if rebalance <= 0:
+            raise ValueError("调仓间隔必须为正整数")
+        return np.arange(n) % rebalance == 0
+    if rebalance not in REBALANCE_RULES:
+        raise ValueError(f"未知的调仓周期: {rebalance}，可选: {', '.join(REBALANCE_RULES)} 或整数")
+    if rebalance == 'D':
+        return np.ones(n, dtype=bool)
+    
+    naive = index.tz_localize(None) if index.tz is not None else index
+    codes = naive.to_period(rebalance).asi8
+    mask = np.ones(n, dtype=bool)
+    mask[1:] = codes[1:] != codes[:-1]
+    return mask
+
+
+class PortfolioBacktester:
+    """组合回测引擎"""
+    
+    def __init__(
+        self,
+        prices: pd.DataFrame,
+        weights: Optional[Union[Dict[str, float], pd.Series, pd.DataFrame]] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        initial_capital: float = 100000.0,
+        commission: float = 0.001,  # 手续费率
+        slippage: float = 0.001,  # 滑点
+        rebalance: Union[str, int] = 'M',
+        name: str = 'Portfolio',
+        record_trades: bool = True,
+        interval: str = '1d',
+        periods_per_year: Optional[float] = None,
+    ):
+        """
+        初始化组合回测引擎
+        
+        Args:
+            prices: 收盘价矩阵，索引为日期，每列一个标的；上市前/停牌为NaN
+            weights: 目标权重。None 为可交易标的等权；dict/Series 为固定权重；
+                     DataFrame (日期 × 标的) 为随时间变化的权重，调仓日取最近一行
+            start_date: 开始日期 (YYYY-MM-DD)，默认使用全部数据
+            end_date: 结束日期 (YYYY-MM-DD)
+            initial_capital: 初始资金
+            commission: 手续费率（与 Backtester 相同：按成交金额收取）
+            slippage: 滑点率（与 Backtester 相同：买入价上浮、卖出价下浮）
+            rebalance: 调仓周期，见 REBALANCE_RULES
+            name: 组合名称
+            record_trades: 是否生成逐笔交易记录（高频调仓时关闭可节省时间）
+            interval: 数据周期，如 '1d', '1h'
+            periods_per_year: 每年的K线数量，用于年化夏普比率；默认按 interval 换算
+        """
+        if not isinstance(prices.index, pd.DatetimeIndex):
+            raise ValueError("价格矩阵的索引必须是 DatetimeIndex")
+        
+        prices = prices.sort_index()
+        if start_date is not None:
+            prices = prices[prices.index >= start_date]
+        if end_date is not None:
+            prices = prices[prices.index <= end_date]
+        if prices.empty:
+            raise ValueError("指定区间内没有价格数据")
+        
+        self.prices = prices
+        self.symbols = list(prices.columns)
+        self.weights = weights
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.slippage = slippage
+        self.rebalance = rebalance
+        self.name = name
+        self.record_trades = record_trades
+        self.interval = interval
+        self.periods_per_year = periods_per_year if periods_per_year is not None else _periods_per_year(interval)
+        self.trades = []
+    
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame], column: str = 'Close', **kwargs) -> 'PortfolioBacktester':
+        """由 {symbol: 单标的行情DataFrame} 构造价格矩阵"""
+        prices = pd.concat({symbol: df[column] for symbol, df in frames.items()}, axis=1)
+        return cls(prices, **kwargs)
+    
+    def _target_weights(self) -> Optional[np.ndarray]:
+        """目标权重矩阵 (日期 × 标的)，等权时返回None"""
+        if self.weights is None:
+            return None
+        if isinstance(self.weights, pd.DataFrame):
+            weights = self.weights.reindex(columns=self.symbols)
+            weights = weights.reindex(self.prices.index.union(weights.index)).ffill().reindex(self.prices.index)
+            weights = weights.fillna(0.0).to_numpy(dtype=np.float64)
+        else:
+            row = pd.Series(self.weights, dtype=np.float64).reindex(self.symbols).fillna(0.0).to_numpy()
+            weights = np.broadcast_to(row, (len(self.prices), len(self.symbols)))
+        if (weights < 0).any():
+            raise ValueError("目标权重不能为负（不支持做空）")
+        return weights
+    
+    def run(self) -> BacktestResult:
+        """运行组合回测"""
+        prices = self.prices.to_numpy(dtype=np.float64)
+        # 估值使用最近有效价格，上市前记为0（此时不会有持仓）
+        marks = np.nan_to_num(self.prices.ffill().to_numpy(dtype=np.float64), nan=0.0)
+        targets = self._target_weights()
+        mask = _rebalance_mask(self.prices.index, self.rebalance)
+        rebalance_rows = np.flatnonzero(mask)
+        
+        n_symbols = len(self.symbols)
+        holdings = np.zeros(n_symbols, dtype=np.int64)
+        avg_cost = np.zeros(n_symbols, dtype=np.float64)  # 每股持仓成本（含手续费）
+        cash = float(self.initial_capital)
+        
+        rebalance_holdings = np.empty((len(rebalance_rows), n_symbols), dtype=np.int64)
+        rebalance_cash = np.empty(len(rebalance_rows), dtype=np.float64)
+        sell_count = win_count = loss_count = 0
+        traded_amount = 0.0  # 卖出收入与买入成本合计，与 Backtester 的换手率口径一致
+        self.trades = []
+        
+        for k, row in enumerate(rebalance_rows):
+            price = prices[row]
+            tradable = np.isfinite(price) & (price > 0)
+            if targets is None:
+                weights = tradable / max(tradable.sum(), 1)
+            else:
+                weights = np.where(tradable, targets[row], 0.0)
+                total_weight = weights.sum()
+                if total_weight > 1:
+                    weights = weights / total_weight
+            
+            equity = cash + holdings @ marks[row]
+            safe_price = np.where(tradable, price, 1.0)
+            cost_price = safe_price * (1 + self.slippage)
+            sell_price = safe_price * (1 - self.slippage)
+            
+            # 目标股数：与 Backtester 一致，预留手续费后按含滑点价格取整
+            target = np.floor(weights * equity * (1 - self.commission) / cost_price).astype(np.int64)
+            target = np.where(tradable, target, holdings)  # 无价格的标的不交易
+            delta = target - holdings
+            
+            # 先卖出
+            pre_sell_cash = cash
+            sold = np.where(delta < 0, -delta, 0)
+            revenue = sold * sell_price
+            net_revenue = revenue - revenue * self.commission
+            pnl = net_revenue - sold * avg_cost
+            cash += net_revenue.sum()
+            post_sell_cash = cash
+            sell_count += int(np.count_nonzero(sold))
+            win_count += int(np.count_nonzero((sold > 0) & (pnl > 0)))
+            loss_count += int(np.count_nonzero((sold > 0) & (pnl < 0)))
+            
+            # 再买入，现金不足时按比例缩减
+            bought = np.where(delta > 0, delta, 0)
+            cost = bought * cost_price
+            total_cost = cost + cost * self.commission
+            if total_cost.sum() > cash:
+                bought = np.floor(bought * (cash / total_cost.sum())).astype(np.int64)
+                cost = bought * cost_price
+                total_cost = cost + cost * self.commission
+            cash -= total_cost.sum()
+            traded_amount += float(net_revenue.sum() + total_cost.sum())
+            
+            new_holdings = holdings - sold + bought
+            with np.errstate(divide='ignore', invalid='ignore'):
+                avg_cost = np.where(
+                    new_holdings > 0,
+                    ((holdings - sold) * avg_cost + total_cost) / new_holdings,
+                    0.0
+                )
+            holdings = new_holdings
+            rebalance_holdings[k] = holdings
+            rebalance_cash[k] = cash
+            
+            if self.record_trades:
+                self._record(row, sold, sell_price, net_revenue, pnl, bought, cost_price, total_cost,
+                             pre_sell_cash, post_sell_cash)
+        
+        # 将调仓后的持仓和现金展开到每根K线
+        last_rebalance = np.cumsum(mask) - 1
+        held = rebalance_holdings[last_rebalance]
+        equity = rebalance_cash[last_rebalance] + np.einsum('ij,ij->i', held, marks)
+        equity_df = pd.Series(equity, index=_equity_index(self.prices.index), name='equity')
+        
+        # 交易统计直接由调仓数组累计，不依赖逐笔记录；收盘时持有任一标的即计为持仓
+        metrics = OnlineMetrics(self.initial_capital, self.periods_per_year)
+        metrics.update_many(equity_df.index, equity, (held > 0).any(axis=1))
+        metrics.traded_amount = traded_amount
+        metrics.trade_count = sell_count
+        metrics.win_count = win_count
+        metrics.loss_count = loss_count
+        metrics = metrics.result()
+        
+        return BacktestResult(
+            strategy_name=self.name,
+            symbol=f"PORTFOLIO({n_symbols})",
+            start_date=self.prices.index[0].strftime('%Y-%m-%d'),
+            end_date=self.prices.index[-1].strftime('%Y-%m-%d'),
+            initial_capital=self.initial_capital,
+            equity_curve=equity_df,
+            trades=self.trades,
+            **metrics
+        )
+    
+    def _record(self, row, sold, sell_price, net_revenue, pnl, bought, cost_price, total_cost,
+                pre_sell_cash, post_sell_cash):
+        """
+        生成与 Backtester 格式一致的交易记录（附加 symbol 字段）
+        
+        与 Backtester 一样，capital 为该笔成交之后的现金：卖出按顺序累加卖出收入，买入从全部卖出后的现金依次扣除
+        """
+        date = self.prices.index[row]
+        cash = pre_sell_cash
+        for i in np.flatnonzero(sold):
+            cash += net_revenue[i]
+            cost_basis = net_revenue[i] - pnl[i]
+            self.trades.append({
+                'date': date,
+                'symbol': self.symbols[i],
+                'type': 'SELL',
+                'price': sell_price[i],
+                'shares': int(sold[i]),
+                'revenue': net_revenue[i],
+                'pnl': pnl[i],
+                'pnl_pct': pnl[i] / cost_basis if cost_basis else 0,
+                'capital': cash
+            })
+        cash = post_sell_cash
+        for i in np.flatnonzero(bought):
+            cash -= total_cost[i]
+            self.trades.append({
+                'date': date,
+                'symbol': self.symbols[i],
+                'type': 'BUY',
+                'price': cost_price[i],
+                'shares': int(bought[i]),
+                'cost': total_cost[i],
+                'capital': cash
+            })
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+批量回测报告
+大量回测结果按批写入同一目录：指标摘要逐行追加到 summary.jsonl，权益曲线与成交记录
+按批拼接为压缩的列式分片 (part-NNNNN.npz)；查询、筛选指标只需读取摘要，不加载权益曲线
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    REPORT_FIELDS,
+    BacktestResult,
+    TRADE_DTYPE,
+    TradeLog,
+    _encode_dates,
+    _result_from_arrays,
+)
+
+
+SUMMARY_FILE = 'summary.jsonl'
+# 摘要中由写入器生成的字段，自定义标签不能与之重名
+RESERVED_FIELDS = frozenset(('run_id', 'part', 'row', 'bars') + REPORT_FIELDS)
+
+
+def _part_name(part: int) -> str:
+    return f'part-{part:05d}.npz'
+
+
+class ReportWriter:
+    """
+    批量报告写入器
+    
+    目录结构:
+        summary.jsonl       每个结果一行: run_id、所在分片与行号、数值指标 (BacktestResult.summary) 及自定义标签
+        part-NNNNN.npz      一批结果的权益曲线、成交记录按行拼接，offsets 记录每个结果的起止位置；
+                            相同的日期轴在分片内只保存一次；不能按结构化数组保存的成交
+                            （组合回测的 dict 成交、引用其他日期轴的成交）以 JSON 拼接到 trades_json
+    
+    写入已有目录时接续其中的分片编号与 run_id。
+    
+    Example:
+        with ReportWriter('./reports/sweep') as writer:
+            for params, result in results:
+                writer.add(result, **params)
+        summaries = load_summaries('./reports/sweep')
+    """
+    
+    def __init__(self, directory: Union[str, Path], batch_size: int = 1000):
+        """
+        Args:
+            directory: 报告目录（不存在时创建）
+            batch_size: 每个分片包含的结果数
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size 至少为1")
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.batch_size = batch_size
+        self._pending: List[BacktestResult] = []
+        self._tags: List[Dict] = []
+        
+        parts = sorted(self.directory.glob('part-*.npz'))
+        self._part = int(parts[-1].stem.split('-')[1]) + 1 if parts else 0
+        self._next_id = 0
+        summary_file = self.directory / SUMMARY_FILE
+        if summary_file.exists():
+            with open(summary_file, 'r') as f:
+                for line in f:
+                    if line.strip():
+                        self._next_id = max(self._next_id, json.loads(line)['run_id'] + 1)
+    
+    def add(self, result: BacktestResult, **tags) -> int:
+        """
+        添加一个回测结果，满 batch_size 个时写入分片
+        
+        Args:
+            result: 回测结果
+            **tags: 写入摘要的自定义字段（如策略参数），可用于 load_summaries 后筛选；
+                    不能与 RESERVED_FIELDS 重名
+        
+        Returns:
+            run_id，用于 load_result 读取完整结果
+        """
+        conflicts = RESERVED_FIELDS.intersection(tags)
+        if conflicts:
+            raise ValueError(f"自定义字段与摘要字段重名: {', '.join(sorted(conflicts))}")
+        
+        run_id = self._next_id
+        self._next_id += 1
+        self._pending.append(result)
+        self._tags.append({'run_id': run_id, **tags})
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        return run_id
+    
+    def flush(self):
+        """将缓冲的结果写入新的分片并追加摘要"""
+        if not self._pending:
+            return
+        
+        date_axes: List[pd.Index] = []
+        date_arrays: List[np.ndarray] = []
+        date_meta: List[Dict] = []
+        equity, trades, trades_json, offsets, lines = [], [], [], [], []
+        equity_end = trade_end = json_end = 0
+        
+        for row, (result, tags) in enumerate(zip(self._pending, self._tags)):
+            # 同一批内日期轴通常相同（参数扫描、多策略对比），按对象或内容去重
+            axis = next((i for i, d in enumerate(date_axes) if d is result.dates or d.equals(result.dates)), None)
+            if axis is None:
+                axis = len(date_axes)
+                values, meta = _encode_dates(result.dates)
+                date_axes.append(result.dates)
+                date_arrays.append(values)
+                date_meta.append(meta)
+            
+            if isinstance(result.trades, TradeLog) and result.trades.dates.equals(result.dates):
+                records = result.trades.records
+                encoded = b''
+            else:
+                # 组合回测的 dict 成交或引用其他日期轴的成交保存为 JSON
+                records = np.empty(0, dtype=TRADE_DTYPE)
+                encoded = json.dumps(list(result.trades), default=str).encode('utf-8')
+            
+            equity.append(result.equity_values)
+            trades.append(records)
+            trades_json.append(encoded)
+            offsets.append((equity_end, equity_end + len(result.equity_values),
+                            trade_end, trade_end + len(records), axis,
+                            json_end, json_end + len(encoded)))
+            equity_end += len(result.equity_values)
+            trade_end += len(records)
+            json_end += len(encoded)
+            
+            lines.append({**tags, 'part': self._part, 'row': row, **result.summary()})
+        
+        arrays = {
+            'equity': np.concatenate(equity),
+            'trades': np.concatenate(trades),
+            'trades_json': np.frombuffer(b''.join(trades_json), dtype=np.uint8),
+            'offsets': np.array(offsets, dtype=np.int64),
+            'date_meta': np.array(json.dumps(date_meta)),
+        }
+        for i, values in enumerate(date_arrays):
+            arrays[f'dates_{i}'] = values
+        
+        # 先写分片再追加摘要：中断时最多留下一个没有摘要引用的分片
+        np.savez_compressed(self.directory / _part_name(self._part), **arrays)
+        with open(self.directory / SUMMARY_FILE, 'a') as f:
+            for entry in lines:
+                f.write(json.dumps(entry, default=str) + '\n')
+        
+        self._part += 1
+        self._pending.clear()
+        self._tags.clear()
+    
+    def close(self):
+        """写入剩余的结果"""
+        self.flush()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        self.close()
+
+
+def load_summaries(directory: Union[str, Path], columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    读取报告目录中所有结果的指标摘要（不读取权益曲线分片）
+    
+    Args:
+        directory: ReportWriter 的报告目录
+        columns: 保留的列（run_id 总是保留），None 表示全部
+    
+    Returns:
+        以 run_id 为索引的 DataFrame
+    """
+    summary_file = Path(directory) / SUMMARY_FILE
+    if not summary_file.exists():
+        raise FileNotFoundError(f"未找到报告摘要: {summary_file}")
+    
+    rows = []
+    with open(summary_file, 'r') as f:
+        for line in f:
+            if line.strip():
+                rows.append(json.loads(line))
+    
+    df = pd.DataFrame(rows)
+    if df.empty:
+        return df
+    df = df.set_index('run_id')
+    if columns is not None:
+        df = df[[col for col in columns if col != 'run_id']]
+    return df
+
+
+def load_result(directory: Union[str, Path], run_id: int) -> BacktestResult:
+    """
+    读取单个结果的完整报告（权益曲线与成交记录）
+    
+    Args:
+        directory: ReportWriter 的报告目录
+        run_id: ReportWriter.add 返回的编号
+    """
+    directory = Path(directory)
+    entry = None
+    with open(directory / SUMMARY_FILE, 'r') as f:
+        for line in f:
+            if line.strip():
+                candidate = json.loads(line)
+                if candidate['run_id'] == run_id:
+                    entry = candidate
+                    break
+    if entry is None:
+        raise KeyError(f"报告中没有 run_id={run_id} 的结果")
+    
+    with np.load(directory / _part_name(entry['part']), allow_pickle=False) as data:
+        equity_lo, equity_hi, trade_lo, trade_hi, axis, json_lo, json_hi = data['offsets'][entry['row']]
+        meta = {'summary': entry, 'dates': json.loads(str(data['date_meta']))[axis]}
+        if json_hi > json_lo:
+            meta['trades'] = json.loads(data['trades_json'][json_lo:json_hi].tobytes().decode('utf-8'))
+            trades = None
+        else:
+            trades = data['trades'][trade_lo:trade_hi].copy()
+        return _result_from_arrays(meta, data['equity'][equity_lo:equity_hi].copy(), data[f'dates_{axis}'], trades)
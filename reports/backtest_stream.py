@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+流式回测
+按块读取 Parquet / 内存映射行情，跨块接续策略指标与持仓状态，在线累积回测指标；
+内存占用只与块大小和输出粒度有关，与历史长度无关，适用于多年的分钟线 / Tick 数据
+"""
+
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    BacktestResult,
+    OnlineMetrics,
+    Strategy,
+    TRADE_DTYPE,
+    TradeLog,
+    _equity_index,
+    _fill_kernel,
+    _fill_state,
+    _holding_mask,
+    _periods_per_year,
+)
+
+
+def iter_parquet_chunks(
+    path: str,
+    chunk_size: int = 1_000_000,
+    columns: Optional[List[str]] = None,
+    index_column: Optional[str] = None
+) -> Iterator[pd.DataFrame]:
+    """
+    按块读取 Parquet 行情文件，每块最多 chunk_size 行
+    
+    Args:
+        path: Parquet 文件路径
+        chunk_size: 每块的最大行数
+        columns: 读取的列，None 表示全部
+        index_column: 作为时间索引的列；None 时使用文件中保存的 pandas 索引
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ImportError("pyarrow 未安装，无法读取 Parquet。运行: pip install pyarrow")
+    
+    if columns is not None and index_column is not None and index_column not in columns:
+        columns = list(columns) + [index_column]
+    
+    parquet = pq.ParquetFile(path)
+    for batch in parquet.iter_batches(batch_size=chunk_size, columns=columns):
+        df = batch.to_pandas()
+        if index_column is not None:
+            df = df.set_index(index_column)
+        yield df
+
+
+def iter_frame_chunks(data: pd.DataFrame, chunk_size: int = 1_000_000) -> Iterator[pd.DataFrame]:
+    """将内存中的行情按块切分（便于与整段回测对照）"""
+    for start in range(0, len(data), chunk_size):
+        yield data.iloc[start:start + chunk_size]
+
+
+class _BarView(Mapping):
+    """
+    块内单根K线的只读视图
+    
+    逐根调用 on_bar 时复用同一对象、只移动行号，避免为每根K线构造 dict 或 Series。
+    """
+    
+    __slots__ = ('_columns', '_row')
+    
+    def __init__(self, columns: Dict[str, np.ndarray]):
+        self._columns = columns
+        self._row = 0
+    
+    def __getitem__(self, key):
+        return self._columns[key][self._row]
+    
+    def __iter__(self):
+        return iter(self._columns)
+    
+    def __len__(self) -> int:
+        return len(self._columns)
+
+
+def _is_incremental(strategy: Strategy) -> bool:
+    """策略是否重写了 O(1) 的增量 _update"""
+    return type(strategy)._update is not Strategy._update
+
+
+class StreamingBacktester:
+    """
+    分块流式回测引擎
+    
+    信号计算（两种方式）:
+        - 增量: 策略重写了 _update（内置策略均已实现）时逐根调用 on_bar，
+          指标状态自然跨块接续，信号与整段 generate_signals 完全一致
+        - 回看: 指定 lookback 时，每块前拼接上一块末尾 lookback 根K线后调用 generate_signals；
+          滚动窗口类指标在 lookback 不小于窗口时与整段计算一致，EWM 类指标为近似
+    成交执行使用与 vectorized 引擎相同的成交内核，持仓状态跨块接续；
+    指标由 OnlineMetrics 在线累积，权益曲线按 equity_freq 降采样后保存。
+    """
+    
+    def __init__(
+        self,
+        strategy: Strategy,
+        symbol: str = '',
+        initial_capital: float = 100000.0,
+        commission: float = 0.001,
+        slippage: float = 0.001,
+        interval: str = '1m',
+        periods_per_year: Optional[float] = None,
+        stop_loss: Optional[float] = None,
+        take_profit: Optional[float] = None,
+        lookback: Optional[int] = None,
+        equity_freq: Optional[str] = 'D',
+        record_trades: bool = False
+    ):
+        """
+        初始化流式回测引擎
+        
+        Args:
+            strategy: 策略对象
+            symbol: 股票代码（仅用于结果展示）
+            initial_capital: 初始资金
+            commission: 手续费率
+            slippage: 滑点率
+            interval: 数据周期，如 '1m', '5m', '1h'，用于换算年化
+            periods_per_year: 每年的K线数量，默认按 interval 换算
+            stop_loss: 止损比例，见 Backtester
+            take_profit: 止盈比例，见 Backtester
+            lookback: 回看方式的K线数量；None 时使用增量方式（策略须重写 _update）
+            equity_freq: 保存权益曲线的粒度（每个周期取最后一个值），如 'D'、'h'；None 保存每根K线
+            record_trades: 是否保存逐笔成交（成交数量随历史增长）
+        """
+        if lookback is None and not _is_incremental(strategy):
+            raise ValueError(f"策略 {strategy.name} 未实现增量 _update，流式回测需指定 lookback")
+        if lookback is not None and lookback < 0:
+            raise ValueError("lookback 不能为负")
+        
+        self.strategy = strategy
+        self.symbol = symbol
+        self.initial_capital = initial_capital
+        self.commission = commission
+        self.slippage = slippage
+        self.interval = interval
+        self.periods_per_year = periods_per_year if periods_per_year is not None else _periods_per_year(interval)
+        self.stop_loss = stop_loss
+        self.take_profit = take_profit
+        self.lookback = lookback
+        self.equity_freq = equity_freq
+        self.record_trades = record_trades
+    
+    def _signals(self, chunk: pd.DataFrame, tail: Optional[pd.DataFrame]) -> np.ndarray:
+        """计算一块K线的信号"""
+        if self.lookback is None:
+            view = _BarView({col: chunk[col].to_numpy() for col in chunk.columns})
+            on_bar = self.strategy.on_bar
+            signals = np.empty(len(chunk), dtype=np.float64)
+            for i in range(len(chunk)):
+                view._row = i
+                signals[i] = on_bar(view)
+            return signals
+        
+        data = chunk if tail is None or tail.empty else pd.concat([tail, chunk])
+        signals = self.strategy.generate_signals(data)['signal'].to_numpy(dtype=np.float64)
+        return signals[len(data) - len(chunk):]
+    
+    def _downsample(self, equity: pd.Series) -> pd.Series:
+        if self.equity_freq is None:
+            return equity
+        return equity.resample(self.equity_freq).last().dropna()
+    
+    def run(self, chunks: Iterable[pd.DataFrame]) -> BacktestResult:
+        """
+        执行流式回测
+        
+        Args:
+            chunks: 按时间顺序排列的行情块，如 iter_parquet_chunks / MarketDataStore.chunks 的输出
+        
+        Returns:
+            BacktestResult，equity_curve 为降采样后的权益曲线；record_trades=False 时 trades 为空
+        """
+        print(f"🌊 开始流式回测: {self.symbol} - {self.strategy.name}")
+        
+        if self.lookback is None:
+            self.strategy.reset()
+        metrics = OnlineMetrics(self.initial_capital, self.periods_per_year)
+        state = _fill_state(self.initial_capital)
+        curve: List[pd.Series] = []
+        trade_parts: List[np.ndarray] = []
+        trade_dates: List[pd.Index] = []
+        tail = None
+        bars = 0
+        
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            close = chunk['Close'].to_numpy(dtype=np.float64)
+            signals = self._signals(chunk, tail)
+            if self.lookback:
+                tail = chunk.iloc[-self.lookback:]
+            
+            held = state[1] > 0
+            equity, trades = _fill_kernel(
+                close, signals, self.initial_capital, self.commission, self.slippage,
+                self.stop_loss, self.take_profit, state=state
+            )
+            metrics.update_many(chunk.index, equity, _holding_mask(len(equity), trades, held))
+            metrics.record_trades(trades)
+            bars += len(chunk)
+            
+            # 跨块的同一周期由后一块的值覆盖，合并时去重
+            curve.append(self._downsample(pd.Series(equity, index=chunk.index)))
+            if len(curve) > 1 and len(curve[-2]) and len(curve[-1]) and curve[-2].index[-1] == curve[-1].index[0]:
+                curve[-2] = curve[-2].iloc[:-1]
+            
+            if self.record_trades and len(trades):
+                trade_dates.append(chunk.index[trades['bar']])
+                trade_parts.append(trades)
+        
+        if not bars:
+            raise ValueError("没有可回测的行情数据")
+        
+        equity_curve = pd.concat(curve)
+        equity_curve = pd.Series(equity_curve.to_numpy(), index=_equity_index(equity_curve.index), name='equity')
+        
+        records = np.concatenate(trade_parts) if trade_parts else np.empty(0, dtype=TRADE_DTYPE)
+        records['bar'] = np.arange(len(records))
+        dates = trade_dates[0].append(trade_dates[1:]) if trade_dates else equity_curve.index[:0]
+        trades = TradeLog(records, _equity_index(dates))
+        
+        result = BacktestResult(
+            strategy_name=self.strategy.name,
+            symbol=self.symbol,
+            start_date=metrics.first_date.strftime('%Y-%m-%d'),
+            end_date=metrics.last_date.strftime('%Y-%m-%d'),
+            initial_capital=self.initial_capital,
+            equity_curve=equity_curve,
+            trades=trades,
+            **metrics.result()
+        )
+        print(f"✅ 流式回测完成: {bars:,} 根K线, {result.trade_count} 笔交易")
+        return result
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+滚动前推回测
+在整段行情上一次性计算信号，按 训练窗口 → 测试窗口 滚动切片执行，
+训练窗口可用于参数寻优，测试窗口的结果拼接为样本外权益曲线
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from backtest import (
+    Backtester,
+    BacktestResult,
+    Strategy,
+    TRADE_DTYPE,
+    TradeLog,
+    _equity_index,
+    _evaluate_signal_matrix,
+    _expand_param_grid,
+    _fill_kernel,
+    _performance_metrics,
+    _signal_matrix,
+)
+
+
+# 训练窗口上可用于选择参数的指标（越大越好）
+OBJECTIVES = ('sharpe_ratio', 'total_return', 'annualized_return', 'max_drawdown', 'win_rate')
+
+Span = Union[int, str, pd.DateOffset]
+
+
+def _window_bounds(index: pd.DatetimeIndex, train: Span, test: Span, step: Span) -> List[Tuple[int, int, int]]:
+    """
+    计算各窗口的 (训练起点, 测试起点, 测试终点) 位置
+    
+    整数表示K线数量；字符串或 DateOffset 表示时间跨度，如 '365D'、'6MS'。
+    """
+    n = len(index)
+    bounds = []
+    
+    if all(isinstance(span, (int, np.integer)) for span in (train, test, step)):
+        if train < 0 or test <= 0 or step <= 0:
+            raise ValueError("训练窗口不能为负，测试窗口和步长必须为正")
+        start = 0
+        while start + train < n:
+            bounds.append((start, start + train, min(start + train + test, n)))
+            start += step
+        return bounds
+    
+    if any(isinstance(span, (int, np.integer)) for span in (train, test, step)):
+        raise ValueError("train_size / test_size / step 须同为K线数量或同为时间跨度")
+    
+    train, test, step = (pd.tseries.frequencies.to_offset(span) for span in (train, test, step))
+    dates = index.tz_localize(None) if index.tz is not None else index
+    origin = dates[0]
+    while True:
+        train_start = dates.searchsorted(origin)
+        test_start = dates.searchsorted(origin + train)
+        test_end = dates.searchsorted(origin + train + test)
+        if test_start >= n:
+            break
+        if test_end > test_start:
+            bounds.append((int(train_start), int(test_start), int(test_end)))
+        next_origin = origin + step
+        if next_origin <= origin:
+            raise ValueError("步长必须为正")
+        origin = next_origin
+    return bounds
+
+
+def _run_window(job: Tuple) -> Tuple:
+    """
+    执行单个窗口：训练段上评估全部参数组合并选出最优，测试段使用最优参数
+    
+    Returns:
+        (最优参数列号, 训练段权益, 训练段成交, 测试段权益, 测试段成交)
+    """
+    (close, signals, train_index, split, objective, initial_capital, commission, slippage, stop_loss, take_profit,
+     periods_per_year) = job
+    
+    best = 0
+    train_equity, train_trades = None, None
+    if split > 0:
+        if signals.shape[1] > 1:
+            _, metrics = _evaluate_signal_matrix(
+                close[:split], signals[:split], train_index, initial_capital,
+                commission, slippage, stop_loss, take_profit, periods_per_year
+            )
+            scores = np.nan_to_num(np.asarray(metrics[objective], dtype=np.float64), nan=-np.inf)
+            best = int(np.argmax(scores))
+        train_equity, train_trades = _fill_kernel(
+            close[:split], signals[:split, best], initial_capital, commission, slippage, stop_loss, take_profit
+        )
+    
+    test_equity, test_trades = _fill_kernel(
+        close[split:], signals[split:, best], initial_capital, commission, slippage, stop_loss, take_profit
+    )
+    return best, train_equity, train_trades, test_equity, test_trades
+
+
+class WalkForwardResult:
+    """
+    滚动前推回测结果
+    
+    Attributes:
+        windows: DataFrame 每行一个窗口：起止日期、选中的参数、训练段与测试段指标
+        train_results: 各窗口训练段的 BacktestResult（训练窗口为0时为None）
+        test_results: 各窗口测试段的 BacktestResult
+        out_of_sample: 测试段拼接后的样本外 BacktestResult
+    """
+    
+    def __init__(
+        self,
+        windows: pd.DataFrame,
+        train_results: List[Optional[BacktestResult]],
+        test_results: List[BacktestResult],
+        out_of_sample: BacktestResult
+    ):
+        self.windows = windows
+        self.train_results = train_results
+        self.test_results = test_results
+        self.out_of_sample = out_of_sample
+    
+    @property
+    def equity_curve(self) -> pd.Series:
+        """样本外权益曲线"""
+        return self.out_of_sample.equity_curve
+    
+    def __str__(self) -> str:
+        return f"滚动前推: {len(self.test_results)} 个窗口\n{self.out_of_sample}"
+
+
+def walk_forward(
+    symbol: str,
+    strategy: Union[Strategy, type],
+    start_date: str,
+    end_date: str,
+    train_size: Span,
+    test_size: Span,
+    step: Optional[Span] = None,
+    param_grid=None,
+    objective: str = 'sharpe_ratio',
+    initial_capital: float = 100000.0,
+    commission: float = 0.001,
+    slippage: float = 0.001,
+    stop_loss: Optional[float] = None,
+    take_profit: Optional[float] = None,
+    data: Optional[pd.DataFrame] = None,
+    data_store=None,
+    max_workers: Optional[int] = None,
+    interval: str = '1d',
+    periods_per_year: Optional[float] = None
+) -> WalkForwardResult:
+    """
+    滚动前推 / 滚动窗口回测
+    
+    信号（及其指标）在整段行情上只计算一次，各窗口直接切片执行；
+    因此窗口起点处的指标与在完整历史上计算的结果一致，不受窗口截断影响。
+    
+    每个测试窗口以 initial_capital 独立执行，样本外权益曲线按各窗口收益率复利拼接；
+    步长小于测试窗口时，每个窗口只取到下一个测试窗口开始之前的部分。
+    拼接的成交记录按进入该窗口时的资金等比例缩放（股数取整），与样本外权益一致；
+    窗口结束时仍持仓的，在窗口最后一根K线补一笔按收盘价、不计成本的平仓卖出，与权益在该处的计值一致。
+    
+    Args:
+        symbol: 股票代码
+        strategy: 策略对象；提供 param_grid 时为策略类
+        start_date: 开始日期 (YYYY-MM-DD)
+        end_date: 结束日期 (YYYY-MM-DD)
+        train_size: 训练窗口，K线数量或时间跨度（如 '730D'）；0 表示不训练，即普通滚动窗口回测
+        test_size: 测试窗口，单位同 train_size
+        step: 窗口步长，默认等于 test_size
+        param_grid: 参数网格，见 sweep；提供时在每个训练窗口上按 objective 选择最优参数
+        objective: 选择参数的指标，见 OBJECTIVES
+        initial_capital: 初始资金
+        commission: 手续费率
+        slippage: 滑点率
+        stop_loss: 止损比例，见 Backtester
+        take_profit: 止盈比例，见 Backtester
+        data: 自定义行情数据，为None时通过 Backtester.fetch_data 获取
+        data_store: 本地行情缓存，见 Backtester
+        max_workers: 并行执行窗口的进程数，None 或 1 时串行
+        interval: 数据周期，见 Backtester
+        periods_per_year: 每年的K线数量，默认按 interval 换算，见 Backtester
+    
+    Returns:
+        WalkForwardResult
+    """
+    if objective not in OBJECTIVES:
+        raise ValueError(f"未知的优化目标: {objective}，可选: {', '.join(OBJECTIVES)}")
+    
+    if param_grid is not None:
+        if not isinstance(strategy, type):
+            raise ValueError("提供 param_grid 时 strategy 必须是策略类")
+        combos = _expand_param_grid(param_grid)
+        if not combos:
+            raise ValueError("参数网格为空")
+        strategies = [strategy(**params) for params in combos]
+    else:
+        if isinstance(strategy, type):
+            strategy = strategy()
+        combos = [{}]
+        strategies = [strategy]
+    
+    backtester = Backtester(
+        symbol=symbol,
+        strategy=strategies[0],
+        start_date=start_date,
+        end_date=end_date,
+        initial_capital=initial_capital,
+        data_store=data_store,
+        interval=interval,
+        periods_per_year=periods_per_year
+    )
+    periods_per_year = backtester.periods_per_year
+    if data is None:
+        data = backtester.fetch_data()
+    else:
+        data = backtester.load_mock_data(data)
+    
+    step = test_size if step is None else step
+    bounds = _window_bounds(data.index, train_size, test_size, step)
+    if not bounds:
+        raise ValueError("数据长度不足以构成一个训练 + 测试窗口")
+    
+    print(f"🔁 滚动前推: {len(bounds)} 个窗口 × {len(strategies)} 组参数")
+    
+    # 信号在整段行情上一次性计算
+    close = data['Close'].to_numpy(dtype=np.float64)
+    signals = _signal_matrix(data, strategies, {})
+    
+    jobs = [
+        (close[a:c], signals[a:c], data.index[a:b], b - a, objective,
+         initial_capital, commission, slippage, stop_loss, take_profit, periods_per_year)
+        for a, b, c in bounds
+    ]
+    if max_workers is not None and max_workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            chunksize = max(1, len(jobs) // (max_workers * 4))
+            outputs = list(executor.map(_run_window, jobs, chunksize=chunksize))
+    else:
+        outputs = [_run_window(job) for job in jobs]
+    
+    def _result(name, equity, trades, dates):
+        dates = _equity_index(dates)
+        equity_df = pd.Series(equity, index=dates, name='equity')
+        trades = TradeLog(trades, dates)
+        return BacktestResult(
+            strategy_name=name,
+            symbol=symbol,
+            start_date=dates[0].strftime('%Y-%m-%d'),
+            end_date=dates[-1].strftime('%Y-%m-%d'),
+            initial_capital=initial_capital,
+            equity_curve=equity_df,
+            trades=trades,
+            **_performance_metrics(equity_df, trades, initial_capital, periods_per_year)
+        )
+    
+    rows, train_results, test_results = [], [], []
+    segments, segment_trades, positions = [], [], []
+    capital = float(initial_capital)
+    offset = 0
+    
+    for i, ((a, b, c), (best, train_equity, train_trades, test_equity, test_trades)) in enumerate(zip(bounds, outputs)):
+        name = strategies[best].name
+        train = _result(name, train_equity, train_trades, data.index[a:b]) if b > a else None
+        test = _result(name, test_equity, test_trades, data.index[b:c])
+        train_results.append(train)
+        test_results.append(test)
+        
+        row = {
+            'window': i,
+            'train_start': data.index[a] if b > a else None,
+            'train_end': data.index[b - 1] if b > a else None,
+            'test_start': data.index[b],
+            'test_end': data.index[c - 1],
+            'strategy_name': name,
+        }
+        row.update(combos[best])
+        for metric in ('total_return', 'annualized_return', 'max_drawdown', 'sharpe_ratio', 'trade_count', 'win_rate'):
+            if train is not None:
+                row[f'train_{metric}'] = getattr(train, metric)
+            row[f'test_{metric}'] = getattr(test, metric)
+        rows.append(row)
+        
+        # 拼接样本外权益：截至下一个测试窗口开始，按本窗口收益率复利
+        end = min(c, bounds[i + 1][1]) if i + 1 < len(bounds) else c
+        length = end - b
+        scale = capital / initial_capital
+        segments.append(scale * test_equity[:length])
+        positions.append(np.arange(b, end))
+        capital = float(segments[-1][-1])
+        
+        # 窗口以 initial_capital 执行，成交金额按进入窗口时的资金缩放
+        kept = test_trades[test_trades['bar'] < length].copy()
+        kept['bar'] += offset
+        kept['shares'] = np.rint(kept['shares'] * scale).astype(np.int64)
+        for field in ('amount', 'pnl', 'capital'):
+            kept[field] *= scale
+        if len(kept) and kept['side'][-1] == 1:
+            # 下一个窗口从现金开始：按窗口末的收盘价平仓，卖出后现金等于该处的样本外权益
+            buy = kept[-1]
+            closing = np.zeros(1, dtype=TRADE_DTYPE)
+            closing['bar'] = offset + length - 1
+            closing['side'] = -1
+            closing['price'] = close[end - 1]
+            closing['shares'] = buy['shares']
+            closing['capital'] = capital
+            closing['amount'] = capital - buy['capital']
+            closing['pnl'] = closing['amount'] - buy['amount']
+            closing['pnl_pct'] = closing['pnl'] / buy['amount']
+            kept = np.concatenate([kept, closing])
+        segment_trades.append(kept)
+        offset += length
+    
+    label = strategies[0].name if param_grid is None else f"{strategy.__name__}*"
+    out_of_sample = _result(
+        f"WF({label})",
+        np.concatenate(segments),
+        np.concatenate(segment_trades),
+        data.index[np.concatenate(positions)]
+    )
+    
+    print(f"✅ 样本外总收益: {out_of_sample.total_return:.2%} | 夏普: {out_of_sample.sharpe_ratio:.2f}")
+    return WalkForwardResult(pd.DataFrame(rows), train_results, test_results, out_of_sample)